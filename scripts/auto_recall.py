@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import math
+import time
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from index_store import index_generation
+from keyword_extract import term_counts
+
+
+class AutoRecall:
+    # Streaming keyword trigger over the last `window` turns. Each turn costs
+    # one tokenization, a window counter update and a document-frequency
+    # lookup per distinct new term; the index is reopened only when its
+    # generation counter moves.
+    def __init__(
+        self,
+        backend: Any,
+        *,
+        window: int = 6,
+        threshold: float = 4.0,
+        cooldown_turns: int = 3,
+        min_interval: float = 20.0,
+        max_results: int = 3,
+        since_epoch: float | None = None,
+    ) -> None:
+        self.backend = backend
+        self.index_path: Path = backend.index_path
+        self.threshold = threshold
+        self.cooldown_turns = cooldown_turns
+        self.min_interval = min_interval
+        self.max_results = max_results
+        # Entries written during this session (e.g. by the watcher) are its own
+        # transcript, not memory worth surfacing back into it.
+        self.since_epoch = since_epoch
+        self.turns: deque[Counter] = deque(maxlen=window)
+        self.counts: Counter = Counter()
+        self.turn_number = 0
+        self.last_fired_turn = -cooldown_turns
+        self.last_fired_at = 0.0
+        self.fired_terms: dict[str, int] = {}
+        self.emitted: set[str] = set()
+        self._index: Any = None
+        self._generation: int | None = None
+        self._idf: dict[str, float] = {}
+
+    def _refresh(self) -> None:
+        generation = index_generation(self.index_path)
+        if generation == self._generation and self._index is not None:
+            return
+        self._index = self.backend.recall_index()
+        self._generation = generation
+        self._idf = {}
+
+    def _weight(self, term: str) -> float:
+        # IDF of the term in memory; terms memory has never indexed weigh 0.
+        idf = self._idf.get(term)
+        if idf is None:
+            df = self._index.doc_freq(term)
+            doc_count = len(self._index)
+            idf = math.log(1.0 + (doc_count - df + 0.5) / (df + 0.5)) if df else 0.0
+            self._idf[term] = idf
+        return idf
+
+    def feed(self, text: str) -> tuple[list[str], list[tuple[float, dict[str, Any]]]]:
+        self.turn_number += 1
+        turn = term_counts(text)
+        if len(self.turns) == self.turns.maxlen:
+            self.counts.subtract(self.turns[0])
+            for term in [term for term, count in self.turns[0].items() if self.counts[term] <= 0]:
+                del self.counts[term]
+        self.turns.append(turn)
+        self.counts.update(turn)
+        if not turn:
+            return [], []
+        self._refresh()
+
+        # A term triggers when its windowed weight crosses the threshold and it
+        # has not already fired while still inside the window.
+        window = self.turns.maxlen or 1
+        triggers = [
+            term
+            for term in turn
+            if self.counts[term] * self._weight(term) >= self.threshold
+            and self.turn_number - self.fired_terms.get(term, -window) >= window
+        ]
+        now = time.monotonic()
+        if (
+            not triggers
+            or self.turn_number - self.last_fired_turn < self.cooldown_turns
+            or (self.last_fired_at and now - self.last_fired_at < self.min_interval)
+        ):
+            return [], []
+
+        hits = []
+        for score, entry in self._index.search(set(triggers), self.max_results + len(self.emitted)):
+            note_id = entry.get("note_id", entry["id"])
+            if note_id in self.emitted or self._from_session(entry):
+                continue
+            hits.append((score, entry))
+            if len(hits) >= self.max_results:
+                break
+        for term in triggers:
+            self.fired_terms[term] = self.turn_number
+        if not hits:
+            return triggers, []
+        self.last_fired_turn = self.turn_number
+        self.last_fired_at = now
+        self.emitted.update(entry.get("note_id", entry["id"]) for _, entry in hits)
+        return triggers, hits
+
+    def _from_session(self, entry: dict[str, Any]) -> bool:
+        if self.since_epoch is None or not entry.get("timestamp"):
+            return False
+        try:
+            return datetime.fromisoformat(entry["timestamp"]).timestamp() >= self.since_epoch
+        except ValueError:
+            return False
@@ -1,54 +1,202 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
+import signal
 import subprocess
 import sys
 import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
+from itertools import repeat
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
+
+import memory_daemon
+import memory_manager
+import profiling
+from file_watch import FileWatcher, pid_alive
+from locking import atomic_write_text, locked
+
+
+_CATALOG_VERSION = 2
+_HEAD_LINES = 5
+_SYNCED_PREFIX = "Synced memory entry:"
 
 
 @dataclass
 class SessionCandidate:
     path: Path
     mtime: float
+    size: int = 0
+    cwd: str | None = None
+    session_id: str | None = None
 
 
 def _normalize_path(path: str) -> str:
     return os.path.normcase(os.path.normpath(os.path.abspath(path)))
 
 
-def _iter_session_files(sessions_root: Path) -> Iterable[SessionCandidate]:
-    if not sessions_root.exists():
-        return []
-    files = [p for p in sessions_root.rglob("*.jsonl") if p.is_file()]
-    files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    return [SessionCandidate(path=p, mtime=p.stat().st_mtime) for p in files]
+def _catalog_path(sessions_root: Path) -> Path:
+    # One catalog per sessions tree, shared by every project that syncs from it.
+    # It sits in its own dot directory, which the walk skips, so saving it
+    # never changes the mtime of a directory the walk compares.
+    return sessions_root / ".catalog" / "session_catalog.json"
+
 
+def _load_catalog(path: Path, sessions_root: Path) -> dict[str, dict]:
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if data.get("version") != _CATALOG_VERSION or data.get("root") != str(sessions_root):
+        return {}
+    return data.get("dirs", {})
+
+
+def _save_catalog(path: Path, sessions_root: Path, dirs: dict[str, dict]) -> None:
+    data = {"version": _CATALOG_VERSION, "root": str(sessions_root), "dirs": dirs}
+    atomic_write_text(path, json.dumps(data, ensure_ascii=False))
 
-def _load_lines(path: Path) -> list[dict]:
-    lines: list[dict] = []
+
+def _read_session_head(path: Path) -> tuple[str | None, str | None]:
+    # session_meta is always among the first few records; never read the full transcript here.
     with path.open("r", encoding="utf-8") as f:
-        for raw in f:
-            raw = raw.strip()
+        for _ in range(_HEAD_LINES):
+            raw = f.readline()
             if not raw:
-                continue
+                break
             try:
-                lines.append(json.loads(raw))
+                item = json.loads(raw)
             except json.JSONDecodeError:
                 continue
-    return lines
+            if item.get("type") == "session_meta":
+                payload = item.get("payload", {})
+                cwd = payload.get("cwd")
+                return (_normalize_path(cwd) if cwd else None), payload.get("id")
+    return None, None
+
+
+def _head_or_none(path: str) -> list[str | None]:
+    try:
+        return list(_read_session_head(Path(path)))
+    except OSError:
+        return [None, None]
+
+
+def _scan_dir(path: str, mtime: int, known: dict | None) -> dict:
+    # Lists one directory; logs already catalogued keep their head fields.
+    old = known["files"] if known else {}
+    subdirs, files = [], {}
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if not entry.name.startswith("."):
+                    subdirs.append(entry.name)
+            elif entry.name.endswith(".jsonl") and entry.is_file():
+                head = old.get(entry.name)
+                files[entry.name] = head if head and head[0] else _head_or_none(entry.path)
+    return {"mtime": mtime, "subdirs": sorted(subdirs), "files": files}
+
+
+def _refresh_catalog(sessions_root: Path, dirs: dict[str, dict]) -> bool:
+    # Adding or removing a log changes its directory's mtime, so only changed
+    # directories are listed; the rest cost one stat each. Appends change a
+    # log but not its directory, which is why lookups stat the matches.
+    changed = False
+    fresh: dict[str, dict] = {}
+    stack = [str(sessions_root)]
+    while stack:
+        path = stack.pop()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        known = dirs.get(path)
+        if known is None or known["mtime"] != mtime:
+            try:
+                known = _scan_dir(path, mtime, known)
+            except OSError:
+                continue
+            changed = True
+        else:
+            for name, head in known["files"].items():
+                if not head[0]:
+                    # Created before its session_meta line was written.
+                    head[:] = _head_or_none(os.path.join(path, name))
+                    changed = changed or bool(head[0])
+        fresh[path] = known
+        stack.extend(os.path.join(path, name) for name in known["subdirs"])
+    changed = changed or fresh.keys() != dirs.keys()
+    dirs.clear()
+    dirs.update(fresh)
+    return changed
+
+
+def _project_sessions(sessions_root: Path, project: Path) -> list[SessionCandidate]:
+    if not sessions_root.exists():
+        return []
+    catalog_path = _catalog_path(sessions_root)
+    try:
+        catalog_path.parent.mkdir(exist_ok=True)
+    except OSError:
+        pass
+    dirs = _load_catalog(catalog_path, sessions_root)
+    if _refresh_catalog(sessions_root, dirs):
+        try:
+            _save_catalog(catalog_path, sessions_root, dirs)
+        except OSError:
+            pass
+    project_norm = _normalize_path(str(project))
+    sessions = []
+    for path, directory in dirs.items():
+        for name, (cwd, session_id) in directory["files"].items():
+            if cwd != project_norm:
+                continue
+            log = os.path.join(path, name)
+            try:
+                stat = os.stat(log)
+            except OSError:
+                continue
+            sessions.append(SessionCandidate(Path(log), stat.st_mtime, stat.st_size, cwd, session_id))
+    return sessions
+
 
+class _RecordReader:
+    # Iterates message records from a byte offset; `offset` tracks the end of the
+    # last complete line consumed so a later run can resume exactly there.
+    def __init__(self, path: Path, offset: int = 0) -> None:
+        self.path = path
+        self.offset = offset
+        self.reset = False
 
-def _session_cwd(lines: list[dict]) -> str | None:
-    for item in lines[:5]:
-        if item.get("type") == "session_meta":
-            payload = item.get("payload", {})
-            return payload.get("cwd")
-    return None
+    def __iter__(self) -> Iterator[dict]:
+        with self.path.open("rb") as f:
+            if self.offset > os.fstat(f.fileno()).st_size:
+                self.offset, self.reset = 0, True
+            f.seek(self.offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    # A line still being written is left for the next run.
+                    try:
+                        json.loads(raw)
+                    except ValueError:
+                        break
+                self.offset += len(raw)
+                # Cheap substring test first: only message records are ever decoded.
+                if b'"response_item"' not in raw or b'"message"' not in raw:
+                    continue
+                try:
+                    yield json.loads(raw)
+                except ValueError:
+                    continue
 
 
 def _extract_message_text(content: list[dict], role: str) -> str:
@@ -91,9 +239,8 @@ def _is_noise_text(role: str, text: str) -> bool:
     return False
 
 
-def _extract_dialog(lines: list[dict], max_messages: int) -> list[tuple[str, str]]:
-    dialog: list[tuple[str, str]] = []
-    for item in lines:
+def _iter_dialog(records: Iterable[dict]) -> Iterator[tuple[str, str]]:
+    for item in records:
         if item.get("type") != "response_item":
             continue
         payload = item.get("payload", {})
@@ -104,44 +251,85 @@ def _extract_dialog(lines: list[dict], max_messages: int) -> list[tuple[str, str
             continue
         text = _extract_message_text(payload.get("content", []), role)
         if text and not _is_noise_text(role, text):
-            dialog.append((role, text))
-    if max_messages > 0 and len(dialog) > max_messages:
-        return dialog[-max_messages:]
-    return dialog
+            yield role, text
 
 
-def _build_note(dialog: list[tuple[str, str]], max_chars: int) -> str:
+def _message_hash(role: str, text: str) -> str:
+    return hashlib.sha1(f"{role}\0{text}".encode("utf-8")).hexdigest()
+
+
+def _extract_dialog(
+    records: Iterable[dict],
+    max_messages: int,
+    after_hash: str | None = None,
+) -> list[tuple[str, str]]:
+    dialog: deque[tuple[str, str]] = deque(maxlen=max_messages if max_messages > 0 else None)
+    for role, text in _iter_dialog(records):
+        if after_hash and _message_hash(role, text) == after_hash:
+            # Everything up to the last synced message was already stored.
+            dialog.clear()
+            continue
+        dialog.append((role, text))
+    return list(dialog)
+
+
+def _build_note(dialog: list[tuple[str, str]], max_chars: int, continued: bool = False) -> str:
     if not dialog:
         return ""
-    lines = ["# Session Transcript", ""]
+    lines = ["# Session Transcript (continued)" if continued else "# Session Transcript", ""]
+    size = sum(len(line) + 1 for line in lines)
     for role, text in dialog:
+        if size > max_chars:
+            break
         title = "User" if role == "user" else "Assistant"
-        lines.append(f"## {title}")
-        lines.append("")
-        lines.append(text.strip())
-        lines.append("")
+        body = text.strip()
+        lines.extend([f"## {title}", "", body, ""])
+        size += len(title) + len(body) + 7
     note = "\n".join(lines).strip()
     if len(note) > max_chars:
         return note[: max_chars - 3] + "..."
     return note
 
 
+def _checkpoint_path(project: Path) -> Path:
+    return project / ".codex" / "memory" / "session_checkpoints.json"
+
+
+def _load_checkpoints(path: Path) -> dict[str, dict]:
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _store_checkpoints(path: Path, updates: dict[str, dict]) -> None:
+    # Merged into the file under its lock, so a watcher, a quit-time sync and
+    # a backfill running at once each keep the other sessions' offsets.
+    with locked(path.with_name(f".{path.stem}.lock")):
+        checkpoints = _load_checkpoints(path)
+        checkpoints.update(updates)
+        atomic_write_text(path, json.dumps(checkpoints, ensure_ascii=False, indent=2))
+
+
+def _checkpoint_key(candidate: SessionCandidate) -> str:
+    return candidate.session_id or _normalize_path(str(candidate.path))
+
+
 def _find_latest_session(
     sessions_root: Path,
     project: Path,
     since_epoch: float,
-) -> Path | None:
-    project_norm = _normalize_path(str(project))
-    for candidate in _iter_session_files(sessions_root):
-        if candidate.mtime + 5 < since_epoch:
-            continue
-        lines = _load_lines(candidate.path)
-        cwd = _session_cwd(lines)
-        if not cwd:
-            continue
-        if _normalize_path(cwd) == project_norm:
-            return candidate.path
-    return None
+) -> SessionCandidate | None:
+    matches = [
+        candidate
+        for candidate in _project_sessions(sessions_root, project)
+        if candidate.mtime + 5 >= since_epoch
+    ]
+    if not matches:
+        return None
+    return max(matches, key=lambda c: c.mtime)
 
 
 def _run_sync(
@@ -150,7 +338,26 @@ def _run_sync(
     topic: str,
     note: str,
     keyword_limit: int,
-) -> int:
+    passage_chars: int,
+    continues: str | None = None,
+    created_at: float | None = None,
+) -> tuple[int, str | None]:
+    # A profiled run syncs in a child that records its own phases to the same metrics log.
+    response = None
+    if not profiling.enabled():
+        response = memory_daemon.request(
+            "sync",
+            project=str(project),
+            topic=topic,
+            note=note,
+            keyword_limit=keyword_limit,
+            passage_chars=passage_chars,
+            continues=continues,
+            created_at=created_at,
+        )
+    if response is not None:
+        print(response.get("output", ""))
+        return int(response.get("code", 1)), (response.get("entry") or {}).get("id")
     manager = script_dir / "memory_manager.py"
     with tempfile.NamedTemporaryFile(mode="w", suffix=".md", delete=False, encoding="utf-8") as tmp:
         tmp.write(note)
@@ -168,8 +375,23 @@ def _run_sync(
             tmp_path,
             "--keyword-limit",
             str(keyword_limit),
+            "--passage-chars",
+            str(passage_chars),
         ]
-        return subprocess.call(cmd)
+        if continues:
+            cmd.extend(["--continues", continues])
+        if created_at:
+            cmd.extend(["--created-at", repr(created_at)])
+        if profiling.enabled():
+            cmd.insert(2, "--profile")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        sys.stdout.write(result.stdout)
+        sys.stderr.write(result.stderr)
+        entry_id = None
+        for line in result.stdout.splitlines():
+            if line.startswith(_SYNCED_PREFIX):
+                entry_id = line[len(_SYNCED_PREFIX) :].strip()
+        return result.returncode, entry_id
     finally:
         try:
             os.remove(tmp_path)
@@ -177,16 +399,142 @@ def _run_sync(
             pass
 
 
+def _extract_session(
+    path: str,
+    topic: str,
+    max_messages: int,
+    max_chars: int,
+    passage_chars: int,
+) -> dict | None:
+    reader = _RecordReader(Path(path))
+    dialog = _extract_dialog(reader, max_messages=max_messages)
+    note = _build_note(dialog, max_chars=max_chars)
+    if not note:
+        return None
+    return {
+        "note": note,
+        "content_hash": hashlib.sha1(note.encode("utf-8")).hexdigest(),
+        "passage_terms": memory_manager.passage_terms(topic, note, passage_chars),
+        "offset": reader.offset,
+        "last_message": _message_hash(*dialog[-1]),
+    }
+
+
+def _backfill(args: argparse.Namespace, project: Path, sessions_root: Path) -> int:
+    if not memory_manager.memory_enabled(project):
+        print("Memory mode is off. Use 'on' first.")
+        return 1
+    started = time.perf_counter()
+    since_epoch = args.since_epoch or 0.0
+    checkpoint_path = _checkpoint_path(project)
+    checkpoints = _load_checkpoints(checkpoint_path)
+    with profiling.phase("load_index"):
+        index_data = memory_manager.project_backend(project).load_index()
+    known_sessions = {e["session_id"] for e in index_data.get("entries", []) if e.get("session_id")}
+    known_hashes = {e["content_hash"] for e in index_data.get("entries", []) if e.get("content_hash")}
+    with profiling.phase("session_catalog"):
+        sessions = _project_sessions(sessions_root, project)
+    pending = sorted(
+        (
+            c
+            for c in sessions
+            if c.mtime + 5 >= since_epoch
+            and _checkpoint_key(c) not in checkpoints
+            and c.session_id not in known_sessions
+        ),
+        key=lambda c: c.mtime,
+    )
+    if not pending:
+        print("No unsynced session logs found for backfill.")
+        return 0
+
+    profiling.count("sessions", len(pending))
+    with profiling.phase("extract_sessions"), ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(
+            pool.map(
+                _extract_session,
+                [str(c.path) for c in pending],
+                repeat(args.topic),
+                repeat(args.max_messages),
+                repeat(args.max_chars),
+                repeat(args.passage_chars),
+                chunksize=max(1, len(pending) // (4 * (args.workers or os.cpu_count() or 1))),
+            )
+        )
+
+    notes, sources = [], []
+    for candidate, result in zip(pending, results):
+        if result is None or result["content_hash"] in known_hashes:
+            continue
+        known_hashes.add(result["content_hash"])
+        notes.append(
+            {
+                "text": result["note"],
+                "topic": args.topic,
+                "passage_terms": result["passage_terms"],
+                "session_id": candidate.session_id,
+                "content_hash": result["content_hash"],
+                "created_at": candidate.mtime,
+            }
+        )
+        sources.append((candidate, result))
+    with profiling.phase("sync_notes"):
+        entries = memory_manager.sync_notes(
+            project,
+            notes,
+            keyword_limit=args.keyword_limit,
+            passage_chars=args.passage_chars,
+        )
+    _store_checkpoints(
+        checkpoint_path,
+        {
+            _checkpoint_key(candidate): {
+                "path": str(candidate.path),
+                "session_id": candidate.session_id,
+                "offset": result["offset"],
+                "last_message": result["last_message"],
+                "entry_id": entry["id"],
+                "synced_at": time.time(),
+            }
+            for entry, (candidate, result) in zip(entries, sources)
+        },
+    )
+
+    elapsed = time.perf_counter() - started
+    rate = len(pending) / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Backfilled {len(entries)} sessions ({len(pending) - len(entries)} skipped as empty or duplicate) "
+        f"in {elapsed:.2f}s ({rate:.1f} sessions/s)."
+    )
+    return 0
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Extract latest Codex session and sync memory")
     parser.add_argument("--project", required=True, help="Project root path")
-    parser.add_argument("--since-epoch", type=float, required=True, help="Session start epoch seconds")
+    parser.add_argument("--since-epoch", type=float, help="Session start epoch seconds")
     parser.add_argument("--topic", default="session-auto", help="Memory topic")
     parser.add_argument("--sessions-root", help="Override Codex sessions directory")
     parser.add_argument("--max-messages", type=int, default=80)
     parser.add_argument("--max-chars", type=int, default=12000)
     parser.add_argument("--keyword-limit", type=int, default=24)
+    parser.add_argument("--passage-chars", type=int, default=2000)
+    parser.add_argument("--backfill", action="store_true", help="Sync every unsynced session log for the project")
+    parser.add_argument("--workers", type=int, help="Backfill extraction processes (default: CPU count)")
+    parser.add_argument("--from-start", action="store_true", help="Ignore the saved checkpoint and resync the whole session")
+    parser.add_argument("--watch", action="store_true", help="Tail the active session log and sync new dialog as it arrives")
+    parser.add_argument("--debounce", type=float, default=5.0, help="Watch: seconds of quiet before flushing new dialog")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Watch: stat polling interval when inotify is unavailable")
+    parser.add_argument("--rescan", type=float, default=30.0, help="Watch: seconds between checks for a newer session log")
+    parser.add_argument("--watch-pid", type=int, help="Watch: exit once this process is gone")
+    parser.add_argument("--stop-file", help="Watch: flush and exit once this file exists")
+    parser.add_argument("--profile", action="store_true", help="Print per-phase timings and append them to .codex/memory/metrics.jsonl")
+    parser.add_argument("--profile-dump", help="Also write cProfile stats to this file")
     args = parser.parse_args()
+    if args.since_epoch is None and not (args.backfill or args.watch):
+        parser.error("--since-epoch is required unless --backfill or --watch is given")
+    if args.backfill and args.watch:
+        parser.error("--backfill and --watch are mutually exclusive")
 
     project = Path(args.project).resolve()
     if args.sessions_root:
@@ -194,24 +542,248 @@ def main() -> int:
     else:
         sessions_root = Path.home() / ".codex" / "sessions"
 
-    target = _find_latest_session(sessions_root, project, args.since_epoch)
+    if args.watch:
+        return _watch(args, project, sessions_root)
+
+    profiling.start("auto-sync-backfill" if args.backfill else "auto-sync", enable=args.profile, dump_path=args.profile_dump)
+    code = None
+    try:
+        if args.backfill:
+            code = _backfill(args, project, sessions_root)
+        else:
+            code = _sync_latest(args, project, sessions_root)
+        return code
+    finally:
+        profiling.finish(project, code, echo=args.profile)
+
+
+def _sync_latest(args: argparse.Namespace, project: Path, sessions_root: Path) -> int:
+    with profiling.phase("find_latest_session"):
+        target = _find_latest_session(sessions_root, project, args.since_epoch)
     if not target:
         print("No matching session log found for auto sync.")
         return 1
 
-    lines = _load_lines(target)
-    dialog = _extract_dialog(lines, max_messages=args.max_messages)
-    note = _build_note(dialog, max_chars=args.max_chars)
+    checkpoint_path = _checkpoint_path(project)
+    key = _checkpoint_key(target)
+    # --from-start only forgets this session's checkpoint.
+    checkpoint = {} if args.from_start else _load_checkpoints(checkpoint_path).get(key, {})
+    with profiling.phase("extract_dialog"):
+        reader = _RecordReader(target.path, int(checkpoint.get("offset", 0)))
+        dialog = _extract_dialog(reader, max_messages=args.max_messages)
+        if reader.reset and checkpoint.get("last_message"):
+            # The log shrank or was replaced: rescan it, skipping what was already synced.
+            reader = _RecordReader(target.path)
+            dialog = _extract_dialog(reader, args.max_messages, after_hash=checkpoint["last_message"])
+        note = _build_note(dialog, max_chars=args.max_chars, continued=bool(checkpoint))
+    profiling.count("messages", len(dialog))
     if not note:
+        if checkpoint:
+            print(f"No new dialog since last sync of session: {target.path}")
+            return 0
         print("Session log found but no user/assistant dialog to sync.")
         return 1
 
     script_dir = Path(__file__).resolve().parent
-    code = _run_sync(script_dir, project, args.topic, note, args.keyword_limit)
+    with profiling.phase("sync"):
+        code, entry_id = _run_sync(
+            script_dir,
+            project,
+            args.topic,
+            note,
+            args.keyword_limit,
+            args.passage_chars,
+            continues=checkpoint.get("entry_id"),
+            # Stamped with the session's last activity, not the time of this run.
+            created_at=target.mtime,
+        )
     if code == 0:
-        print(f"Auto-synced from session: {target}")
+        _store_checkpoints(
+            checkpoint_path,
+            {
+                key: {
+                    "path": str(target.path),
+                    "session_id": target.session_id,
+                    "offset": reader.offset,
+                    "last_message": _message_hash(*dialog[-1]),
+                    "entry_id": entry_id,
+                    "synced_at": time.time(),
+                }
+            },
+        )
+        print(f"Auto-synced from session: {target.path}")
     return code
 
 
+class _SessionTail:
+    # Incremental state for one session log: the byte offset parsed so far,
+    # the dialog read past the last flush, and the dialog of the flush in
+    # flight. last_message only moves once that flush has synced.
+    def __init__(self, target: SessionCandidate, checkpoint: dict) -> None:
+        self.target = target
+        self.key = _checkpoint_key(target)
+        self.offset = int(checkpoint.get("offset", 0))
+        self.last_message = checkpoint.get("last_message")
+        self.pending: list[tuple[str, str]] = []
+        self.pending_chars = 0
+        self.in_flight: list[tuple[str, str]] = []
+        self.changed_at = 0.0
+
+    def read(self) -> int:
+        reader = _RecordReader(self.target.path, self.offset)
+        try:
+            fresh = list(_iter_dialog(reader))
+            if reader.reset and self.last_message:
+                reader = _RecordReader(self.target.path)
+                self.pending = []
+                self.pending_chars = 0
+                fresh = _extract_dialog(reader, 0, after_hash=self.last_message)
+        except OSError:
+            return 0
+        self.offset = reader.offset
+        if fresh:
+            self.pending.extend(fresh)
+            self.pending_chars += sum(len(text) for _, text in fresh)
+            self.changed_at = time.monotonic()
+        return len(fresh)
+
+    def take(self) -> tuple[list[tuple[str, str]], int]:
+        self.in_flight, self.pending, self.pending_chars = self.pending, [], 0
+        return self.in_flight, self.offset
+
+    def settle(self, synced: bool) -> None:
+        # A failed flush puts its dialog back in front of what arrived since,
+        # to be retried after another debounce.
+        dialog, self.in_flight = self.in_flight, []
+        if synced:
+            self.last_message = _message_hash(*dialog[-1])
+            return
+        self.pending = dialog + self.pending
+        self.pending_chars += sum(len(text) for _, text in dialog)
+        self.changed_at = time.monotonic()
+
+
+def _flush_increment(
+    args: argparse.Namespace,
+    project: Path,
+    target: SessionCandidate,
+    key: str,
+    dialog: list[tuple[str, str]],
+    offset: int,
+) -> bool:
+    # Runs on the single flush thread, so increments land in order and each one
+    # continues the entry written by the previous flush.
+    checkpoint_path = _checkpoint_path(project)
+    checkpoint = _load_checkpoints(checkpoint_path).get(key, {})
+    note = _build_note(dialog, max_chars=args.max_chars, continued=bool(checkpoint))
+    try:
+        code, entry_id = _run_sync(
+            Path(__file__).resolve().parent,
+            project,
+            args.topic,
+            note,
+            args.keyword_limit,
+            args.passage_chars,
+            continues=checkpoint.get("entry_id"),
+        )
+    except OSError:
+        code = 1
+    if code != 0:
+        print(f"Watch sync failed for session: {target.path}", file=sys.stderr)
+        return False
+    _store_checkpoints(
+        checkpoint_path,
+        {
+            key: {
+                "path": str(target.path),
+                "session_id": target.session_id,
+                "offset": offset,
+                "last_message": _message_hash(*dialog[-1]),
+                "entry_id": entry_id,
+                "synced_at": time.time(),
+            }
+        },
+    )
+    sys.stdout.flush()
+    return True
+
+
+def _watch(args: argparse.Namespace, project: Path, sessions_root: Path) -> int:
+    if not memory_manager.memory_enabled(project):
+        print("Memory mode is off. Use 'on' first.")
+        return 1
+    since_epoch = args.since_epoch if args.since_epoch is not None else time.time()
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    flusher = ThreadPoolExecutor(max_workers=1)
+    tail: _SessionTail | None = None
+    watcher: FileWatcher | None = None
+    in_flight: tuple[_SessionTail, Future] | None = None
+    next_rescan = 0.0
+
+    def settle() -> None:
+        nonlocal in_flight
+        if in_flight is not None:
+            owner, future = in_flight
+            in_flight = None
+            owner.settle(future.exception() is None and future.result())
+
+    def flush() -> None:
+        # One flush in flight at a time, so a failed one can be requeued
+        # before the next takes the pending dialog.
+        nonlocal in_flight
+        settle()
+        if tail is not None and tail.pending:
+            dialog, offset = tail.take()
+            in_flight = (tail, flusher.submit(_flush_increment, args, project, tail.target, tail.key, dialog, offset))
+
+    try:
+        while not stop.is_set():
+            if args.watch_pid and not pid_alive(args.watch_pid):
+                break
+            if args.stop_file and Path(args.stop_file).exists():
+                break
+            if in_flight is not None and in_flight[1].done():
+                settle()
+            now = time.monotonic()
+            if now >= next_rescan:
+                next_rescan = now + args.rescan
+                latest = _find_latest_session(sessions_root, project, since_epoch)
+                if latest is not None and (tail is None or latest.path != tail.target.path):
+                    flush()
+                    if watcher is not None:
+                        watcher.close()
+                    tail = _SessionTail(latest, _load_checkpoints(_checkpoint_path(project)).get(_checkpoint_key(latest), {}))
+                    watcher = FileWatcher(latest.path, args.poll_interval)
+                    print(f"Watching session ({watcher.mode}): {latest.path}")
+                    sys.stdout.flush()
+                    tail.read()
+            if tail is None or watcher is None:
+                stop.wait(min(args.poll_interval, max(next_rescan - now, 0.0)))
+                continue
+            timeout = min(args.poll_interval, max(next_rescan - now, 0.0))
+            if tail.pending:
+                timeout = min(timeout, max(tail.changed_at + args.debounce - now, 0.0))
+            if watcher.wait(timeout):
+                tail.read()
+            if tail.pending and (
+                time.monotonic() - tail.changed_at >= args.debounce
+                or len(tail.pending) >= args.max_messages
+                or tail.pending_chars >= args.max_chars
+            ):
+                flush()
+        if tail is not None:
+            tail.read()
+        flush()
+        settle()
+    finally:
+        flusher.shutdown(wait=True)
+        if watcher is not None:
+            watcher.close()
+    return 0
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
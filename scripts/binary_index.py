@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any
+
+from locking import atomic_write_bytes
+from recall_engine import BM25_B, BM25_K1, RecallIndex, TextScan, fallback_text
+
+_MAGIC = b"MMIDX02\0"
+# magic, source size, source mtime_ns, entries, terms, postings, total keyword length
+_HEADER = struct.Struct("<8sQqIIQQ")
+
+
+def binary_path(index_path: Path) -> Path:
+    return index_path.with_suffix(".bin")
+
+
+def _source_stamp(index_path: Path) -> tuple[int, int]:
+    stat = index_path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+# Section helpers shared with simhash_index's band file: little-endian array
+# bytes, each section padded to an 8-byte boundary.
+def le_bytes(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def pad8(data: bytes) -> bytes:
+    return data + b"\0" * (-len(data) % 8)
+
+
+def build_binary_index(index_path: Path, index_data: dict[str, Any]) -> None:
+    # Snapshot of index.json as flat little-endian arrays: a sorted keyword
+    # dictionary, postings of (entry ordinal, tf) per keyword, per-entry
+    # keyword counts, one JSON blob per entry and the entry ids by ordinal.
+    # Tied to the index.json it was built from by size and mtime.
+    entries = index_data.get("entries", [])
+    postings: dict[bytes, list[tuple[int, int]]] = {}
+    lengths = array("I")
+    entry_offsets = array("Q", [0])
+    entry_blobs = []
+    id_offsets = array("I", [0])
+    ids = []
+    total_length = 0
+    for ordinal, entry in enumerate(entries):
+        keywords = entry.get("keywords", [])
+        tfs = entry.get("keyword_tf") or []
+        for pos, keyword in enumerate(keywords):
+            tf = max(int(tfs[pos]), 1) if pos < len(tfs) else 1
+            postings.setdefault(keyword.encode("utf-8"), []).append((ordinal, tf))
+        lengths.append(len(keywords))
+        total_length += len(keywords)
+        blob = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        entry_blobs.append(blob)
+        entry_offsets.append(entry_offsets[-1] + len(blob))
+        entry_id = entry["id"].encode("utf-8")
+        ids.append(entry_id)
+        id_offsets.append(id_offsets[-1] + len(entry_id))
+
+    terms = sorted(postings)
+    term_offsets = array("I", [0])
+    post_offsets = array("I", [0])
+    post_ids = array("I")
+    post_tfs = array("I")
+    for term in terms:
+        term_offsets.append(term_offsets[-1] + len(term))
+        for ordinal, tf in postings[term]:
+            post_ids.append(ordinal)
+            post_tfs.append(tf)
+        post_offsets.append(len(post_ids))
+
+    size, mtime_ns = _source_stamp(index_path)
+    header = _HEADER.pack(_MAGIC, size, mtime_ns, len(entries), len(terms), len(post_ids), total_length)
+    sections = [
+        le_bytes(term_offsets),
+        b"".join(terms),
+        le_bytes(post_offsets),
+        le_bytes(post_ids),
+        le_bytes(post_tfs),
+        le_bytes(lengths),
+        le_bytes(entry_offsets),
+        b"".join(entry_blobs),
+        le_bytes(id_offsets),
+        b"".join(ids),
+    ]
+    atomic_write_bytes(binary_path(index_path), pad8(header) + b"".join(pad8(s) for s in sections))
+
+
+class BinaryIndex:
+    def __init__(self, path: Path, source_stamp: tuple[int, int]) -> None:
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, size, mtime_ns, entries, terms, postings, total_length = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or (size, mtime_ns) != source_stamp:
+            self._mm.close()
+            raise ValueError("stale binary index")
+        self.doc_count = entries
+        self.term_count = terms
+        self.total_length = total_length
+        view = memoryview(self._mm)
+        pos = _HEADER.size + (-_HEADER.size % 8)
+
+        def section(nbytes: int) -> memoryview:
+            nonlocal pos
+            chunk = view[pos : pos + nbytes]
+            pos += nbytes + (-nbytes % 8)
+            return chunk
+
+        self._term_offsets = section((terms + 1) * 4).cast("I")
+        self._term_blob = section(self._term_offsets[terms])
+        self._post_offsets = section((terms + 1) * 4).cast("I")
+        self._post_ids = section(postings * 4).cast("I")
+        self._post_tfs = section(postings * 4).cast("I")
+        self.lengths = section(entries * 4).cast("I")
+        self._entry_offsets = section((entries + 1) * 8).cast("Q")
+        self._entry_blob = section(self._entry_offsets[entries])
+        self._id_offsets = section((entries + 1) * 4).cast("I")
+        self._id_blob = section(self._id_offsets[entries])
+        self._ordinals: dict[str, int] | None = None
+
+    def _term(self, pos: int) -> bytes:
+        return bytes(self._term_blob[self._term_offsets[pos] : self._term_offsets[pos + 1]])
+
+    def postings(self, term: str) -> tuple[memoryview, memoryview]:
+        key = term.encode("utf-8")
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.term_count or self._term(lo) != key:
+            return self._post_ids[0:0], self._post_tfs[0:0]
+        start, end = self._post_offsets[lo], self._post_offsets[lo + 1]
+        return self._post_ids[start:end], self._post_tfs[start:end]
+
+    def vocabulary(self) -> list[str]:
+        blob = bytes(self._term_blob)
+        offsets = self._term_offsets
+        return [blob[offsets[i] : offsets[i + 1]].decode("utf-8") for i in range(self.term_count)]
+
+    def entry(self, ordinal: int) -> dict[str, Any]:
+        start, end = self._entry_offsets[ordinal], self._entry_offsets[ordinal + 1]
+        return json.loads(bytes(self._entry_blob[start:end]))
+
+    def ordinal(self, entry_id: str) -> int | None:
+        # Decodes only the id section, once, to resolve ids without entry blobs.
+        if self._ordinals is None:
+            blob = bytes(self._id_blob)
+            offsets = self._id_offsets
+            self._ordinals = {blob[offsets[i] : offsets[i + 1]].decode("utf-8"): i for i in range(self.doc_count)}
+        return self._ordinals.get(entry_id)
+
+
+class BinaryRecallIndex:
+    # Memory-mapped snapshot plus the not-yet-compacted log tail, scored as one
+    # BM25 collection; entries are only deserialized for the final top-k.
+    def __init__(self, binary: BinaryIndex, tail: RecallIndex) -> None:
+        self.binary = binary
+        self.tail = tail
+        self.tail_ids = list(tail.entries_by_id)
+        self._vocabulary: list[str] | None = None
+        self._text_scan: TextScan | None = None
+
+    def __len__(self) -> int:
+        return self.binary.doc_count + len(self.tail_ids)
+
+    def doc_freq(self, term: str) -> int:
+        return len(self.binary.postings(term)[0]) + self.tail.doc_freq(term)
+
+    def expand(self, term: str) -> list[str]:
+        if self._vocabulary is None:
+            self._vocabulary = self.binary.vocabulary()
+        found = {keyword for keyword in self._vocabulary if term in keyword}
+        found.update(self.tail.expand(term))
+        return list(found)
+
+    def lookup(self, entry_ids: list[str]) -> dict[str, dict[str, Any]]:
+        found = {}
+        for entry_id in entry_ids:
+            entry = self.tail.entries_by_id.get(entry_id)
+            if entry is None:
+                ordinal = self.binary.ordinal(entry_id)
+                entry = self.binary.entry(ordinal) if ordinal is not None else None
+            if entry is not None:
+                found[entry_id] = entry
+        return found
+
+    def substring_search(self, terms: set[str], max_results: int) -> list[tuple[float, dict[str, Any]]]:
+        # The only path that decodes every snapshot entry, once per open index.
+        base = self.binary.doc_count
+        if self._text_scan is None:
+            texts = [fallback_text(self.binary.entry(ordinal)) for ordinal in range(base)]
+            texts.extend(fallback_text(self.tail.entries_by_id[entry_id]) for entry_id in self.tail_ids)
+            self._text_scan = TextScan(texts)
+        top = heapq.nlargest(max_results, self._text_scan.counts(terms).items(), key=lambda item: (item[1], item[0]))
+        results, seen = [], set()
+        for key, count in top:
+            if key < base:
+                entry = self.binary.entry(key)
+            else:
+                entry = self.tail.entries_by_id[self.tail_ids[key - base]]
+            if entry["id"] in seen:
+                continue
+            seen.add(entry["id"])
+            results.append((float(count), entry))
+        return results
+
+    def search(self, terms: set[str], max_results: int) -> list[tuple[float, dict[str, Any]]]:
+        base = self.binary.doc_count
+        doc_count = base + len(self.tail.entries_by_id)
+        if not doc_count or max_results <= 0:
+            return []
+        avg_length = (self.binary.total_length + self.tail.total_length) / doc_count or 1.0
+        lengths = self.binary.lengths
+        scores: dict[int, float] = {}
+        for term in terms:
+            ids, tfs = self.binary.postings(term)
+            tail_ids = self.tail.keyword_map.get(term, [])
+            df = len(ids) + len(tail_ids)
+            if not df:
+                continue
+            idf = math.log(1.0 + (doc_count - df + 0.5) / (df + 0.5))
+            for ordinal, tf in zip(ids, tfs):
+                norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * (lengths[ordinal] or 1) / avg_length)
+                scores[ordinal] = scores.get(ordinal, 0.0) + idf * tf * (BM25_K1 + 1.0) / norm
+            for entry_id in tail_ids:
+                entry = self.tail.entries_by_id.get(entry_id)
+                if entry is None:
+                    continue
+                tf = self.tail._term_frequency(entry, term)
+                length = len(entry.get("keywords", [])) or 1
+                norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * length / avg_length)
+                key = base + self.tail.ordinals[entry_id]
+                scores[key] = scores.get(key, 0.0) + idf * tf * (BM25_K1 + 1.0) / norm
+        top = heapq.nlargest(max_results, scores.items(), key=lambda item: (item[1], item[0]))
+        results, seen = [], set()
+        for key, score in top:
+            if key < base:
+                entry = self.binary.entry(key)
+            else:
+                entry = self.tail.entries_by_id[self.tail_ids[key - base]]
+            # A crash between compaction and log cleanup can leave an id in both.
+            if entry["id"] in seen:
+                continue
+            seen.add(entry["id"])
+            results.append((score, entry))
+        return results
+
+
+def open_binary_recall(index_path: Path, tail_data: dict[str, Any]) -> BinaryRecallIndex | None:
+    path = binary_path(index_path)
+    if sys.byteorder != "little" or not path.exists() or not index_path.exists():
+        return None
+    try:
+        binary = BinaryIndex(path, _source_stamp(index_path))
+    except (OSError, ValueError, struct.error):
+        return None
+    return BinaryRecallIndex(binary, RecallIndex(tail_data))
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Any
+
+from locking import locked
+
+_PACK_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+_CODECS = ("zlib", "lzma")
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "lzma":
+        import lzma
+
+        return lzma.compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "lzma":
+        import lzma
+
+        return lzma.decompress(data)
+    return zlib.decompress(data)
+
+
+def pack_dir(root: Path) -> Path:
+    return root / "docs" / "memory" / "packs"
+
+
+def _active_pack(directory: Path) -> Path:
+    segments = sorted(directory.glob("pack-*.pack"))
+    if segments and segments[-1].stat().st_size < _PACK_SEGMENT_MAX_BYTES:
+        return segments[-1]
+    next_no = int(segments[-1].stem.split("-")[1]) + 1 if segments else 1
+    return directory / f"pack-{next_no:06d}.pack"
+
+
+def write_packed(root: Path, bodies: list[bytes], codec: str = "zlib") -> list[dict[str, Any]]:
+    # Each body becomes one independently compressed record appended to the
+    # active segment; the returned refs are the offset table kept in the index.
+    if codec not in _CODECS:
+        raise ValueError(f"Unknown detail codec: {codec}")
+    directory = pack_dir(root)
+    directory.mkdir(parents=True, exist_ok=True)
+    blobs = [_compress(body, codec) for body in bodies]
+    with locked(directory / ".pack.lock"):
+        refs = _append_blobs(directory, blobs)
+    for ref in refs:
+        ref["codec"] = codec
+    return refs
+
+
+def _append_blobs(directory: Path, blobs: list[bytes]) -> list[dict[str, Any]]:
+    # Callers hold the pack lock.
+    refs = []
+    segment = _active_pack(directory)
+    with segment.open("ab") as f:
+        position = f.seek(0, os.SEEK_END)
+        for blob in blobs:
+            refs.append({"segment": segment.name, "offset": position, "size": len(blob)})
+            position += len(blob)
+        f.write(b"".join(blobs))
+        f.flush()
+        os.fsync(f.fileno())
+    return refs
+
+
+def read_packed(root: Path, ref: dict[str, Any]) -> bytes:
+    with (pack_dir(root) / ref["segment"]).open("rb") as f:
+        f.seek(ref["offset"])
+        blob = f.read(ref["size"])
+    return _decompress(blob, ref.get("codec", "zlib"))
+
+
+def _stored_body(root: Path, entry: dict[str, Any]) -> bytes:
+    # Whole detail body of an entry kept in a pack or in a database backend.
+    if entry.get("store") == "sqlite":
+        from sqlite_backend import read_body
+
+        return read_body(root / "docs" / "memory" / "index.json", entry.get("note_id", entry["id"]))
+    return read_packed(root, entry["pack"])
+
+
+def read_detail_text(root: Path, entry: dict[str, Any], limit: int | None = None) -> str:
+    # Text of an entry's byte range (the whole file for legacy entries), read
+    # from its pack record or detail file and capped at `limit` bytes.
+    offset = entry.get("offset", 0)
+    length = entry.get("length")
+    if length is not None and limit is not None:
+        length = min(length, limit)
+    elif length is None:
+        length = limit
+    if "pack" in entry or "store" in entry:
+        body = _stored_body(root, entry)
+        data = body[offset:] if length is None else body[offset : offset + length]
+    else:
+        with (root / entry["detail_path"]).open("rb") as f:
+            f.seek(offset)
+            data = f.read() if length is None else f.read(length)
+    return data.decode("utf-8", errors="ignore")
+
+
+def export_packed(root: Path, entries: list[dict[str, Any]], overwrite: bool = False) -> int:
+    written = 0
+    seen = set()
+    for entry in entries:
+        if ("pack" not in entry and "store" not in entry) or entry["detail_path"] in seen:
+            continue
+        seen.add(entry["detail_path"])
+        target = root / entry["detail_path"]
+        if target.exists() and not overwrite:
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(_stored_body(root, entry))
+        written += 1
+    return written
+
+
+def repack(
+    root: Path,
+    entries: list[dict[str, Any]],
+    min_live: float = 0.5,
+    min_age: float = 600.0,
+) -> tuple[list[Path], int]:
+    # Copies the live records of sealed segments that are mostly dead into the
+    # active segment and repoints `entries` at the copies. Returns the segments
+    # no entry references any more, for the caller to delete once the updated
+    # index is saved, and the bytes that frees. The active segment and recently
+    # written ones are never touched: a sync may have records there it has not
+    # indexed yet.
+    directory = pack_dir(root)
+    if not directory.exists():
+        return [], 0
+    by_segment: dict[str, dict[int, list[dict[str, Any]]]] = {}
+    for entry in entries:
+        if "pack" in entry:
+            ref = entry["pack"]
+            by_segment.setdefault(ref["segment"], {}).setdefault(ref["offset"], []).append(entry)
+    dead, freed = [], 0
+    with locked(directory / ".pack.lock"):
+        segments = sorted(directory.glob("pack-*.pack"))
+        active = _active_pack(directory)
+        cutoff = time.time() - min_age
+        for segment in segments:
+            stat = segment.stat()
+            if segment >= active or stat.st_mtime > cutoff:
+                continue
+            size = stat.st_size
+            records = by_segment.get(segment.name, {})
+            live = sum(group[0]["pack"]["size"] for group in records.values())
+            if records and live >= size * min_live:
+                continue
+            if records:
+                with segment.open("rb") as f:
+                    blobs = []
+                    for offset, group in sorted(records.items()):
+                        f.seek(offset)
+                        blobs.append(f.read(group[0]["pack"]["size"]))
+                for (_, group), ref in zip(sorted(records.items()), _append_blobs(directory, blobs)):
+                    for entry in group:
+                        entry["pack"] = dict(entry["pack"], segment=ref["segment"], offset=ref["offset"])
+            dead.append(segment)
+            freed += size - live
+    return dead, freed
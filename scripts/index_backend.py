@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable
+
+from binary_index import BinaryRecallIndex, open_binary_recall
+from index_store import (
+    append_entries,
+    compact_index,
+    current_doc_freqs,
+    index_signature,
+    load_index,
+    load_log_index,
+    rewrite_index,
+)
+from recall_engine import RecallIndex
+
+BACKENDS = ("json", "sqlite")
+
+
+class JsonBackend:
+    # index.json snapshot plus the append-only log (index_store); detail
+    # bodies live in files or packs written by the caller. Recall scores
+    # keyword postings in Python, from index.bin when it is current.
+    name = "json"
+    stores_details = False
+    warm_index = True
+
+    def __init__(self, index_path: Path) -> None:
+        self.index_path = index_path
+
+    def close(self) -> None:
+        pass
+
+    def signature(self) -> tuple:
+        return index_signature(self.index_path)
+
+    def load_index(self) -> dict[str, Any]:
+        return load_index(self.index_path)
+
+    def doc_stats(self) -> tuple[int, dict[str, int]]:
+        return current_doc_freqs(self.index_path)
+
+    def append(
+        self,
+        entries: list[dict[str, Any]],
+        doc_terms: list[list[str]] | None = None,
+        bodies: dict[str, bytes] | None = None,
+        bump: bool = True,
+    ) -> None:
+        append_entries(self.index_path, entries, doc_terms, bump)
+
+    def rewrite(
+        self,
+        update: Callable[[list[dict[str, Any]]], list[dict[str, Any]]],
+        after: Callable[[list[dict[str, Any]]], None] | None = None,
+    ) -> int:
+        return rewrite_index(self.index_path, update, after)
+
+    def compact(self) -> tuple[int, int]:
+        return compact_index(self.index_path)
+
+    def missing_bodies(self) -> set[str]:
+        # Detail files and packs are checked by maintenance.check_details.
+        return set()
+
+    def check(self) -> list[str]:
+        return []
+
+    def recall_index(self) -> BinaryRecallIndex | RecallIndex:
+        recall_index = open_binary_recall(self.index_path, load_log_index(self.index_path))
+        return recall_index if recall_index is not None else RecallIndex(self.load_index())
+
+
+def open_backend(index_path: Path, name: str = "json"):
+    if name == "sqlite":
+        from sqlite_backend import SqliteBackend
+
+        return SqliteBackend(index_path)
+    if name != "json":
+        raise ValueError(f"Unknown index backend: {name}")
+    return JsonBackend(index_path)
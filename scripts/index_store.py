@@ -1,21 +1,167 @@
 from __future__ import annotations
 
 import json
+import os
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator
+from uuid import uuid4
+
+from binary_index import build_binary_index
+from locking import atomic_write_text, locked
+
+_SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+# Every sync replays the document-frequency log, so appends fold it into the
+# snapshot once it grows past this (a few hundred notes' worth of terms).
+_DOC_FREQ_LOG_MAX_BYTES = 1024 * 1024
+
+
+def _log_dir(index_path: Path) -> Path:
+    return index_path.with_name(f"{index_path.stem}-log")
+
+
+def _spool_dir(index_path: Path) -> Path:
+    return index_path.with_name(f"{index_path.stem}-pending")
+
+
+def _lock_path(index_path: Path) -> Path:
+    return index_path.with_name(f".{index_path.stem}.lock")
+
+
+@contextmanager
+def locked_index(index_path: Path) -> Iterator[None]:
+    with locked(_lock_path(index_path)):
+        yield
+
+
+def _generation_path(index_path: Path) -> Path:
+    return index_path.with_name(f"{index_path.stem}.generation")
+
+
+def index_generation(index_path: Path) -> int:
+    # Bumped by every commit that changes what readers see; result caches key on it.
+    try:
+        return int(_generation_path(index_path).read_text(encoding="utf-8") or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_generation(index_path: Path) -> None:
+    # Callers hold locked_index().
+    atomic_write_text(_generation_path(index_path), str(index_generation(index_path) + 1))
+
+
+def publish_generation(index_path: Path) -> None:
+    # For writers that appended with bump=False and have since written their
+    # sidecars; caches keyed on the old generation stop serving from here.
+    with locked_index(index_path):
+        bump_generation(index_path)
+
+
+def _segments(index_path: Path) -> list[Path]:
+    log_dir = _log_dir(index_path)
+    if not log_dir.exists():
+        return []
+    return sorted(log_dir.glob("segment-*.jsonl"))
+
+
+def _replay_segment(segment: Path, index_data: dict[str, Any], seen: set[str]) -> None:
+    with segment.open("r", encoding="utf-8") as f:
+        for raw in f:
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                entry = json.loads(raw)
+            except json.JSONDecodeError:
+                # A torn tail record from an interrupted append is skipped, not fatal.
+                continue
+            # A crash between a commit and its spool cleanup can replay a record twice.
+            if entry.get("id") in seen:
+                continue
+            seen.add(entry.get("id"))
+            add_entry(index_data, entry)
+
+
+def index_signature(index_path: Path) -> tuple:
+    # Cheap change detector for warm caches: snapshot plus every log segment.
+    parts = []
+    for path in [index_path, *_segments(index_path)]:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        parts.append((path.name, stat.st_size, stat.st_mtime_ns))
+    return tuple(parts)
+
+
+def snapshot_stamp(index_path: Path) -> tuple[int, int] | None:
+    try:
+        stat = index_path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def read_log_tail(
+    index_path: Path,
+    snapshot: tuple[int, int] | None,
+    offsets: dict[str, int],
+) -> tuple[list[dict[str, Any]], dict[str, int]] | None:
+    # Records appended to the log since `offsets` (bytes already read per
+    # segment), whoever wrote them, for readers that keep a warm copy. Only
+    # complete lines are consumed. None means the snapshot was replaced or a
+    # segment folded (compact, rewrite) and the reader must load again.
+    if snapshot_stamp(index_path) != snapshot:
+        return None
+    segments = _segments(index_path)
+    names = {segment.name for segment in segments}
+    if any(name not in names for name in offsets):
+        return None
+    entries: list[dict[str, Any]] = []
+    read_to: dict[str, int] = {}
+    for segment in segments:
+        start = offsets.get(segment.name, 0)
+        with segment.open("rb") as f:
+            f.seek(start)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for raw in data[:end].splitlines():
+            try:
+                entries.append(json.loads(raw))
+            except json.JSONDecodeError:
+                continue
+        read_to[segment.name] = start + end
+    return entries, read_to
 
 
 def load_index(index_path: Path) -> dict[str, Any]:
-    if not index_path.exists():
-        return {"entries": [], "keywords": {}}
-    return json.loads(index_path.read_text(encoding="utf-8"))
+    if index_path.exists():
+        index_data = json.loads(index_path.read_text(encoding="utf-8"))
+    else:
+        index_data = {"entries": [], "keywords": {}}
+    segments = _segments(index_path)
+    if segments:
+        seen = {entry.get("id") for entry in index_data.get("entries", [])}
+        for segment in segments:
+            _replay_segment(segment, index_data, seen)
+    return index_data
+
+
+def load_log_index(index_path: Path) -> dict[str, Any]:
+    # Only the not-yet-compacted log tail, for readers that map the snapshot.
+    index_data = {"entries": [], "keywords": {}}
+    seen: set[str] = set()
+    for segment in _segments(index_path):
+        _replay_segment(segment, index_data, seen)
+    return index_data
 
 
 def save_index(index_path: Path, index_data: dict[str, Any]) -> None:
-    index_path.parent.mkdir(parents=True, exist_ok=True)
-    index_path.write_text(
-        json.dumps(index_data, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
+    # Callers doing read-modify-write must hold locked_index(); the replace is atomic.
+    atomic_write_text(index_path, json.dumps(index_data, ensure_ascii=False, indent=2))
+    bump_generation(index_path)
 
 
 def add_entry(index_data: dict[str, Any], entry: dict[str, Any]) -> None:
@@ -24,3 +170,193 @@ def add_entry(index_data: dict[str, Any], entry: dict[str, Any]) -> None:
     for keyword in entry.get("keywords", []):
         keyword_map.setdefault(keyword, []).append(entry["id"])
 
+
+def _active_segment(index_path: Path) -> Path:
+    log_dir = _log_dir(index_path)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    segments = _segments(index_path)
+    if segments and segments[-1].stat().st_size < _SEGMENT_MAX_BYTES:
+        return segments[-1]
+    next_no = int(segments[-1].stem.split("-")[1]) + 1 if segments else 1
+    return log_dir / f"segment-{next_no:06d}.jsonl"
+
+
+def _trim_torn_tail(path: Path) -> None:
+    # A crash mid-append leaves a last line without its newline; appending
+    # after it would glue the next record onto it and replay would drop both.
+    # The torn record's spool ticket is only removed after a complete write,
+    # so cutting it off loses nothing: this commit writes it again.
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return
+    if not size:
+        return
+    with path.open("rb+") as f:
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        f.truncate(end)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _doc_freq_paths(index_path: Path) -> tuple[Path, Path]:
+    return (
+        index_path.with_name("doc_freqs.json"),
+        index_path.with_name("doc_freqs-log.jsonl"),
+    )
+
+
+def load_doc_freqs(index_path: Path) -> tuple[int, dict[str, int]]:
+    snapshot_path, log_path = _doc_freq_paths(index_path)
+    doc_count, doc_freqs = 0, {}
+    if snapshot_path.exists():
+        data = json.loads(snapshot_path.read_text(encoding="utf-8"))
+        doc_count, doc_freqs = data.get("docs", 0), data.get("df", {})
+    if log_path.exists():
+        with log_path.open("r", encoding="utf-8") as f:
+            for raw in f:
+                try:
+                    delta = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                doc_count += delta.get("docs", 0)
+                for term, count in delta.get("df", {}).items():
+                    doc_freqs[term] = doc_freqs.get(term, 0) + count
+    return doc_count, doc_freqs
+
+
+def current_doc_freqs(index_path: Path) -> tuple[int, dict[str, int]]:
+    if not _doc_freq_paths(index_path)[0].exists():
+        with locked_index(index_path):
+            _seed_doc_freqs(index_path)
+    return load_doc_freqs(index_path)
+
+
+def _seed_doc_freqs(index_path: Path) -> None:
+    # Entries indexed before document frequencies existed seed the snapshot
+    # the first time it is needed, so IDF never runs on a corpus of only the
+    # notes synced since. Callers hold the index lock.
+    if not _doc_freq_paths(index_path)[0].exists():
+        _compact_doc_freqs(index_path, load_index(index_path))
+
+
+def save_doc_freqs(index_path: Path, doc_count: int, doc_freqs: dict[str, int]) -> None:
+    snapshot_path, log_path = _doc_freq_paths(index_path)
+    atomic_write_text(snapshot_path, json.dumps({"docs": doc_count, "df": doc_freqs}, ensure_ascii=False))
+    if log_path.exists():
+        log_path.unlink()
+
+
+def append_entries(
+    index_path: Path,
+    entries: list[dict[str, Any]],
+    doc_terms: list[list[str]] | None = None,
+    bump: bool = True,
+) -> None:
+    if not entries:
+        return
+    # Group commit: every writer spools its records first; whoever takes the
+    # lock appends all spooled records in one write, so waiting writers usually
+    # find their ticket already committed and return without touching the log.
+    doc_terms = doc_terms or [entry.get("keywords", []) for entry in entries]
+    payload = "".join(
+        json.dumps({"entry": entry, "terms": terms}, ensure_ascii=False) + "\n"
+        for entry, terms in zip(entries, doc_terms)
+    )
+    spool = _spool_dir(index_path)
+    ticket = spool / f"{time.time_ns()}-{os.getpid()}-{uuid4().hex[:8]}.jsonl"
+    atomic_write_text(ticket, payload)
+    with locked_index(index_path):
+        if not ticket.exists():
+            return
+        tickets = sorted(spool.glob("*.jsonl"))
+        lines = []
+        df_delta: dict[str, int] = {}
+        for t in tickets:
+            for raw in t.read_text(encoding="utf-8").splitlines():
+                record = json.loads(raw)
+                lines.append(json.dumps(record["entry"], ensure_ascii=False) + "\n")
+                for term in set(record.get("terms", [])):
+                    df_delta[term] = df_delta.get(term, 0) + 1
+        segments = _segments(index_path)
+        if segments:
+            _trim_torn_tail(segments[-1])
+        _seed_doc_freqs(index_path)
+        with _active_segment(index_path).open("a", encoding="utf-8") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        _, log_path = _doc_freq_paths(index_path)
+        _trim_torn_tail(log_path)
+        with log_path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps({"docs": len(lines), "df": df_delta}, ensure_ascii=False) + "\n")
+        if log_path.stat().st_size > _DOC_FREQ_LOG_MAX_BYTES:
+            save_doc_freqs(index_path, *load_doc_freqs(index_path))
+        if bump:
+            bump_generation(index_path)
+        for t in tickets:
+            t.unlink()
+
+
+def _compact_doc_freqs(index_path: Path, index_data: dict[str, Any]) -> None:
+    snapshot_path, _ = _doc_freq_paths(index_path)
+    doc_count, doc_freqs = load_doc_freqs(index_path)
+    if not snapshot_path.exists():
+        # Entries written before document frequencies existed only have their
+        # keywords to go by; seed from those and keep any larger logged count.
+        doc_count = max(doc_count, len(index_data.get("entries", [])))
+        for term, ids in index_data.get("keywords", {}).items():
+            doc_freqs[term] = max(doc_freqs.get(term, 0), len(ids))
+    save_doc_freqs(index_path, doc_count, doc_freqs)
+
+
+def compact_index(index_path: Path) -> tuple[int, int]:
+    with locked_index(index_path):
+        segments = _segments(index_path)
+        index_data = load_index(index_path)
+        if segments:
+            save_index(index_path, index_data)
+            for segment in segments:
+                segment.unlink()
+        _compact_doc_freqs(index_path, index_data)
+        if index_path.exists():
+            build_binary_index(index_path, index_data)
+    return len(index_data.get("entries", [])), len(segments)
+
+
+def rewrite_index(
+    index_path: Path,
+    update: Callable[[list[dict[str, Any]]], list[dict[str, Any]]],
+    after: Callable[[list[dict[str, Any]]], None] | None = None,
+) -> int:
+    # Whole-index rewrite (also folding the log) for maintenance commands that
+    # change or drop existing entries; keyword postings are rebuilt from scratch.
+    # `after` runs once the new index is saved, still under the lock, so
+    # sidecars can be pruned without racing a sync's index commit.
+    with locked_index(index_path):
+        segments = _segments(index_path)
+        index_data = load_index(index_path)
+        entries = update(index_data.get("entries", []))
+        rebuilt = {key: value for key, value in index_data.items() if key not in ("entries", "keywords")}
+        rebuilt.update({"entries": [], "keywords": {}})
+        for entry in entries:
+            add_entry(rebuilt, entry)
+        save_index(index_path, rebuilt)
+        for segment in segments:
+            segment.unlink()
+        _compact_doc_freqs(index_path, rebuilt)
+        build_binary_index(index_path, rebuilt)
+        if after is not None:
+            after(entries)
+    return len(entries)
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import heapq
+import math
 import re
 from collections import Counter
 
@@ -64,22 +66,87 @@ _STOPWORDS = {
 }
 
 
-def extract_keywords(text: str, limit: int = 8) -> list[str]:
-    # English-like tokens
-    en_tokens = re.findall(r"[A-Za-z][A-Za-z0-9_-]{2,}", text.lower())
-    en_filtered = [t for t in en_tokens if t not in _STOPWORDS and not t.isdigit()]
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9_-]{2,}|[\u4e00-\u9fff]{2,24}")
+_ZH_PARTICLE_RE = re.compile(r"[的了在是有和与及并对把将就都而我你他她它们很也还这那个吗呢吧啊]")
+_ZH_NGRAM_SIZES = (2, 3)
+_NOTE_TERM_LIMIT = 512
 
-    # Chinese runs (2+ chars). For long runs, split by common particles.
-    zh_runs = re.findall(r"[\u4e00-\u9fff]{2,24}", text)
-    zh_tokens: list[str] = []
-    for run in zh_runs:
-        if 2 <= len(run) <= 6:
-            zh_tokens.append(run)
+
+def _zh_pieces(run: str) -> tuple[list[str], list[str]]:
+    # Long runs: split on common particles; pieces still longer than a term get
+    # bigram/trigram segmentation instead of being dropped.
+    words: list[str] = []
+    ngrams: list[str] = []
+    for part in _ZH_PARTICLE_RE.split(run):
+        if len(part) < 2:
+            continue
+        if len(part) <= 6:
+            words.append(part)
             continue
-        parts = re.split(r"[的了在是有和与及并对把将就都而我你他她它们很也还这那个吗呢吧啊]", run)
-        for part in parts:
-            if 2 <= len(part) <= 6:
-                zh_tokens.append(part)
+        for size in _ZH_NGRAM_SIZES:
+            ngrams.extend(part[i : i + size] for i in range(len(part) - size + 1))
+    return words, ngrams
+
+
+def term_counts(text: str) -> Counter:
+    # One linear regex pass over the text; stopword filtering and CJK
+    # segmentation then run once per distinct token, not once per occurrence.
+    raw = Counter(_TOKEN_RE.findall(text.lower()))
+    counts: Counter = Counter()
+    for token, count in raw.items():
+        if token[0] < "\u4e00":
+            if token not in _STOPWORDS:
+                counts[token] += count
+        elif len(token) <= 6:
+            counts[token] += count
+        else:
+            words, ngrams = _zh_pieces(token)
+            for word in words:
+                counts[word] += count
+            # Every n-gram is kept, even one seen once; segmentation noise is
+            # common across notes, so IDF in rank_keywords prunes it.
+            for ngram in ngrams:
+                counts[ngram] += count
+    return counts
+
+
+def note_terms(text: str) -> list[tuple[str, int]]:
+    # The per-note term profile kept for ranking and document frequencies.
+    return term_counts(text).most_common(_NOTE_TERM_LIMIT)
+
+
+def rank_keywords(
+    counts: Counter | list[tuple[str, int]],
+    limit: int,
+    doc_freqs: dict[str, int] | None = None,
+    doc_count: int = 0,
+) -> list[tuple[str, int]]:
+    counts = Counter(dict(counts))
+    if not doc_freqs or doc_count <= 0:
+        return counts.most_common(limit)
+    # TF-IDF against the project corpus, so words every note shares stop
+    # crowding out the ones that make this note distinctive.
+    scored = [
+        (count * (math.log((1 + doc_count) / (1 + doc_freqs.get(term, 0))) + 1.0), term, count)
+        for term, count in counts.items()
+    ]
+    top = heapq.nlargest(limit, scored, key=lambda item: item[0])
+    return [(term, count) for _, term, count in top]
+
+
+def extract_keyword_counts(
+    text: str,
+    limit: int = 8,
+    doc_freqs: dict[str, int] | None = None,
+    doc_count: int = 0,
+) -> list[tuple[str, int]]:
+    return rank_keywords(term_counts(text), limit, doc_freqs, doc_count)
+
 
-    counts = Counter(en_filtered + zh_tokens)
-    return [word for word, _ in counts.most_common(limit)]
+def extract_keywords(
+    text: str,
+    limit: int = 8,
+    doc_freqs: dict[str, int] | None = None,
+    doc_count: int = 0,
+) -> list[str]:
+    return [word for word, _ in extract_keyword_counts(text, limit, doc_freqs, doc_count)]
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from binary_index import binary_path
+from detail_store import pack_dir
+from semantic_index import vector_ids
+from simhash_index import read_signatures
+from summarizer import parse_main_records
+
+# Detail files and pack segments younger than this may belong to a sync that
+# has written them but not yet committed its index entries.
+ORPHAN_GRACE_SECONDS = 600.0
+
+
+def note_groups(entries: list[dict[str, Any]]) -> dict[str, list[dict[str, Any]]]:
+    groups: dict[str, list[dict[str, Any]]] = {}
+    for entry in entries:
+        groups.setdefault(entry.get("note_id", entry["id"]), []).append(entry)
+    return groups
+
+
+def _note_bytes(root: Path, group: list[dict[str, Any]]) -> int:
+    if all("length" in entry for entry in group):
+        return sum(entry["length"] for entry in group)
+    if "pack" in group[0]:
+        return group[0]["pack"]["size"]
+    try:
+        return (root / group[0]["detail_path"]).stat().st_size
+    except OSError:
+        return 0
+
+
+def expired_notes(
+    root: Path,
+    groups: dict[str, list[dict[str, Any]]],
+    *,
+    ttl_days: float | None = None,
+    max_entries: int | None = None,
+    max_bytes: int | None = None,
+) -> set[str]:
+    # Notes are kept newest first until a policy is exceeded; everything older
+    # than the first note that breaks a count or byte budget goes too.
+    cutoff = None
+    if ttl_days is not None:
+        cutoff = (datetime.now() - timedelta(days=ttl_days)).isoformat(timespec="seconds")
+    # Index order breaks ties between notes synced within the same second.
+    ordered = sorted(
+        enumerate(groups.items()),
+        key=lambda item: (item[1][1][0].get("timestamp") or "", item[0]),
+        reverse=True,
+    )
+    expired: set[str] = set()
+    kept = total = 0
+    full = False
+    for _, (note_id, group) in ordered:
+        stamp = group[0].get("timestamp")
+        if full or (cutoff and stamp and stamp < cutoff):
+            expired.add(note_id)
+            continue
+        size = _note_bytes(root, group) if max_bytes is not None else 0
+        if (max_entries is not None and kept >= max_entries) or (max_bytes is not None and total + size > max_bytes):
+            full = True
+            expired.add(note_id)
+            continue
+        kept += 1
+        total += size
+    return expired
+
+
+def _stat_size(path: Path) -> int | None:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return None
+
+
+def check_details(root: Path, entries: list[dict[str, Any]], workers: int | None = None) -> list[tuple[dict[str, Any], str]]:
+    # Each distinct detail file or pack segment is stat'ed once, in a thread
+    # pool; byte ranges are then checked against the sizes.
+    targets: dict[Path, list[dict[str, Any]]] = {}
+    packs = pack_dir(root)
+    for entry in entries:
+        if "store" in entry:
+            # Bodies kept by a database backend are checked by the backend.
+            continue
+        if "pack" in entry:
+            path = packs / entry["pack"]["segment"]
+        elif entry.get("detail_path"):
+            path = root / entry["detail_path"]
+        else:
+            continue
+        targets.setdefault(path, []).append(entry)
+    paths = list(targets)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        sizes = list(pool.map(_stat_size, paths, chunksize=64))
+    problems = []
+    for path, size in zip(paths, sizes):
+        for entry in targets[path]:
+            if size is None:
+                problems.append((entry, f"missing detail {path.relative_to(root).as_posix()}"))
+                continue
+            if "pack" in entry:
+                end = entry["pack"]["offset"] + entry["pack"]["size"]
+            elif "length" in entry:
+                end = entry.get("offset", 0) + entry["length"]
+            else:
+                continue
+            if end > size:
+                problems.append((entry, f"byte range ends at {end}, past {size} bytes of {path.name}"))
+    return problems
+
+
+def _scan_dir(directory: Path, suffix: str) -> list[tuple[str, float]]:
+    found = []
+    try:
+        with os.scandir(directory) as it:
+            for item in it:
+                if item.name.endswith(suffix) and item.is_file():
+                    found.append((item.name, item.stat().st_mtime))
+    except OSError:
+        pass
+    return found
+
+
+def orphan_details(root: Path, referenced: set[str], min_age: float = 0.0) -> list[Path]:
+    detail_dir = root / "docs" / "memory" / "detail"
+    cutoff = time.time() - min_age
+    return [
+        detail_dir / name
+        for name, mtime in _scan_dir(detail_dir, ".md")
+        if f"docs/memory/detail/{name}" not in referenced and mtime <= cutoff
+    ]
+
+
+def fsck(
+    root: Path,
+    index_data: dict[str, Any],
+    index_path: Path,
+    main_path: Path,
+    workers: int | None = None,
+    *,
+    binary_index: bool = True,
+) -> list[str]:
+    entries = index_data.get("entries", [])
+    problems: list[str] = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        # The two directory-wide passes overlap with the in-memory checks below.
+        details = pool.submit(check_details, root, entries, workers)
+        detail_files = pool.submit(_scan_dir, root / "docs" / "memory" / "detail", ".md")
+
+        by_id: dict[str, dict[str, Any]] = {}
+        for entry in entries:
+            if entry["id"] in by_id:
+                problems.append(f"index: duplicate entry id {entry['id']}")
+            by_id[entry["id"]] = entry
+        notes = note_groups(entries)
+        keyword_map = index_data.get("keywords", {})
+        posted = set()
+        for keyword, ids in keyword_map.items():
+            for entry_id in ids:
+                posted.add((keyword, entry_id))
+                entry = by_id.get(entry_id)
+                if entry is None:
+                    problems.append(f"index: keyword '{keyword}' lists unknown entry {entry_id}")
+                elif keyword not in entry.get("keywords", []):
+                    problems.append(f"index: keyword '{keyword}' lists {entry_id}, which does not carry it")
+        for entry in entries:
+            for keyword in entry.get("keywords", []):
+                if (keyword, entry["id"]) not in posted:
+                    problems.append(f"index: {entry['id']} is missing from the postings of '{keyword}'")
+            original = entry.get("duplicate_of")
+            if original and original not in notes:
+                problems.append(f"index: {entry['id']} is a duplicate of unknown note {original}")
+
+        if main_path.exists():
+            _, records = parse_main_records(main_path.read_text(encoding="utf-8"))
+            for record in records:
+                if record["entry_id"] and record["entry_id"] not in notes:
+                    problems.append(f"main.md: line for unknown note {record['entry_id']}")
+
+        ids, rows = vector_ids(index_path)
+        if ids and len(ids) != rows:
+            problems.append(f"vectors: {rows} rows but {len(ids)} ids")
+        stale = sum(1 for entry_id in ids if entry_id not in by_id)
+        if stale:
+            problems.append(f"vectors: {stale} rows for entries no longer indexed")
+        stale = sum(1 for _, note_id in read_signatures(index_path) if note_id not in notes)
+        if stale:
+            problems.append(f"simhash: {stale} signatures for notes no longer indexed")
+
+        packs = pack_dir(root)
+        live_segments = {entry["pack"]["segment"] for entry in entries if "pack" in entry}
+        segment_names = sorted(name for name, _ in _scan_dir(packs, ".pack"))
+        for name in segment_names[:-1]:
+            if name not in live_segments:
+                problems.append(f"packs: segment {name} holds no indexed record")
+
+        # Only the JSON backend reads or rebuilds index.bin; under another
+        # backend a leftover copy is never used and compact never refreshes it.
+        binary = binary_path(index_path)
+        if binary_index and binary.exists() and index_path.exists() and binary.stat().st_mtime_ns < index_path.stat().st_mtime_ns:
+            problems.append("index.bin: older than index.json (run compact)")
+
+        for entry, problem in details.result():
+            problems.append(f"detail: {entry['id']}: {problem}")
+        referenced = {entry.get("detail_path") for entry in entries}
+        for name, _ in detail_files.result():
+            if f"docs/memory/detail/{name}" not in referenced:
+                problems.append(f"detail: docs/memory/detail/{name} is not referenced by the index")
+    return problems
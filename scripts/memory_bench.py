@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+import argparse
+import importlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+from detail_store import write_packed
+from index_store import compact_index, save_index
+
+_SCRIPT_DIR = Path(__file__).resolve().parent
+_RESULT_VERSION = 1
+
+_EN_WORDS = (
+    "cache redis eviction latency timeout retry backoff websocket reconnect session token auth oauth "
+    "refresh migration schema postgres index query planner vacuum replica failover kubernetes helm "
+    "deployment rollout canary ingress nginx certificate tls proxy gateway ratelimit queue kafka "
+    "consumer offset partition snapshot compaction segment journal checksum parser lexer grammar "
+    "compiler bundle webpack vite react hooks render state reducer selector router layout grid css "
+    "theme accessibility keyboard shortcut terminal shell powershell python script virtualenv wheel "
+    "packaging dependency lockfile upgrade regression benchmark profile flamegraph allocation memory "
+    "leak garbage thread pool async await coroutine deadlock mutex semaphore channel worker scheduler "
+    "cron backup restore archive compression zlib encryption signature hash bloom filter shard "
+    "cluster node heartbeat gossip consensus raft leader election quorum metrics tracing logging alert "
+    "dashboard grafana prometheus exporter histogram percentile config yaml toml json schema validation"
+).split()
+_ZH_WORDS = (
+    "数据库 迁移 缓存 失效 会话 记录 重连 超时 重试 部署 回滚 集群 节点 索引 查询 优化 日志 告警 "
+    "监控 配置 权限 认证 令牌 刷新 队列 消费 分区 快照 压缩 备份 恢复 线程 死锁 内存 泄漏 性能 "
+    "基准 测试 回归 依赖 升级 打包 脚本 终端 快捷键 布局 渲染 状态 路由 网关 证书 代理 限流"
+).split()
+_FILLER = "the a we then after so because it and with for on to in of".split()
+
+
+def _zipf_weights(count: int) -> list[float]:
+    return [1.0 / (rank + 1) for rank in range(count)]
+
+
+class _TextGenerator:
+    def __init__(self, seed: int, zh_ratio: float) -> None:
+        self.rng = random.Random(seed)
+        self.zh_ratio = zh_ratio
+        en = _EN_WORDS[:]
+        self.rng.shuffle(en)
+        self.en = en
+        self.en_weights = _zipf_weights(len(en))
+        self.zh = _ZH_WORDS
+        self.zh_weights = _zipf_weights(len(_ZH_WORDS))
+
+    def note(self, min_words: int, max_words: int) -> tuple[str, Counter]:
+        words = self.rng.randint(min_words, max_words)
+        rolls = [self.rng.random() for _ in range(words)]
+        en = iter(self.rng.choices(self.en, self.en_weights, k=words))
+        zh = iter(self.rng.choices(self.zh, self.zh_weights, k=words * 2))
+        tokens, counts = [], Counter()
+        for roll in rolls:
+            if roll < self.zh_ratio:
+                token = next(zh) + (next(zh) if roll < self.zh_ratio / 2 else "")
+            elif roll < self.zh_ratio + 0.2:
+                tokens.append(_FILLER[int(roll * 1000) % len(_FILLER)])
+                continue
+            else:
+                token = next(en)
+            tokens.append(token)
+            counts[token] += 1
+        sentences = [" ".join(tokens[i : i + 12]).capitalize() + "." for i in range(0, len(tokens), 12)]
+        return " ".join(sentences), counts
+
+    def query(self) -> str:
+        terms = self.rng.choices(self.en, self.en_weights, k=self.rng.randint(1, 3))
+        if self.rng.random() < self.zh_ratio:
+            terms.append(self.rng.choice(self.zh))
+        return " ".join(terms)
+
+
+def _build_corpus(project: Path, entries: int, gen: _TextGenerator, main_records: int) -> dict:
+    # Writes the on-disk layout sync would produce (packed details, index.json,
+    # document frequencies, main.md) directly, so a 1M-entry corpus builds in minutes.
+    started = time.perf_counter()
+    base = project / "docs" / "memory"
+    base.mkdir(parents=True, exist_ok=True)
+    state_path = project / ".codex" / "memory" / "state.json"
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    state_path.write_text(
+        json.dumps({"enabled": True, "detail_store": "pack", "semantic_index": False}), encoding="utf-8"
+    )
+    index_data: dict = {"entries": [], "keywords": {}}
+    doc_freqs: Counter = Counter()
+    main_lines = []
+    stamp = datetime(2026, 1, 1)
+    batch_entries, batch_bodies = [], []
+
+    def flush() -> None:
+        refs = write_packed(project, batch_bodies)
+        for entry, ref in zip(batch_entries, refs):
+            entry["pack"] = ref
+        batch_entries.clear()
+        batch_bodies.clear()
+
+    for number in range(entries):
+        text, counts = gen.note(40, 160)
+        ranked = counts.most_common(12)
+        entry_id = f"{(stamp + timedelta(minutes=number)).strftime('%Y%m%d-%H%M%S')}-{number:08x}"
+        keywords = [word for word, _ in ranked]
+        head = f"# Detail Memory\n\n- id: {entry_id}\n- topic: bench\n\n## Full Detail\n\n"
+        body = f"{head}{text}\n".encode("utf-8")
+        entry = {
+            "id": entry_id,
+            "topic": "bench",
+            "timestamp": (stamp + timedelta(minutes=number)).isoformat(timespec="seconds"),
+            "keywords": keywords,
+            "keyword_tf": [count for _, count in ranked],
+            "summary": text[:200],
+            "excerpt": text[:180],
+            "detail_path": f"docs/memory/detail/{entry_id}-bench.md",
+            "offset": len(head.encode("utf-8")),
+            "length": len(text.encode("utf-8")),
+        }
+        index_data["entries"].append(entry)
+        for keyword in keywords:
+            index_data["keywords"].setdefault(keyword, []).append(entry_id)
+        doc_freqs.update(counts.keys())
+        if number >= entries - main_records:
+            main_lines.append(
+                f"- {entry['timestamp'][:16].replace('T', ' ')} | bench | keywords: {', '.join(keywords)} | "
+                f"detail: {entry['detail_path']} | summary: {text[:200]}\n"
+            )
+        batch_entries.append(entry)
+        batch_bodies.append(body)
+        if len(batch_bodies) >= 10000:
+            flush()
+    if batch_bodies:
+        flush()
+    index_path = base / "index.json"
+    save_index(index_path, index_data)
+    (base / "doc_freqs.json").write_text(json.dumps({"docs": entries, "df": doc_freqs}, ensure_ascii=False), encoding="utf-8")
+    (base / "main.md").write_text("# Main Memory\n\n" + "".join(main_lines), encoding="utf-8")
+    built = time.perf_counter() - started
+    started = time.perf_counter()
+    compact_index(index_path)
+    return {
+        "entries": entries,
+        "build_seconds": round(built, 3),
+        "compact_seconds": round(time.perf_counter() - started, 3),
+        "index_json_bytes": index_path.stat().st_size,
+        "index_bin_bytes": index_path.with_suffix(".bin").stat().st_size,
+        "pack_bytes": sum(p.stat().st_size for p in (project / "docs" / "memory" / "packs").glob("*.pack")),
+    }
+
+
+def _build_sessions(sessions_root: Path, project: Path, count: int, messages: int, message_chars: int, gen: _TextGenerator) -> dict:
+    # Codex-style rollout logs; every third one belongs to the benchmark project.
+    started = time.perf_counter()
+    total = 0
+    for number in range(count):
+        day = sessions_root / "2026" / "01" / f"{number % 28 + 1:02d}"
+        day.mkdir(parents=True, exist_ok=True)
+        cwd = str(project) if number % 3 == 0 else str(project.parent / f"other-{number % 7}")
+        lines = [json.dumps({"type": "session_meta", "payload": {"id": f"bench-{number:06d}", "cwd": cwd}})]
+        for turn in range(messages):
+            role = "user" if turn % 2 == 0 else "assistant"
+            text, _ = gen.note(max(4, message_chars // 14), max(5, message_chars // 6))
+            part = {"type": "input_text" if role == "user" else "output_text", "text": text[:message_chars]}
+            lines.append(json.dumps({"type": "response_item", "payload": {"type": "message", "role": role, "content": [part]}}, ensure_ascii=False))
+            lines.append(json.dumps({"type": "event_msg", "payload": {"type": "token_count", "total": turn}}))
+        path = day / f"rollout-{number:06d}.jsonl"
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        total += path.stat().st_size
+    return {"sessions": count, "bytes": total, "build_seconds": round(time.perf_counter() - started, 3)}
+
+
+def _proc_io() -> dict[str, int]:
+    try:
+        text = Path("/proc/self/io").read_text()
+    except OSError:
+        return {}
+    return {key: int(value) for key, value in (line.split(": ") for line in text.splitlines())}
+
+
+def _peak_rss_kb() -> int | None:
+    # VmHWM restarts at exec; ru_maxrss would still carry the forking parent's peak.
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+
+
+def _worker(module_name: str, argv: list[str]) -> int:
+    # Runs one CLI invocation in this process and reports its own cost.
+    module = importlib.import_module(module_name)
+    sys.argv = [f"{module_name}.py", *argv]
+    before = _proc_io()
+    started = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        try:
+            code = module.main()
+        except SystemExit as exc:
+            code = exc.code if isinstance(exc.code, int) else 1
+    elapsed = time.perf_counter() - started
+    after = _proc_io()
+    report = {
+        "code": code,
+        "elapsed": elapsed,
+        "max_rss_kb": _peak_rss_kb(),
+        "read_bytes": after["rchar"] - before["rchar"] if after else None,
+        "written_bytes": after["wchar"] - before["wchar"] if after else None,
+    }
+    print(json.dumps(report))
+    return 0
+
+
+def _run(module_name: str, argv: list[str]) -> dict:
+    env = dict(os.environ, MEMORY_MANAGER_NO_DAEMON="1")
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "_worker", module_name, *argv],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0 or not proc.stdout.strip():
+        raise RuntimeError(f"{module_name} {' '.join(argv[:4])} failed: {proc.stderr.strip()[-400:]}")
+    report = json.loads(proc.stdout.strip().splitlines()[-1])
+    report["wall"] = wall
+    return report
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def _summarize(reports: list[dict]) -> dict:
+    if not reports:
+        return {"runs": 0}
+    elapsed = [r["elapsed"] * 1000 for r in reports]
+    wall = [r["wall"] * 1000 for r in reports]
+    read = [r["read_bytes"] for r in reports if r.get("read_bytes") is not None]
+    summary = {
+        "runs": len(reports),
+        "p50_ms": round(_percentile(elapsed, 50), 3),
+        "p99_ms": round(_percentile(elapsed, 99), 3),
+        "mean_ms": round(sum(elapsed) / len(elapsed), 3),
+        "wall_p50_ms": round(_percentile(wall, 50), 3),
+        "wall_p99_ms": round(_percentile(wall, 99), 3),
+    }
+    rss = [r["max_rss_kb"] for r in reports if r.get("max_rss_kb") is not None]
+    if rss:
+        summary["max_rss_kb"] = max(rss)
+    if read:
+        summary["read_bytes_p50"] = int(_percentile(read, 50))
+        summary["read_bytes_max"] = max(read)
+    return summary
+
+
+def _bench_project(project: Path, args: argparse.Namespace, gen: _TextGenerator) -> dict:
+    base = ["--project", str(project)]
+    results = {}
+    results["recall"] = _summarize(
+        [_run("memory_manager", [*base, "recall", "--query", gen.query()]) for _ in range(args.queries)]
+    )
+    cache = project / ".codex" / "memory" / "preload_cache.md"
+    cold = []
+    for _ in range(args.preloads):
+        if cache.exists():
+            cache.unlink()
+        cold.append(_run("memory_manager", [*base, "preload", "--max-chars", "6000"]))
+    results["preload_cold"] = _summarize(cold)
+    results["preload_cached"] = _summarize(
+        [_run("memory_manager", [*base, "preload", "--max-chars", "6000"]) for _ in range(args.preloads)]
+    )
+    syncs = []
+    for _ in range(args.syncs):
+        text, _ = gen.note(200, 600)
+        syncs.append(_run("memory_manager", [*base, "sync", "--topic", "bench-sync", "--note", text]))
+    results["sync"] = _summarize(syncs)
+    results["recall_after_sync"] = _summarize(
+        [_run("memory_manager", [*base, "recall", "--query", gen.query()]) for _ in range(max(1, args.queries // 4))]
+    )
+    return results
+
+
+def _bench_sessions(project: Path, sessions_root: Path, args: argparse.Namespace) -> dict:
+    base = ["--project", str(project), "--sessions-root", str(sessions_root)]
+    # --from-start drops the checkpoint the previous run left, so every run
+    # syncs the whole latest session instead of finding nothing new.
+    latest = [_run("auto_sync_from_sessions", [*base, "--since-epoch", "0", "--from-start"]) for _ in range(args.preloads)]
+    backfill = _run("auto_sync_from_sessions", [*base, "--backfill"])
+    return {"latest_sync": _summarize(latest), "backfill": _summarize([backfill])}
+
+
+def _git_commit() -> str | None:
+    try:
+        proc = subprocess.run(["git", "rev-parse", "HEAD"], cwd=_SCRIPT_DIR, capture_output=True, text=True)
+    except OSError:
+        return None
+    return proc.stdout.strip() or None
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="memory-bench-")).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    gen = _TextGenerator(args.seed, args.zh_ratio)
+    result = {
+        "version": _RESULT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {key: value for key, value in vars(args).items() if key != "func"},
+        "corpora": [],
+    }
+    try:
+        for size in sizes:
+            project = workdir / f"project-{size}"
+            print(f"Building corpus with {size} entries...", file=sys.stderr)
+            corpus = _build_corpus(project, size, gen, args.main_records)
+            corpus.update(_bench_project(project, args, gen))
+            result["corpora"].append(corpus)
+        if args.sessions:
+            project = workdir / "session-project"
+            (project / ".codex" / "memory").mkdir(parents=True, exist_ok=True)
+            # Repeated syncs of the same session would otherwise be linked as
+            # near-duplicates and skip the keyword and index work.
+            state = {"enabled": True, "dedupe_policy": "keep"}
+            (project / ".codex" / "memory" / "state.json").write_text(json.dumps(state), encoding="utf-8")
+            sessions_root = workdir / "codex" / "sessions"
+            print(f"Building {args.sessions} session logs...", file=sys.stderr)
+            sessions = _build_sessions(sessions_root, project, args.sessions, args.session_messages, args.message_chars, gen)
+            sessions.update(_bench_sessions(project, sessions_root, args))
+            result["sessions"] = sessions
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    out = Path(args.out)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Benchmark results written to {out}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark memory manager commands on synthetic corpora")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated index entry counts (up to 1000000)")
+    parser.add_argument("--queries", type=int, default=50, help="Recall runs per corpus")
+    parser.add_argument("--syncs", type=int, default=10, help="Sync runs per corpus")
+    parser.add_argument("--preloads", type=int, default=5, help="Preload runs per corpus (cold and cached each)")
+    parser.add_argument("--main-records", type=int, default=5000, help="main.md records per corpus")
+    parser.add_argument("--zh-ratio", type=float, default=0.2, help="Share of Chinese words in generated text")
+    parser.add_argument("--sessions", type=int, default=2000, help="Session logs to generate (0 skips)")
+    parser.add_argument("--session-messages", type=int, default=40)
+    parser.add_argument("--message-chars", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", help="Where corpora are generated (default: a temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated corpora")
+    parser.add_argument("--out", default="memory-bench.json", help="JSON results file")
+    parser.set_defaults(func=cmd_run)
+    return parser
+
+
+def main() -> int:
+    if len(sys.argv) > 2 and sys.argv[1] == "_worker":
+        return _worker(sys.argv[2], sys.argv[3:])
+    args = build_parser().parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import socketserver
+from pathlib import Path
+from typing import Any, Callable
+
+_SOCKET_ENV = "MEMORY_MANAGER_SOCKET"
+_DISABLE_ENV = "MEMORY_MANAGER_NO_DAEMON"
+_CONNECT_TIMEOUT = 0.5
+_REQUEST_TIMEOUT = 60.0
+
+
+def socket_path() -> Path:
+    override = os.environ.get(_SOCKET_ENV)
+    if override:
+        return Path(override)
+    return Path.home() / ".codex" / "memory" / "daemon.sock"
+
+
+def supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+def request(op: str, **params: Any) -> dict[str, Any] | None:
+    # None means "no daemon answered"; callers fall back to direct file access.
+    if not supported() or os.environ.get(_DISABLE_ENV):
+        return None
+    path = socket_path()
+    if not path.exists():
+        return None
+    payload = json.dumps({"op": op, **params}, ensure_ascii=False) + "\n"
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(_CONNECT_TIMEOUT)
+            conn.connect(str(path))
+            conn.settimeout(_REQUEST_TIMEOUT)
+            conn.sendall(payload.encode("utf-8"))
+            with conn.makefile("r", encoding="utf-8") as reader:
+                line = reader.readline()
+    except OSError:
+        return None
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+def _make_handler(handle: Callable[[dict[str, Any]], dict[str, Any]]) -> type:
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            for raw in self.rfile:
+                raw = raw.strip()
+                if not raw:
+                    continue
+                try:
+                    message = json.loads(raw.decode("utf-8"))
+                    if message.get("op") == "ping":
+                        response = {"code": 0, "output": "pong"}
+                    elif message.get("op") == "shutdown":
+                        response = {"code": 0, "output": "Memory daemon stopping."}
+                        self.server._stop_requested = True
+                    else:
+                        response = handle(message)
+                except Exception as exc:  # keep the daemon alive on bad requests
+                    response = {"code": 1, "output": f"Memory daemon error: {exc}"}
+                self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+    return _Handler
+
+
+def serve(handle: Callable[[dict[str, Any]], dict[str, Any]], path: Path | None = None) -> int:
+    if not supported():
+        print("Unix domain sockets are not available on this platform.")
+        return 1
+    path = path or socket_path()
+    if path.exists():
+        if request("ping") is not None:
+            print(f"Memory daemon already running at: {path}")
+            return 1
+        path.unlink()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    server = socketserver.ThreadingUnixStreamServer(str(path), _make_handler(handle))
+    server.daemon_threads = True
+    server.timeout = 0.5
+    server._stop_requested = False
+    os.chmod(path, 0o600)
+    print(f"Memory daemon listening on: {path}", flush=True)
+    try:
+        while not server._stop_requested:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            path.unlink()
+        except OSError:
+            pass
+    return 0
@@ -1,16 +1,68 @@
 from __future__ import annotations
 
 import argparse
+import glob
+import heapq
 import json
+import os
 import sys
+import threading
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
+from typing import Any, Callable
 from uuid import uuid4
 
-from index_store import add_entry, load_index, save_index
-from keyword_extract import extract_keywords
-from recall_engine import recall, render_recall_result
-from summarizer import brief_summary, update_main_memory
+import memory_daemon
+import profiling
+import recall_cache
+from auto_recall import AutoRecall
+from detail_store import export_packed, read_detail_text, repack, write_packed
+from index_backend import BACKENDS, open_backend
+from index_store import (
+    add_entry,
+    index_generation,
+    publish_generation,
+    read_log_tail,
+    rewrite_index,
+    save_doc_freqs,
+    snapshot_stamp,
+)
+from keyword_extract import note_terms, rank_keywords, term_counts
+from locking import atomic_write_text
+from maintenance import ORPHAN_GRACE_SECONDS, check_details, expired_notes, fsck, note_groups, orphan_details
+from recall_engine import (
+    RecallIndex,
+    federated_hits,
+    make_excerpt,
+    query_terms,
+    recall_hits,
+    recall_scored,
+    render_federated_result,
+    render_recall_json,
+    render_recall_result,
+)
+from semantic_index import SemanticIndex, append_vectors, embed, fuse_scores, prune_vectors, semantic_available
+from simhash_index import (
+    SimHashTable,
+    append_signatures,
+    fold_signatures,
+    prune_signatures,
+    simhash,
+    write_signatures,
+)
+from summarizer import (
+    append_main_memory,
+    brief_summary,
+    drop_main_records,
+    parse_main_records,
+    rollup_main_memory,
+    select_main_lines,
+    split_passages,
+)
 
 
 def _project_root(path: str | None) -> Path:
@@ -37,10 +89,29 @@ def _default_state() -> dict:
         "auto_load_main_on_start": True,
         "auto_save_on_quit": True,
         "auto_recall_keywords": True,
+        "detail_store": "files",
+        "detail_codec": "zlib",
+        "dedupe_policy": "link",
+        "semantic_index": True,
+        "index_backend": "json",
+        "gc_ttl_days": None,
+        "gc_max_entries": None,
+        "gc_max_bytes": None,
         "updated_at": None,
     }
 
 
+def project_backend(root: Path, name: str | None = None):
+    # The index backend the project's state selects (see `migrate`).
+    if name is None:
+        name = _load_state(_state_path(root)).get("index_backend", "json")
+    return open_backend(_memory_paths(root)["index"], name)
+
+
+def memory_enabled(root: Path) -> bool:
+    return bool(_load_state(_state_path(root)).get("enabled", False))
+
+
 def _load_state(path: Path) -> dict:
     if not path.exists():
         return _default_state()
@@ -51,9 +122,8 @@ def _load_state(path: Path) -> dict:
 
 
 def _save_state(path: Path, state: dict) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
     state["updated_at"] = datetime.now().isoformat(timespec="seconds")
-    path.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    atomic_write_text(path, json.dumps(state, ensure_ascii=False, indent=2))
 
 
 def cmd_on(args: argparse.Namespace) -> int:
@@ -63,6 +133,14 @@ def cmd_on(args: argparse.Namespace) -> int:
     state_path = _state_path(root)
     state = _load_state(state_path)
     state["enabled"] = True
+    if args.detail_store:
+        state["detail_store"] = args.detail_store
+    if args.detail_codec:
+        state["detail_codec"] = args.detail_codec
+    if args.dedupe:
+        state["dedupe_policy"] = args.dedupe
+    if args.auto_recall:
+        state["auto_recall_keywords"] = args.auto_recall == "on"
     _save_state(state_path, state)
     print(f"Memory mode enabled for project: {root}")
     return 0
@@ -98,89 +176,1205 @@ def _read_note(args: argparse.Namespace) -> str:
     raise ValueError("No note provided. Use --note, --from-file, or pipe stdin.")
 
 
-def cmd_sync(args: argparse.Namespace) -> int:
-    root = _project_root(args.project)
-    state = _load_state(_state_path(root))
-    if not state.get("enabled", False) and not args.force:
-        print("Memory mode is off. Use 'on' first or pass --force.")
-        return 1
+def _daemon_disabled(args: argparse.Namespace) -> bool:
+    return bool(getattr(args, "no_daemon", False))
 
-    note_text = _read_note(args)
-    paths = _memory_paths(root)
-    paths["detail_dir"].mkdir(parents=True, exist_ok=True)
-    topic = args.topic or "session-note"
-    now = datetime.now()
+
+def _via_daemon(args: argparse.Namespace, op: str, **params) -> int | None:
+    # Profiled runs stay in-process so their phases are measured here.
+    if _daemon_disabled(args) or profiling.enabled():
+        return None
+    response = memory_daemon.request(op, **params)
+    if response is None:
+        return None
+    # Projects a federated recall skipped are reported by the client, not the daemon.
+    for failure in response.get("failures", []):
+        print(f"Skipped {failure}", file=sys.stderr)
+    print(response.get("output", ""))
+    return int(response.get("code", 1))
+
+
+_NOTE_FIELDS = ("continues", "session_id", "content_hash")
+
+
+def passage_terms(topic: str, note_text: str, passage_chars: int) -> list[tuple[list[int], list]]:
+    if passage_chars <= 0 or len(note_text) <= passage_chars:
+        spans = [(0, len(note_text))]
+    else:
+        spans = split_passages(note_text, passage_chars)
+    return [[list(span), note_terms(f"{topic} {note_text[span[0] : span[1]]}")] for span in spans]
+
+
+def _write_note(
+    root: Path,
+    detail_dir: Path,
+    note: dict,
+    keyword_limit: int,
+    summary_chars: int,
+    passage_chars: int,
+    doc_stats: tuple[int, dict[str, int]],
+    packed: bool = False,
+) -> tuple[dict, list[dict], list[list[str]], bytes]:
+    note_text = note["text"]
+    topic = note.get("topic") or "session-note"
+    keywords = note.get("keywords")
+    continues = note.get("continues")
+    doc_count, doc_freqs = doc_stats
+    # Backfilled sessions keep their own time (created_at, epoch seconds), so
+    # retention and recency see them as the old history they are.
+    created_at = note.get("created_at")
+    now = datetime.fromtimestamp(created_at) if created_at else datetime.now()
     entry_id = now.strftime("%Y%m%d-%H%M%S") + "-" + uuid4().hex[:8]
-    keywords = (
-        [k.strip().lower() for k in args.keywords.split(",") if k.strip()]
-        if args.keywords
-        else extract_keywords(f"{topic} {note_text}", limit=args.keyword_limit)
-    )
-    summary = brief_summary(note_text, max_chars=args.summary_chars)
-    detail_file = paths["detail_dir"] / f"{entry_id}-{topic.replace(' ', '-').lower()}.md"
+    if keywords:
+        # Hand-labelled notes are indexed whole under the given keywords.
+        passages = [[[0, len(note_text)], [(k, 1) for k in keywords]]]
+        keyword_tf = [1] * len(keywords)
+    else:
+        with profiling.phase("extract_keywords"):
+            # Callers that already tokenized (e.g. backfill workers) pass passage_terms.
+            passages = note.get("passage_terms") or passage_terms(topic, note_text, passage_chars)
+            totals: Counter = Counter()
+            for _, counts in passages:
+                totals.update(dict(counts))
+            ranked = rank_keywords(totals, keyword_limit, doc_freqs, doc_count)
+            keywords = [word for word, _ in ranked]
+            keyword_tf = [count for _, count in ranked]
+    summary = brief_summary(note_text, max_chars=summary_chars)
+    detail_file = detail_dir / f"{entry_id}-{topic.replace(' ', '-').lower()}.md"
     detail_rel = detail_file.relative_to(root).as_posix()
-    detail_content = (
+    continues_line = f"- continues: {continues}\n" if continues else ""
+    detail_head = (
         f"# Detail Memory\n\n"
         f"- id: {entry_id}\n"
         f"- topic: {topic}\n"
         f"- timestamp: {now.isoformat(timespec='seconds')}\n"
-        f"- keywords: {', '.join(keywords)}\n\n"
-        f"## Full Detail\n\n{note_text}\n"
+        f"- keywords: {', '.join(keywords)}\n"
+        f"{continues_line}\n"
+        f"## Full Detail\n\n"
     )
-    detail_file.write_text(detail_content, encoding="utf-8")
+    body = f"{detail_head}{note_text}\n".encode("utf-8")
+    if not packed:
+        with profiling.phase("write_detail"):
+            detail_file.write_bytes(body)
 
-    index_data = load_index(paths["index"])
-    entry = {
+    body_offset = len(detail_head.encode("utf-8"))
+    note_record = {
         "id": entry_id,
         "topic": topic,
         "timestamp": now.isoformat(timespec="seconds"),
         "keywords": keywords,
+        "keyword_tf": keyword_tf,
         "summary": summary,
+        "excerpt": make_excerpt(note_text),
         "detail_path": detail_rel,
+        "offset": body_offset,
+        "length": len(note_text.encode("utf-8")),
     }
-    add_entry(index_data, entry)
-    save_index(paths["index"], index_data)
-    update_main_memory(
-        paths["main"],
-        topic=topic,
-        keywords=keywords,
-        detail_path=detail_rel,
-        summary_text=summary,
+    for field in _NOTE_FIELDS:
+        if note.get(field):
+            note_record[field] = note[field]
+    if len(passages) == 1:
+        return note_record, [dict(note_record)], [[term for term, _ in passages[0][1]]], body
+
+    # Long notes are indexed per passage, each pointing at its byte range in
+    # the detail file so recall reads only the slice that matched.
+    entries, doc_terms = [], []
+    byte_pos = body_offset
+    for number, ((start, end), counts) in enumerate(passages, start=1):
+        passage_text = note_text[start:end]
+        passage_bytes = len(passage_text.encode("utf-8"))
+        ranked = rank_keywords(counts, keyword_limit, doc_freqs, doc_count)
+        entries.append(
+            {
+                "id": f"{entry_id}-p{number:02d}",
+                "note_id": entry_id,
+                "topic": topic,
+                "timestamp": note_record["timestamp"],
+                "keywords": [word for word, _ in ranked],
+                "keyword_tf": [count for _, count in ranked],
+                "summary": brief_summary(passage_text, max_chars=summary_chars),
+                "excerpt": make_excerpt(passage_text),
+                "detail_path": detail_rel,
+                "offset": byte_pos,
+                "length": passage_bytes,
+            }
+        )
+        doc_terms.append([term for term, _ in counts])
+        byte_pos += passage_bytes
+    note_record["passages"] = len(entries)
+    return note_record, entries, doc_terms, body
+
+
+def _entry_vectors(note_text: str, record: dict, entries: list[dict]) -> list[tuple[str, array]]:
+    body = note_text.encode("utf-8")
+    rows = []
+    for entry in entries:
+        start = entry["offset"] - record["offset"]
+        text = body[start : start + entry["length"]].decode("utf-8", errors="ignore")
+        rows.append((entry["id"], embed(f"{entry['topic']} {text}")))
+    return rows
+
+
+def sync_notes(
+    root: Path,
+    notes: list[dict],
+    *,
+    keyword_limit: int = 16,
+    summary_chars: int = 220,
+    passage_chars: int = 2000,
+) -> list[dict]:
+    # Detail files are written per note (or appended to a pack in one write);
+    # the index and main.md get one write each.
+    paths = _memory_paths(root)
+    paths["detail_dir"].mkdir(parents=True, exist_ok=True)
+    state = _load_state(_state_path(root))
+    backend = project_backend(root, state.get("index_backend", "json"))
+    # A backend that stores detail bodies itself gets them with the entries.
+    packed = backend.stores_details or state.get("detail_store") == "pack"
+    policy = state.get("dedupe_policy", "link")
+    with profiling.phase("load_doc_freqs"):
+        doc_stats = backend.doc_stats()
+    with profiling.phase("load_simhash"):
+        table = SimHashTable.load(paths["index"])
+    vectorize = state.get("semantic_index", True)
+    results: list[dict] = []
+    written, signatures, vectors = [], [], []
+    for note in notes:
+        with profiling.phase("simhash"):
+            signature = simhash(term_counts(note["text"]))
+            duplicate_of = table.match(signature)
+        if duplicate_of and policy == "skip":
+            results.append({"id": duplicate_of, "duplicate_of": duplicate_of, "skipped": True, "entries": []})
+            continue
+        with profiling.phase("write_note"):
+            record, note_entries, note_doc_terms, body = _write_note(
+                root, paths["detail_dir"], note, keyword_limit, summary_chars, passage_chars, doc_stats, packed
+            )
+        if duplicate_of:
+            record["duplicate_of"] = duplicate_of
+            for entry in note_entries:
+                entry["duplicate_of"] = duplicate_of
+            if policy == "link":
+                # A linked note keeps its detail but adds no postings, document
+                # frequencies or main.md line; recall finds the original instead.
+                record.pop("passages", None)
+                note_entries, note_doc_terms = [dict(record, keywords=[], keyword_tf=[])], [[]]
+        else:
+            table.add(signature, record["id"])
+            signatures.append((signature, record["id"]))
+        if vectorize and not (duplicate_of and policy == "link"):
+            with profiling.phase("embed"):
+                vectors.extend(_entry_vectors(note["text"], record, note_entries))
+        written.append((record, note_entries, note_doc_terms, body))
+        results.append(record)
+    bodies = {}
+    if backend.stores_details:
+        for record, note_entries, _, body in written:
+            bodies[record["id"]] = body
+            record["store"] = backend.name
+            for entry in note_entries:
+                entry["store"] = backend.name
+    elif packed and written:
+        with profiling.phase("write_packed"):
+            refs = write_packed(root, [body for *_, body in written], state.get("detail_codec", "zlib"))
+        for (record, note_entries, _, _), ref in zip(written, refs):
+            record["pack"] = ref
+            for entry in note_entries:
+                entry["pack"] = ref
+    new_entries = [entry for _, note_entries, _, _ in written for entry in note_entries]
+    profiling.count("notes", len(notes))
+    profiling.count("entries", len(new_entries))
+    profiling.count("postings", sum(len(entry.get("keywords", [])) for entry in new_entries))
+    # The generation moves only once the vectors and signatures are on disk,
+    # so a recall cached meanwhile is keyed on the old generation and dropped.
+    with profiling.phase("index_commit"):
+        backend.append(
+            new_entries,
+            [terms for _, _, note_doc_terms, _ in written for terms in note_doc_terms],
+            bodies,
+            bump=False,
+        )
+    backend.close()
+    with profiling.phase("sidecars"):
+        append_signatures(paths["index"], signatures)
+        if table.needs_fold:
+            fold_signatures(paths["index"])
+        append_vectors(paths["index"], vectors)
+        if new_entries:
+            publish_generation(paths["index"])
+    with profiling.phase("update_main_memory"):
+        append_main_memory(
+            paths["main"],
+            [record for record, *_ in written if not (policy == "link" and record.get("duplicate_of"))],
+        )
+    _fold_recall_stats(root)
+    # Callers get one record per note; its index entries (one per passage) ride along.
+    for record, note_entries, _, _ in written:
+        record["entries"] = note_entries
+    return results
+
+
+def sync_note(
+    root: Path,
+    note_text: str,
+    *,
+    topic: str | None = None,
+    keywords: list[str] | None = None,
+    keyword_limit: int = 16,
+    summary_chars: int = 220,
+    passage_chars: int = 2000,
+    continues: str | None = None,
+    created_at: float | None = None,
+) -> dict:
+    note = {"text": note_text, "topic": topic, "keywords": keywords, "continues": continues, "created_at": created_at}
+    return sync_notes(
+        root,
+        [note],
+        keyword_limit=keyword_limit,
+        summary_chars=summary_chars,
+        passage_chars=passage_chars,
+    )[0]
+
+
+def _sync_output(entry: dict) -> str:
+    if entry.get("skipped"):
+        return f"Skipped near-duplicate of memory entry: {entry['duplicate_of']}"
+    output = f"Synced memory entry: {entry['id']}\nDetail: {entry['detail_path']}"
+    if entry.get("passages"):
+        output += f"\nIndexed passages: {entry['passages']}"
+    if entry.get("duplicate_of"):
+        output += f"\nNear-duplicate of: {entry['duplicate_of']}"
+    return output
+
+
+def _parse_keywords(raw: str | None) -> list[str] | None:
+    if not raw:
+        return None
+    return [k.strip().lower() for k in raw.split(",") if k.strip()]
+
+
+def _read_batch(source: str) -> list[dict]:
+    if source == "-":
+        raw_lines = sys.stdin.read().splitlines()
+    else:
+        raw_lines = Path(source).read_text(encoding="utf-8").splitlines()
+    notes = []
+    for line_no, raw in enumerate(raw_lines, start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            item = json.loads(raw)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Batch line {line_no} is not valid JSON: {exc}") from exc
+        text = item.get("text") or item.get("note")
+        if not text:
+            raise ValueError(f"Batch line {line_no} has no text.")
+        keywords = item.get("keywords")
+        if isinstance(keywords, str):
+            keywords = _parse_keywords(keywords)
+        elif keywords:
+            keywords = [str(k).strip().lower() for k in keywords if str(k).strip()]
+        notes.append({"text": text, "topic": item.get("topic"), "keywords": keywords or None})
+    return notes
+
+
+def _sync_batch(args: argparse.Namespace, root: Path) -> int:
+    started = time.perf_counter()
+    notes = _read_batch(args.batch)
+    if not notes:
+        print("Batch contained no notes.")
+        return 1
+    entries = sync_notes(
+        root,
+        notes,
+        keyword_limit=args.keyword_limit,
+        summary_chars=args.summary_chars,
+        passage_chars=args.passage_chars,
     )
-    print(f"Synced memory entry: {entry_id}")
-    print(f"Detail: {detail_rel}")
+    elapsed = time.perf_counter() - started
+    for entry in entries:
+        print(_sync_output(entry))
+    rate = len(entries) / elapsed if elapsed > 0 else 0.0
+    print(f"Batch synced {len(entries)} notes in {elapsed:.3f}s ({rate:.1f} notes/s).")
     return 0
 
 
+def cmd_sync(args: argparse.Namespace) -> int:
+    root = _project_root(args.project)
+    state = _load_state(_state_path(root))
+    if not state.get("enabled", False) and not args.force:
+        print("Memory mode is off. Use 'on' first or pass --force.")
+        return 1
+    if args.batch:
+        return _sync_batch(args, root)
+
+    note_text = _read_note(args)
+    params = {
+        "topic": args.topic,
+        "keywords": _parse_keywords(args.keywords),
+        "keyword_limit": args.keyword_limit,
+        "summary_chars": args.summary_chars,
+        "passage_chars": args.passage_chars,
+        "continues": args.continues,
+        "created_at": args.created_at,
+    }
+    code = _via_daemon(args, "sync", project=str(root), note=note_text, force=args.force, **params)
+    if code is not None:
+        return code
+    entry = sync_note(root, note_text, **params)
+    print(_sync_output(entry))
+    return 0
+
+
+def _recall_stats_path(root: Path) -> Path:
+    return root / ".codex" / "memory" / "recall_stats.json"
+
+
+def _recall_stats_log(root: Path) -> Path:
+    return root / ".codex" / "memory" / "recall_stats.log"
+
+
+def _load_recall_stats(root: Path, with_log: bool = False) -> dict[str, int]:
+    # Preload ranks by the folded counts only, so its cache key is the stamp
+    # of recall_stats.json; hits still in the log count once folded.
+    stats: dict[str, int] = {}
+    path = _recall_stats_path(root)
+    if path.exists():
+        try:
+            stats = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            stats = {}
+    log_path = _recall_stats_log(root)
+    if with_log and log_path.exists():
+        try:
+            for note_id in log_path.read_text(encoding="utf-8").split():
+                stats[note_id] = stats.get(note_id, 0) + 1
+        except OSError:
+            pass
+    return stats
+
+
+def _fold_recall_stats(root: Path, keep: set[str] | None = None) -> None:
+    # Runs at sync, rollup and gc, which change main.md and so the preload
+    # selection anyway.
+    if keep is None and not _recall_stats_log(root).exists():
+        return
+    stats = _load_recall_stats(root, with_log=True)
+    if keep is not None:
+        stats = {k: v for k, v in stats.items() if k in keep}
+    try:
+        atomic_write_text(_recall_stats_path(root), json.dumps(stats))
+        _recall_stats_log(root).unlink(missing_ok=True)
+    except OSError:
+        pass
+
+
+def _log_recall_hits(root: Path, note_ids: list[str]) -> None:
+    # Recalls only append their ids; sync, rollup and gc fold the log into
+    # recall_stats.json.
+    if not note_ids:
+        return
+    try:
+        with _recall_stats_log(root).open("a", encoding="utf-8") as f:
+            f.write(" ".join(note_ids) + "\n")
+    except OSError:
+        pass
+
+
+def _recall_cache_dir(root: Path) -> Path:
+    return root / ".codex" / "memory" / "recall-cache"
+
+
+def _record_recall_hits(root: Path, entries: list[dict]) -> None:
+    # Hit counts feed the preload ranking; losing one under a race is harmless.
+    _log_recall_hits(root, [entry.get("note_id", entry["id"]) for entry in entries])
+
+
+def _recall_output(
+    root: Path,
+    query: str,
+    max_results: int,
+    index_data: dict | None = None,
+    recall_index: RecallIndex | None = None,
+    *,
+    as_json: bool = False,
+    context_chars: int = 0,
+    semantic: bool = False,
+    keyword_weight: float = 0.3,
+    use_cache: bool = True,
+) -> str:
+    # Results are cached per normalized query and index generation; a hit
+    # skips loading the index entirely.
+    options = {
+        "max_results": max_results,
+        "as_json": as_json,
+        "context_chars": context_chars,
+        "semantic": semantic,
+        "keyword_weight": keyword_weight if semantic else None,
+    }
+    if not use_cache:
+        return _recall_render(root, query, index_data, recall_index, **options)[0]
+    cache_dir = _recall_cache_dir(root)
+    generation = index_generation(_memory_paths(root)["index"])
+    key = recall_cache.cache_key(query_terms(query), options)
+    with profiling.phase("cache_lookup"):
+        hit = recall_cache.lookup(cache_dir, key, generation)
+    if hit is not None:
+        output, note_ids = hit
+        profiling.count("cache_hits", 1)
+        _log_recall_hits(root, note_ids)
+        return output
+    output, note_ids = _recall_render(root, query, index_data, recall_index, **options)
+    recall_cache.store(cache_dir, key, generation, output, note_ids)
+    return output
+
+
+def _recall_render(
+    root: Path,
+    query: str,
+    index_data: dict | None,
+    recall_index: RecallIndex | None,
+    *,
+    max_results: int,
+    as_json: bool,
+    context_chars: int,
+    semantic: bool,
+    keyword_weight: float | None,
+) -> tuple[str, list[str]]:
+    if semantic and not semantic_available():
+        print("Semantic recall needs numpy; using keyword recall.", file=sys.stderr)
+        semantic = False
+    if index_data is None and recall_index is None:
+        # A compacted JSON project is answered from the mapped binary snapshot
+        # plus the log tail, without parsing index.json; SQLite answers from FTS5.
+        with profiling.phase("load_index"):
+            recall_index = project_backend(root).recall_index()
+            index_data = {}
+        profiling.count("entries", len(recall_index))
+    elif recall_index is None:
+        recall_index = RecallIndex(index_data)
+    with profiling.phase("score"):
+        if semantic:
+            scored = _semantic_scored(root, index_data, recall_index, query, max_results, keyword_weight)
+        else:
+            scored = recall_scored(index_data, query, max_results=max_results, recall_index=recall_index)
+    profiling.count("hits", len(scored))
+    _record_recall_hits(root, [entry for _, entry in scored])
+    note_ids = [entry.get("note_id", entry["id"]) for _, entry in scored]
+    with profiling.phase("render"):
+        if as_json:
+            return render_recall_json(root, scored, context_chars), note_ids
+        return render_recall_result(root, [entry for _, entry in scored], context_chars), note_ids
+
+
+def _semantic_scored(
+    root: Path,
+    index_data: dict,
+    recall_index: Any,
+    query: str,
+    max_results: int,
+    keyword_weight: float,
+) -> list[tuple[float, dict]]:
+    # One matrix-vector product over every stored vector, optionally fused with
+    # BM25 over a wider candidate pool from each side.
+    pool = max_results * 4
+    semantic = SemanticIndex(_memory_paths(root)["index"]).search(query, pool)
+    keyword = recall_scored(index_data, query, max_results=pool, recall_index=recall_index) if keyword_weight > 0 else []
+    fused = fuse_scores(semantic, keyword, keyword_weight)
+    # Vector hits resolve through the same recall index as keyword hits, so
+    # only the fused candidates are decoded; ids of dropped entries fall out.
+    entries = recall_index.lookup(list(fused))
+    ranked = sorted(((score, entry_id) for entry_id, score in fused.items() if entry_id in entries), reverse=True)
+    return [(score, entries[entry_id]) for score, entry_id in ranked[:max_results]]
+
+
 def cmd_recall(args: argparse.Namespace) -> int:
+    if args.projects:
+        return _federated_recall(args)
+    root = _project_root(args.project)
+    options = {
+        "as_json": args.json,
+        "context_chars": args.context_chars,
+        "semantic": args.semantic,
+        "keyword_weight": args.keyword_weight,
+        "use_cache": not args.no_cache,
+    }
+    code = _via_daemon(
+        args,
+        "recall",
+        project=str(root),
+        query=args.query,
+        max_results=args.max_results,
+        **options,
+    )
+    if code is not None:
+        return code
+    print(_recall_output(root, args.query, args.max_results, **options))
+    return 0
+
+
+def _federated_roots(patterns: list[str]) -> list[Path]:
+    # Each item is a project root or a glob of roots; roots without a
+    # docs/memory directory are skipped.
+    roots: dict[Path, None] = {}
+    for pattern in patterns:
+        expanded = os.path.expanduser(pattern)
+        for match in sorted(glob.glob(expanded)) or [expanded]:
+            root = Path(match).resolve()
+            if _memory_paths(root)["base"].is_dir():
+                roots.setdefault(root, None)
+    return list(roots)
+
+
+def _federated_scored(
+    roots: list[Path],
+    search: Callable[[Path], list[tuple[float, dict]]],
+    max_results: int,
+    workers: int | None = None,
+) -> tuple[list[tuple[float, Path, dict]], list[str]]:
+    # Each project returns its own top k on a pool thread, so the merged
+    # top k is exact and the wait is bounded by the slowest project.
+    def run(root: Path) -> tuple[Path, list[tuple[float, dict]], str | None]:
+        try:
+            return root, search(root), None
+        except (OSError, ValueError) as exc:
+            return root, [], f"{root}: {exc}"
+
+    merged: list[tuple[float, Path, dict]] = []
+    failures = []
+    with ThreadPoolExecutor(max_workers=workers or min(32, len(roots))) as pool:
+        for root, scored, failure in pool.map(run, roots):
+            merged.extend((score, root, entry) for score, entry in scored)
+            if failure:
+                failures.append(failure)
+    return heapq.nlargest(max_results, merged, key=lambda item: item[0]), failures
+
+
+def _federated_output(scored: list[tuple[float, Path, dict]], as_json: bool, context_chars: int) -> str:
+    by_root: dict[Path, list[dict]] = {}
+    for _, root, entry in scored:
+        by_root.setdefault(root, []).append(entry)
+    for root, entries in by_root.items():
+        _record_recall_hits(root, entries)
+    with profiling.phase("render"):
+        if as_json:
+            return json.dumps(federated_hits(scored, context_chars), ensure_ascii=False, indent=2)
+        return render_federated_result(scored, context_chars)
+
+
+def _federated_recall(args: argparse.Namespace) -> int:
+    if args.semantic:
+        print("Semantic recall is per project; using keyword recall across --projects.", file=sys.stderr)
+    roots = _federated_roots(args.projects)
+    if not roots:
+        print("No project memories match --projects.")
+        return 1
+    code = _via_daemon(
+        args,
+        "federated_recall",
+        projects=[str(root) for root in roots],
+        query=args.query,
+        max_results=args.max_results,
+        as_json=args.json,
+        context_chars=args.context_chars,
+        workers=args.workers,
+    )
+    if code is not None:
+        return code
+
+    # Without a daemon each project's recall index is opened once per call;
+    # the daemon keeps them warm across calls.
+    def search(root: Path) -> list[tuple[float, dict]]:
+        return recall_scored({}, args.query, max_results=args.max_results, recall_index=project_backend(root).recall_index())
+
+    with profiling.phase("federated_search"):
+        scored, failures = _federated_scored(roots, search, args.max_results, args.workers)
+    for failure in failures:
+        print(f"Skipped {failure}", file=sys.stderr)
+    profiling.count("projects", len(roots))
+    profiling.count("hits", len(scored))
+    print(_federated_output(scored, args.json, args.context_chars))
+    return 0
+
+
+def _turn_text(line: str) -> str:
+    line = line.strip()
+    if line.startswith("{"):
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            return line
+        if isinstance(item, dict):
+            return str(item.get("text") or "")
+    return line
+
+
+def cmd_auto_recall(args: argparse.Namespace) -> int:
+    root = _project_root(args.project)
+    state = _load_state(_state_path(root))
+    if not state.get("enabled"):
+        print("Memory mode is off. Use 'on' first.")
+        return 1
+    if not state.get("auto_recall_keywords"):
+        print("Auto recall is off for this project (auto_recall_keywords: false).")
+        return 1
+    engine = AutoRecall(
+        project_backend(root, state.get("index_backend", "json")),
+        window=args.window,
+        threshold=args.threshold,
+        cooldown_turns=args.cooldown_turns,
+        min_interval=args.min_interval,
+        max_results=args.max_results,
+        since_epoch=args.since_epoch,
+    )
+    # One turn per stdin line (plain text or {"role", "text"} JSON); output is
+    # flushed per emission so a host can read it while the session runs.
+    for line in iter(sys.stdin.readline, ""):
+        text = _turn_text(line)
+        if not text:
+            continue
+        with profiling.phase("turn"):
+            triggers, scored = engine.feed(text)
+        if not scored:
+            continue
+        entries = [entry for _, entry in scored]
+        _record_recall_hits(root, entries)
+        if args.json:
+            hits = recall_hits(root, entries, scores=[score for score, _ in scored])
+            print(json.dumps({"turn": engine.turn_number, "terms": triggers, "hits": hits}, ensure_ascii=False))
+        else:
+            print(f"[auto-recall] turn {engine.turn_number}: {', '.join(triggers)}")
+            print(render_recall_result(root, entries))
+        sys.stdout.flush()
+    profiling.count("turns", engine.turn_number)
+    return 0
+
+
+def cmd_compact(args: argparse.Namespace) -> int:
     root = _project_root(args.project)
     paths = _memory_paths(root)
-    index_data = load_index(paths["index"])
-    entries = recall(index_data, args.query, max_results=args.max_results)
-    print(render_recall_result(root, entries))
+    backend = project_backend(root)
+    with profiling.phase("compact_index"):
+        entry_count, segment_count = backend.compact()
+    with profiling.phase("fold_signatures"):
+        fold_signatures(paths["index"])
+    profiling.count("entries", entry_count)
+    print(f"Compacted index: {entry_count} entries, {segment_count} log segments folded.")
     return 0
 
 
+def _estimate_tokens(text: str) -> int:
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def _preload_cache_path(root: Path) -> Path:
+    return root / ".codex" / "memory" / "preload_cache.md"
+
+
+def _file_stamp(path: Path) -> str:
+    try:
+        stat = path.stat()
+    except OSError:
+        return "-"
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _preload_output(
+    root: Path,
+    main_text: str | None = None,
+    max_chars: int | None = None,
+    max_tokens: int | None = None,
+) -> str:
+    state = _load_state(_state_path(root))
+    if not state.get("enabled", False):
+        return "Memory mode is disabled."
+    main_path = _memory_paths(root)["main"]
+    if main_text is None and not main_path.exists():
+        return "Main memory file not found."
+    if not max_chars and not max_tokens:
+        return main_text if main_text is not None else main_path.read_text(encoding="utf-8")
+
+    # The rendered selection is cached; the key only needs two stat() calls.
+    cache_path = _preload_cache_path(root)
+    cache_key = (
+        f"<!-- preload main={_file_stamp(main_path)} "
+        f"recall={_file_stamp(_recall_stats_path(root))} chars={max_chars} tokens={max_tokens} -->"
+    )
+    if cache_path.exists():
+        with profiling.phase("read_cache"):
+            cached = cache_path.read_text(encoding="utf-8")
+        first, _, rendered = cached.partition("\n")
+        if first == cache_key:
+            profiling.count("cache_hits", 1)
+            return rendered
+    if main_text is None:
+        with profiling.phase("read_main"):
+            main_text = main_path.read_text(encoding="utf-8")
+    with profiling.phase("select_lines"):
+        if max_tokens:
+            rendered = select_main_lines(
+                main_text, max_tokens, recall_counts=_load_recall_stats(root), cost=_estimate_tokens
+            )
+        else:
+            rendered = select_main_lines(main_text, max_chars, recall_counts=_load_recall_stats(root))
+    try:
+        atomic_write_text(cache_path, cache_key + "\n" + rendered)
+    except OSError:
+        pass
+    return rendered
+
+
 def cmd_preload(args: argparse.Namespace) -> int:
     root = _project_root(args.project)
+    budget = {"max_chars": args.max_chars, "max_tokens": args.max_tokens}
+    code = _via_daemon(args, "preload", project=str(root), **budget)
+    if code is not None:
+        return code
+    print(_preload_output(root, **budget))
+    return 0
+
+
+def cmd_rollup(args: argparse.Namespace) -> int:
+    root = _project_root(args.project)
+    folded, remaining = rollup_main_memory(_memory_paths(root)["main"], keep=args.keep)
+    _fold_recall_stats(root)
+    print(f"Rolled up {folded} main memory records; {remaining} lines remain.")
+    return 0
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    root = _project_root(args.project)
+    index_data = project_backend(root).load_index()
+    written = export_packed(root, index_data.get("entries", []), overwrite=args.overwrite)
+    print(f"Exported {written} detail files from packs or the database.")
+    return 0
+
+
+def _note_text(root: Path, group: list[dict]) -> str:
+    # The note body spans its passages' byte ranges; legacy entries read the whole file.
+    if any("offset" not in entry or "length" not in entry for entry in group):
+        return read_detail_text(root, {key: value for key, value in group[0].items() if key not in ("offset", "length")})
+    start = min(entry["offset"] for entry in group)
+    end = max(entry["offset"] + entry["length"] for entry in group)
+    return read_detail_text(root, dict(group[0], offset=start, length=end - start))
+
+
+def cmd_dedupe(args: argparse.Namespace) -> int:
+    root = _project_root(args.project)
+    paths = _memory_paths(root)
+    policy = args.policy or _load_state(_state_path(root)).get("dedupe_policy", "link")
+    backend = project_backend(root)
+    groups = note_groups(backend.load_index().get("entries", []))
+    table = SimHashTable()
+    signatures, duplicates = [], {}
+    for note_id, group in groups.items():
+        if group[0].get("duplicate_of"):
+            duplicates[note_id] = group[0]["duplicate_of"]
+            continue
+        try:
+            text = _note_text(root, group)
+        except (OSError, ValueError, KeyError):
+            continue
+        signature = simhash(term_counts(text))
+        original = table.match(signature)
+        if original:
+            duplicates[note_id] = original
+        else:
+            table.add(signature, note_id)
+            signatures.append((signature, note_id))
+    for note_id, original in duplicates.items():
+        print(f"- {note_id} -> {original}")
+    if not args.apply:
+        print(f"Found {len(duplicates)} near-duplicate notes among {len(groups)}; pass --apply to {policy} them.")
+        return 0
+
+    def update(entries: list[dict]) -> list[dict]:
+        kept = []
+        for entry in entries:
+            original = duplicates.get(entry.get("note_id", entry["id"]))
+            if original is None:
+                kept.append(entry)
+                continue
+            if policy == "skip":
+                continue
+            entry["duplicate_of"] = original
+            if policy == "link":
+                entry["keywords"], entry["keyword_tf"] = [], []
+            kept.append(entry)
+        return kept
+
+    remaining = backend.rewrite(update)
+    write_signatures(paths["index"], signatures)
+    dropped = drop_main_records(paths["main"], set(duplicates)) if policy != "keep" else 0
+    print(
+        f"Applied '{policy}' to {len(duplicates)} near-duplicate notes; "
+        f"{remaining} index entries and {dropped} fewer main memory lines."
+    )
+    return 0
+
+
+def cmd_gc(args: argparse.Namespace) -> int:
+    root = _project_root(args.project)
+    paths = _memory_paths(root)
     state = _load_state(_state_path(root))
-    if not state.get("enabled", False):
-        print("Memory mode is disabled.")
+    policy = {
+        "ttl_days": args.ttl_days if args.ttl_days is not None else state.get("gc_ttl_days"),
+        "max_entries": args.max_entries if args.max_entries is not None else state.get("gc_max_entries"),
+        "max_bytes": args.max_bytes if args.max_bytes is not None else state.get("gc_max_bytes"),
+    }
+    backend = project_backend(root, state.get("index_backend", "json"))
+    with profiling.phase("load_index"):
+        entries = backend.load_index().get("entries", [])
+    groups = note_groups(entries)
+    # A linked duplicate has no postings of its own and is only reachable
+    # through its original, so it shares the original's fate instead of
+    # counting against the retention budget.
+    linked_to = {
+        note_id: group[0]["duplicate_of"]
+        for note_id, group in groups.items()
+        if group[0].get("duplicate_of") and not any(entry.get("keywords") for entry in group)
+    }
+    with profiling.phase("select"):
+        expired = expired_notes(root, {key: value for key, value in groups.items() if key not in linked_to}, **policy)
+    with profiling.phase("check_details"):
+        # Entries whose detail is gone would only ever render a dangling hit.
+        broken = {
+            entry.get("note_id", entry["id"])
+            for entry, problem in check_details(root, entries, args.workers)
+            if problem.startswith("missing detail")
+        } | backend.missing_bodies()
+    drop = expired | broken
+    linked = {note_id for note_id, original in linked_to.items() if original in drop or original not in groups} - drop
+    drop |= linked
+    kept_paths = {entry.get("detail_path") for entry in entries if entry.get("note_id", entry["id"]) not in drop}
+    stale_files = {
+        root / entry["detail_path"]
+        for entry in entries
+        if entry.get("note_id", entry["id"]) in drop and entry.get("detail_path") not in kept_paths
+    }
+    orphans = orphan_details(root, {entry.get("detail_path") for entry in entries}, ORPHAN_GRACE_SECONDS)
+    print(
+        f"{len(expired)} expired notes, {len(broken - expired)} notes with missing details, "
+        f"{len(linked)} linked duplicates of removed notes, {len(orphans)} orphaned detail files (of {len(groups)} notes)."
+    )
+    if not args.apply:
+        print("Pass --apply to remove them.")
         return 0
-    main_path = _memory_paths(root)["main"]
-    if not main_path.exists():
-        print("Main memory file not found.")
+
+    dead_segments: list[Path] = []
+    freed = 0
+
+    def update(current: list[dict]) -> list[dict]:
+        nonlocal dead_segments, freed
+        kept = [entry for entry in current if entry.get("note_id", entry["id"]) not in drop]
+        kept_notes = set(note_groups(kept))
+        for entry in kept:
+            if entry.get("duplicate_of") and entry["duplicate_of"] not in kept_notes:
+                del entry["duplicate_of"]
+        dead_segments, freed = repack(root, kept, min_age=ORPHAN_GRACE_SECONDS)
+        return kept
+
+    def after(kept: list[dict]) -> None:
+        # Vectors, signatures and main.md lines are appended after the index
+        # commit, so under the index lock anything not indexed is stale.
+        note_ids = set(note_groups(kept))
+        prune_vectors(paths["index"], {entry["id"] for entry in kept})
+        prune_signatures(paths["index"], note_ids)
+        if paths["main"].exists():
+            _, records = parse_main_records(paths["main"].read_text(encoding="utf-8"))
+            drop_main_records(
+                paths["main"],
+                {record["entry_id"] for record in records if record["entry_id"] and record["entry_id"] not in note_ids},
+            )
+        _fold_recall_stats(root, keep=note_ids)
+        for segment in dead_segments:
+            segment.unlink(missing_ok=True)
+
+    with profiling.phase("rewrite_index"):
+        remaining = backend.rewrite(update, after)
+    removed = 0
+    for path in stale_files | set(orphans):
+        try:
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    recall_cache.clear(_recall_cache_dir(root))
+    print(
+        f"Removed {len(drop)} notes and {removed} detail files; reclaimed {freed} pack bytes "
+        f"from {len(dead_segments)} segments. {remaining} index entries remain."
+    )
+    return 0
+
+
+def cmd_fsck(args: argparse.Namespace) -> int:
+    root = _project_root(args.project)
+    paths = _memory_paths(root)
+    backend = project_backend(root)
+    with profiling.phase("fsck"):
+        problems = backend.check() + fsck(
+            root,
+            backend.load_index(),
+            paths["index"],
+            paths["main"],
+            args.workers,
+            binary_index=backend.name == "json",
+        )
+    for problem in problems:
+        print(f"- {problem}")
+    if problems:
+        print(f"{len(problems)} problems found; 'gc --apply' and 'compact' repair most of them.")
+        return 1
+    print("Memory store is consistent.")
+    return 0
+
+
+def _migrate_to_sqlite(root: Path, source, target) -> tuple[int, int, int]:
+    # Bodies are copied from detail files or packs into the database; the
+    # JSON index and detail files are left in place untouched.
+    for path in (target.path, target.path.with_name(target.path.name + "-wal"), target.path.with_name(target.path.name + "-shm")):
+        path.unlink(missing_ok=True)
+    entries = source.load_index().get("entries", [])
+    groups = list(note_groups(entries).items())
+    missing = 0
+    for start in range(0, len(groups), 1000):
+        batch, bodies = [], {}
+        for note_id, group in groups[start : start + 1000]:
+            whole = {key: value for key, value in group[0].items() if key not in ("offset", "length")}
+            try:
+                bodies[note_id] = read_detail_text(root, whole).encode("utf-8")
+            except (OSError, ValueError, KeyError):
+                missing += 1
+            for entry in group:
+                entry.pop("pack", None)
+                entry["store"] = target.name
+                batch.append(entry)
+        target.append(batch, [[] for _ in batch], bodies)
+    target.set_doc_stats(*source.doc_stats())
+    return len(entries), len(groups), missing
+
+
+def _migrate_to_json(root: Path, source, target) -> tuple[int, int, int]:
+    # Bodies are written back as markdown detail files.
+    entries = source.load_index().get("entries", [])
+    groups = note_groups(entries)
+    missing = 0
+    for note_id, group in groups.items():
+        target_file = root / group[0]["detail_path"]
+        if not target_file.exists():
+            try:
+                body = read_detail_text(root, {key: value for key, value in group[0].items() if key not in ("offset", "length")})
+            except (OSError, ValueError, KeyError):
+                missing += 1
+                body = None
+            if body is not None:
+                target_file.parent.mkdir(parents=True, exist_ok=True)
+                target_file.write_bytes(body.encode("utf-8"))
+        for entry in group:
+            entry.pop("store", None)
+    rewrite_index(target.index_path, lambda _: entries)
+    save_doc_freqs(target.index_path, *source.doc_freq_table())
+    return len(entries), len(groups), missing
+
+
+def cmd_migrate(args: argparse.Namespace) -> int:
+    root = _project_root(args.project)
+    state_path = _state_path(root)
+    state = _load_state(state_path)
+    current = state.get("index_backend", "json")
+    if args.to == current:
+        print(f"Index backend is already '{current}'.")
         return 0
-    print(main_path.read_text(encoding="utf-8"))
+    if args.to == "sqlite":
+        from sqlite_backend import sqlite_available
+
+        if not sqlite_available():
+            print("This Python's sqlite3 module lacks FTS5; the sqlite backend is unavailable.")
+            return 1
+    source = project_backend(root, current)
+    target = project_backend(root, args.to)
+    migrate = _migrate_to_sqlite if args.to == "sqlite" else _migrate_to_json
+    with profiling.phase("migrate"):
+        entry_count, note_count, missing = migrate(root, source, target)
+    source.close()
+    target.close()
+    state["index_backend"] = args.to
+    _save_state(state_path, state)
+    recall_cache.clear(_recall_cache_dir(root))
+    print(f"Migrated {entry_count} index entries ({note_count} notes) from '{current}' to '{args.to}'.")
+    if missing:
+        print(f"{missing} notes had no readable detail body.")
     return 0
 
 
+class _WarmProject:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.paths = _memory_paths(root)
+        self.lock = threading.Lock()
+        self.index_signature: tuple | None = None
+        self.snapshot: tuple[int, int] | None = None
+        self.log_offsets: dict[str, int] = {}
+        self.index_data: dict = {}
+        self.recall_index = None
+        self.main_signature: tuple | None = None
+        self.main_text: str | None = None
+
+    def index(self) -> tuple[dict, Any]:
+        backend = project_backend(self.root)
+        if not backend.warm_index:
+            # A database backend is queried directly; a Python copy adds nothing.
+            self.index_data, self.recall_index, self.index_signature = {}, None, None
+            return {}, backend.recall_index()
+        signature = backend.signature()
+        if signature == self.index_signature and self.recall_index is not None:
+            return self.index_data, self.recall_index
+        # The signature is taken before reading, so a write landing in between
+        # is read now and only costs an empty tail read next time.
+        if self.recall_index is not None:
+            tail = read_log_tail(self.paths["index"], self.snapshot, self.log_offsets)
+            if tail is not None:
+                # Appends by anyone (this daemon, grouped tickets, other
+                # processes) are folded in instead of reparsing the index.
+                entries, self.log_offsets = tail
+                self._add(entries)
+                self.index_signature = signature
+                return self.index_data, self.recall_index
+        while True:
+            self.snapshot = snapshot_stamp(self.paths["index"])
+            self.index_data = backend.load_index()
+            self.recall_index = RecallIndex(self.index_data)
+            tail = read_log_tail(self.paths["index"], self.snapshot, {})
+            if tail is not None:
+                break
+        entries, self.log_offsets = tail
+        self._add(entries)
+        self.index_signature = signature
+        return self.index_data, self.recall_index
+
+    def _add(self, entries: list[dict]) -> None:
+        for entry in entries:
+            if entry["id"] in self.recall_index.entries_by_id:
+                continue
+            add_entry(self.index_data, entry)
+            self.recall_index.add(entry)
+
+    def main(self) -> str | None:
+        main_path = self.paths["main"]
+        try:
+            stat = main_path.stat()
+        except OSError:
+            self.main_signature, self.main_text = None, None
+            return None
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if signature != self.main_signature:
+            self.main_text = main_path.read_text(encoding="utf-8")
+            self.main_signature = signature
+        return self.main_text
+
+
+class _DaemonState:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.projects: dict[Path, _WarmProject] = {}
+
+    def project(self, raw: str) -> _WarmProject:
+        root = _project_root(raw)
+        with self.lock:
+            if root not in self.projects:
+                self.projects[root] = _WarmProject(root)
+            return self.projects[root]
+
+    def federated_recall(self, message: dict) -> dict:
+        query = message.get("query", "")
+        max_results = int(message.get("max_results", 5))
+
+        def search(root: Path) -> list[tuple[float, dict]]:
+            warm = self.project(str(root))
+            with warm.lock:
+                index_data, recall_index = warm.index()
+                return recall_scored(index_data, query, max_results=max_results, recall_index=recall_index)
+
+        roots = [Path(raw) for raw in message.get("projects", [])]
+        scored, failures = _federated_scored(roots, search, max_results, message.get("workers"))
+        output = _federated_output(scored, bool(message.get("as_json")), int(message.get("context_chars", 0)))
+        return {"code": 0, "output": output, "failures": failures}
+
+    def handle(self, message: dict) -> dict:
+        op = message.get("op")
+        if op == "federated_recall":
+            return self.federated_recall(message)
+        warm = self.project(message.get("project"))
+        with warm.lock:
+            if op == "recall":
+                index_data, recall_index = warm.index()
+                output = _recall_output(
+                    warm.root,
+                    message.get("query", ""),
+                    int(message.get("max_results", 5)),
+                    index_data=index_data,
+                    recall_index=recall_index,
+                    as_json=bool(message.get("as_json")),
+                    context_chars=int(message.get("context_chars", 0)),
+                    semantic=bool(message.get("semantic")),
+                    keyword_weight=float(message.get("keyword_weight", 0.3)),
+                    use_cache=bool(message.get("use_cache", True)),
+                )
+                return {"code": 0, "output": output}
+            if op == "preload":
+                output = _preload_output(
+                    warm.root,
+                    warm.main(),
+                    max_chars=message.get("max_chars"),
+                    max_tokens=message.get("max_tokens"),
+                )
+                return {"code": 0, "output": output}
+            if op == "sync":
+                state = _load_state(_state_path(warm.root))
+                if not state.get("enabled", False) and not message.get("force"):
+                    return {"code": 1, "output": "Memory mode is off. Use 'on' first or pass --force."}
+                warm.index()
+                entry = sync_note(
+                    warm.root,
+                    message.get("note", ""),
+                    topic=message.get("topic"),
+                    keywords=message.get("keywords"),
+                    keyword_limit=int(message.get("keyword_limit", 16)),
+                    summary_chars=int(message.get("summary_chars", 220)),
+                    passage_chars=int(message.get("passage_chars", 2000)),
+                    continues=message.get("continues"),
+                    created_at=message.get("created_at"),
+                )
+                entry.pop("entries")
+                # Picks up this sync and anything committed alongside it.
+                warm.index()
+                return {"code": 0, "output": _sync_output(entry), "entry": entry}
+        return {"code": 1, "output": f"Unknown memory daemon op: {op}"}
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    path = Path(args.socket) if args.socket else None
+    return memory_daemon.serve(_DaemonState().handle, path)
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Project-scoped memory manager")
     parser.add_argument("--project", help="Target project root path")
+    parser.add_argument("--no-daemon", action="store_true", help="Do not route through a running memory daemon")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print per-phase timings and append them to .codex/memory/metrics.jsonl",
+    )
+    parser.add_argument("--profile-dump", help="Also write cProfile stats to this file")
     sub = parser.add_subparsers(dest="command", required=True)
 
     p_on = sub.add_parser("on", help="Enable memory mode for project")
+    p_on.add_argument("--detail-store", choices=["files", "pack"], help="Write details as markdown files or compressed packs")
+    p_on.add_argument("--detail-codec", choices=["zlib", "lzma"], help="Compression for packed details")
+    p_on.add_argument("--dedupe", choices=["keep", "link", "skip"], help="What sync does with near-duplicate notes")
+    p_on.add_argument("--auto-recall", choices=["on", "off"], help="Set auto_recall_keywords for the auto-recall command")
     p_on.set_defaults(func=cmd_on)
 
     p_off = sub.add_parser("off", help="Disable memory mode for project")
@@ -196,23 +1390,113 @@ def build_parser() -> argparse.ArgumentParser:
     p_sync.add_argument("--keywords", help="Comma separated keyword list")
     p_sync.add_argument("--keyword-limit", type=int, default=16)
     p_sync.add_argument("--summary-chars", type=int, default=220)
+    p_sync.add_argument(
+        "--passage-chars",
+        type=int,
+        default=2000,
+        help="Index notes longer than this as separate passages (0 disables)",
+    )
+    p_sync.add_argument(
+        "--batch",
+        nargs="?",
+        const="-",
+        help="Sync a JSONL stream of notes ({topic, keywords, text}) from a file or stdin",
+    )
+    p_sync.add_argument("--continues", help="Entry id this note continues")
+    p_sync.add_argument("--created-at", type=float, help="Note time as epoch seconds (default: now)")
     p_sync.add_argument("--force", action="store_true", help="Sync even when memory mode is off")
     p_sync.set_defaults(func=cmd_sync)
 
     p_recall = sub.add_parser("recall", help="Recall detail notes by keyword query")
     p_recall.add_argument("--query", required=True, help="Query text")
     p_recall.add_argument("--max-results", type=int, default=5)
+    p_recall.add_argument("--json", action="store_true", help="Print hits as a JSON array")
+    p_recall.add_argument(
+        "--context-chars",
+        type=int,
+        default=0,
+        help="Also show up to this many characters of each hit's detail text",
+    )
+    p_recall.add_argument("--semantic", action="store_true", help="Rank by hashed n-gram vector similarity (needs numpy)")
+    p_recall.add_argument(
+        "--keyword-weight",
+        type=float,
+        default=0.3,
+        help="Weight of the normalized keyword score fused into semantic recall (0 disables)",
+    )
+    p_recall.add_argument("--no-cache", action="store_true", help="Bypass the recall result cache")
+    p_recall.add_argument(
+        "--projects",
+        nargs="+",
+        metavar="ROOT",
+        help="Recall across these project roots (globs allowed) and merge into one top-k",
+    )
+    p_recall.add_argument("--workers", type=int, help="Threads for --projects (default one per project, up to 32)")
     p_recall.set_defaults(func=cmd_recall)
 
+    p_auto = sub.add_parser("auto-recall", help="Recall memory automatically from conversation turns streamed on stdin")
+    p_auto.add_argument("--window", type=int, default=6, help="Number of recent turns in the term window")
+    p_auto.add_argument("--threshold", type=float, default=4.0, help="Windowed count x IDF a keyword must reach to trigger")
+    p_auto.add_argument("--cooldown-turns", type=int, default=3, help="Minimum turns between two emissions")
+    p_auto.add_argument("--min-interval", type=float, default=20.0, help="Minimum seconds between two emissions")
+    p_auto.add_argument("--max-results", type=int, default=3)
+    p_auto.add_argument("--since-epoch", type=float, help="Session start; entries written after it are not recalled")
+    p_auto.add_argument("--json", action="store_true", help="Print one JSON object per emission")
+    p_auto.set_defaults(func=cmd_auto_recall)
+
+    p_compact = sub.add_parser("compact", help="Fold index log segments into index.json")
+    p_compact.set_defaults(func=cmd_compact)
+
     p_preload = sub.add_parser("preload", help="Print main memory for startup preload")
+    p_preload.add_argument("--max-chars", type=int, help="Character budget for ranked preload")
+    p_preload.add_argument("--max-tokens", type=int, help="Approximate token budget for ranked preload")
     p_preload.set_defaults(func=cmd_preload)
+
+    p_rollup = sub.add_parser("rollup", help="Fold older main memory records into monthly rollup lines")
+    p_rollup.add_argument("--keep", type=int, default=200, help="Newest records to keep verbatim")
+    p_rollup.set_defaults(func=cmd_rollup)
+
+    p_dedupe = sub.add_parser("dedupe", help="Find near-duplicate notes across existing history")
+    p_dedupe.add_argument("--policy", choices=["keep", "link", "skip"], help="Override the project's dedupe policy")
+    p_dedupe.add_argument("--apply", action="store_true", help="Update the index and main memory instead of only listing")
+    p_dedupe.set_defaults(func=cmd_dedupe)
+
+    p_gc = sub.add_parser("gc", help="Drop expired notes and reclaim their storage")
+    p_gc.add_argument("--ttl-days", type=float, help="Drop notes older than this (default: state gc_ttl_days)")
+    p_gc.add_argument("--max-entries", type=int, help="Keep at most this many newest notes (default: state gc_max_entries)")
+    p_gc.add_argument("--max-bytes", type=int, help="Keep newest notes up to this many detail bytes (default: state gc_max_bytes)")
+    p_gc.add_argument("--workers", type=int, help="Threads for detail file checks")
+    p_gc.add_argument("--apply", action="store_true", help="Remove instead of only reporting")
+    p_gc.set_defaults(func=cmd_gc)
+
+    p_fsck = sub.add_parser("fsck", help="Check index, detail files, packs, sidecars and main memory agree")
+    p_fsck.add_argument("--workers", type=int, help="Threads for detail file checks")
+    p_fsck.set_defaults(func=cmd_fsck)
+
+    p_migrate = sub.add_parser("migrate", help="Move the index and detail bodies to another index backend")
+    p_migrate.add_argument("--to", required=True, choices=BACKENDS, help="Target backend")
+    p_migrate.set_defaults(func=cmd_migrate)
+
+    p_export = sub.add_parser("export", help="Regenerate markdown detail files from packs")
+    p_export.add_argument("--overwrite", action="store_true", help="Replace detail files that already exist")
+    p_export.set_defaults(func=cmd_export)
+
+    p_serve = sub.add_parser("serve", help="Run a memory daemon with warm per-project indexes")
+    p_serve.add_argument("--socket", help="Unix socket path (default ~/.codex/memory/daemon.sock)")
+    p_serve.set_defaults(func=cmd_serve)
     return parser
 
 
 def main() -> int:
     parser = build_parser()
     args = parser.parse_args()
-    return args.func(args)
+    profiling.start(args.command, enable=args.profile, dump_path=args.profile_dump)
+    code = None
+    try:
+        code = args.func(args)
+        return code
+    finally:
+        profiling.finish(_project_root(args.project), code, echo=args.profile)
 
 
 if __name__ == "__main__":
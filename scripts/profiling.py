@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Iterator
+
+_PROFILE_ENV = "MEMORY_MANAGER_PROFILE"
+_DUMP_ENV = "MEMORY_MANAGER_PROFILE_DUMP"
+_NULL = nullcontext()
+
+
+def _proc_io() -> tuple[int, int, int] | None:
+    # (rchar, wchar, bytes this probe itself read); Linux only.
+    try:
+        with open("/proc/self/io", "rb") as f:
+            raw = f.read()
+        fields = dict(line.split(b": ") for line in raw.splitlines())
+        return int(fields[b"rchar"]), int(fields[b"wchar"]), len(raw)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class _Recorder:
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.started = time.perf_counter()
+        self.stack: list[str] = []
+        self.phases: dict[str, dict[str, Any]] = {}
+        self.counts: dict[str, int] = {}
+        self.profiler = None
+        self.dump_path: str | None = None
+
+
+_recorder: _Recorder | None = None
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+def start(command: str, enable: bool = False, dump_path: str | None = None) -> None:
+    # Everything below is a no-op unless --profile or MEMORY_MANAGER_PROFILE is set.
+    global _recorder
+    dump_path = dump_path or os.environ.get(_DUMP_ENV)
+    if not (enable or dump_path or os.environ.get(_PROFILE_ENV)):
+        return
+    _recorder = _Recorder(command)
+    if dump_path:
+        import cProfile
+
+        _recorder.dump_path = dump_path
+        _recorder.profiler = cProfile.Profile()
+        _recorder.profiler.enable()
+
+
+@contextmanager
+def _measure(recorder: _Recorder, name: str) -> Iterator[None]:
+    recorder.stack.append(name)
+    key = "/".join(recorder.stack)
+    io_before = _proc_io()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        io_after = _proc_io()
+        recorder.stack.pop()
+        stats = recorder.phases.setdefault(key, {"ms": 0.0, "calls": 0})
+        stats["ms"] += elapsed * 1000
+        stats["calls"] += 1
+        if io_before and io_after:
+            stats["read_bytes"] = stats.get("read_bytes", 0) + io_after[0] - io_before[0] - io_before[2]
+            stats["written_bytes"] = stats.get("written_bytes", 0) + io_after[1] - io_before[1]
+
+
+def phase(name: str):
+    if _recorder is None:
+        return _NULL
+    return _measure(_recorder, name)
+
+
+def count(name: str, value: int) -> None:
+    if _recorder is not None:
+        _recorder.counts[name] = _recorder.counts.get(name, 0) + value
+
+
+def finish(project: Path | None, code: int | None = None, echo: bool = False) -> None:
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is None:
+        return
+    if recorder.profiler is not None:
+        recorder.profiler.disable()
+        recorder.profiler.dump_stats(recorder.dump_path)
+    record = {
+        "ts": time.time(),
+        "command": recorder.command,
+        "code": code,
+        "total_ms": round((time.perf_counter() - recorder.started) * 1000, 3),
+        "phases": {key: {k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()} for key, stats in recorder.phases.items()},
+        "counts": recorder.counts,
+    }
+    if project is not None:
+        path = project / ".codex" / "memory" / "metrics.jsonl"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    if echo:
+        lines = [f"[profile] {recorder.command}: {record['total_ms']:.1f} ms"]
+        for key, stats in record["phases"].items():
+            extra = f", read {stats['read_bytes']} B, wrote {stats['written_bytes']} B" if "read_bytes" in stats else ""
+            lines.append(f"[profile]   {key}: {stats['ms']:.1f} ms x{stats['calls']}{extra}")
+        if recorder.counts:
+            lines.append("[profile]   counts: " + ", ".join(f"{k}={v}" for k, v in recorder.counts.items()))
+        print("\n".join(lines), file=sys.stderr)
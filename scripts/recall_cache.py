@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from locking import atomic_write_text
+
+MAX_FILES = 512
+MAX_BYTES = 8 * 1024 * 1024
+
+
+def cache_key(terms: set[str], params: dict[str, Any]) -> str:
+    # Queries that normalize to the same terms share an entry regardless of
+    # word order, case or stopwords.
+    raw = json.dumps({"terms": sorted(terms), **params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def lookup(cache_dir: Path, key: str, generation: int) -> tuple[str, list[str]] | None:
+    # File layout: "<generation> <note ids,comma separated>\n<rendered output>".
+    path = cache_dir / f"{key}.txt"
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            header = f.readline().rstrip("\n")
+            stamp, _, ids = header.partition(" ")
+            if stamp != str(generation):
+                return None
+            output = f.read()
+        # Hits refresh the mtime, which is the LRU order used for eviction.
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return output, [note_id for note_id in ids.split(",") if note_id]
+
+
+def store(cache_dir: Path, key: str, generation: int, output: str, note_ids: list[str]) -> None:
+    try:
+        atomic_write_text(cache_dir / f"{key}.txt", f"{generation} {','.join(note_ids)}\n{output}")
+        _evict(cache_dir)
+    except OSError:
+        pass
+
+
+def _evict(cache_dir: Path) -> None:
+    files = []
+    total = 0
+    with os.scandir(cache_dir) as it:
+        for item in it:
+            if not item.name.endswith(".txt"):
+                continue
+            stat = item.stat()
+            files.append((stat.st_mtime_ns, stat.st_size, item.path))
+            total += stat.st_size
+    if len(files) <= MAX_FILES and total <= MAX_BYTES:
+        return
+    files.sort()
+    count = len(files)
+    for _, size, path in files:
+        if count <= MAX_FILES and total <= MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        count -= 1
+        total -= size
+
+
+def clear(cache_dir: Path) -> int:
+    removed = 0
+    if cache_dir.exists():
+        for path in cache_dir.glob("*.txt"):
+            path.unlink()
+            removed += 1
+    return removed
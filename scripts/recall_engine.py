@@ -1,51 +1,308 @@
 from __future__ import annotations
 
+import heapq
+import json
+import math
+from bisect import bisect_right
 from pathlib import Path
 from typing import Any
 
-from keyword_extract import extract_keywords
+from detail_store import read_detail_text
+from keyword_extract import term_counts
 
+# Shared with binary_index, which scores the mapped snapshot the same way.
+BM25_K1 = 1.2
+BM25_B = 0.75
+_GRAM_SIZE = 2
+_EXCERPT_CHARS = 180
 
-def recall(index_data: dict[str, Any], query: str, max_results: int = 5) -> list[dict[str, Any]]:
-    terms = set(extract_keywords(query, limit=10))
+
+def _grams(term: str) -> set[str]:
+    if len(term) <= _GRAM_SIZE:
+        return {term}
+    return {term[i : i + _GRAM_SIZE] for i in range(len(term) - _GRAM_SIZE + 1)}
+
+
+def fallback_text(entry: dict[str, Any]) -> str:
+    # What the last-resort substring fallback searches, as the original scan
+    # did; linked near-duplicates are only reachable through their original.
+    if entry.get("duplicate_of") and not entry.get("keywords"):
+        return ""
+    return f"{entry.get('topic', '')} {entry.get('summary', '')}".lower()
+
+
+class TextScan:
+    # Every entry's fallback text in one string, so a query term is located
+    # with str.find across the whole collection instead of a per-entry loop.
+    def __init__(self, texts: list[str]) -> None:
+        self.starts: list[int] = []
+        offset = 0
+        for text in texts:
+            self.starts.append(offset)
+            offset += len(text) + 1
+        self.blob = "\0".join(texts)
+
+    def counts(self, terms: set[str]) -> dict[int, int]:
+        # Number of query terms contained in each entry's text, by position.
+        counts: dict[int, int] = {}
+        for term in terms:
+            if not term or "\0" in term:
+                continue
+            pos = self.blob.find(term)
+            while pos != -1:
+                position = bisect_right(self.starts, pos) - 1
+                counts[position] = counts.get(position, 0) + 1
+                # One match per entry: resume at the start of the next one.
+                if position + 1 >= len(self.starts):
+                    break
+                pos = self.blob.find(term, self.starts[position + 1])
+        return counts
+
+
+class RecallIndex:
+    def __init__(self, index_data: dict[str, Any]) -> None:
+        # Postings are the index's own keyword map; per-entry term frequencies
+        # come from the entry's "keyword_tf" list, aligned with "keywords".
+        self.keyword_map: dict[str, list[str]] = index_data.setdefault("keywords", {})
+        self.entries_by_id: dict[str, dict[str, Any]] = {}
+        self.ordinals: dict[str, int] = {}
+        self.total_length = 0
+        self._gram_postings: dict[str, set[str]] | None = None
+        self._text_scan: TextScan | None = None
+        for entry in index_data.get("entries", []):
+            self.add(entry)
+
+    def add(self, entry: dict[str, Any]) -> None:
+        entry_id = entry["id"]
+        self.ordinals[entry_id] = len(self.ordinals)
+        self.entries_by_id[entry_id] = entry
+        self.total_length += len(entry.get("keywords", []))
+        self._text_scan = None
+        if self._gram_postings is not None:
+            for keyword in entry.get("keywords", []):
+                for gram in _grams(keyword):
+                    self._gram_postings.setdefault(gram, set()).add(keyword)
+
+    def __len__(self) -> int:
+        return len(self.entries_by_id)
+
+    def lookup(self, entry_ids: list[str]) -> dict[str, dict[str, Any]]:
+        return {entry_id: self.entries_by_id[entry_id] for entry_id in entry_ids if entry_id in self.entries_by_id}
+
+    def doc_freq(self, term: str) -> int:
+        return len(self.keyword_map.get(term, ()))
+
+    def _term_frequency(self, entry: dict[str, Any], term: str) -> int:
+        keywords = entry.get("keywords", [])
+        tfs = entry.get("keyword_tf")
+        try:
+            pos = keywords.index(term)
+        except ValueError:
+            return 0
+        if tfs and pos < len(tfs):
+            return max(int(tfs[pos]), 1)
+        return 1
+
+    def expand(self, term: str) -> list[str]:
+        # Character n-gram postings over the keyword vocabulary stand in for the
+        # old full substring scan over every entry.
+        if self._gram_postings is None:
+            self._gram_postings = {}
+            for keyword in self.keyword_map:
+                for gram in _grams(keyword):
+                    self._gram_postings.setdefault(gram, set()).add(keyword)
+        grams = sorted(_grams(term), key=lambda g: len(self._gram_postings.get(g, ())))
+        if not grams:
+            return []
+        candidates = set(self._gram_postings.get(grams[0], ()))
+        for gram in grams[1:]:
+            if not candidates:
+                break
+            candidates &= self._gram_postings.get(gram, set())
+        return [keyword for keyword in candidates if term in keyword]
+
+    def substring_search(self, terms: set[str], max_results: int) -> list[tuple[float, dict[str, Any]]]:
+        # Entries whose topic or summary contains query terms, by how many.
+        if self._text_scan is None:
+            self._text_scan = TextScan([fallback_text(entry) for entry in self.entries_by_id.values()])
+        entry_ids = list(self.entries_by_id)
+        top = heapq.nlargest(max_results, self._text_scan.counts(terms).items(), key=lambda item: (item[1], item[0]))
+        return [(float(count), self.entries_by_id[entry_ids[position]]) for position, count in top]
+
+    def search(self, terms: set[str], max_results: int) -> list[tuple[float, dict[str, Any]]]:
+        doc_count = len(self.entries_by_id)
+        if not doc_count or max_results <= 0:
+            return []
+        avg_length = self.total_length / doc_count or 1.0
+        scores: dict[str, float] = {}
+        for term in terms:
+            postings = self.keyword_map.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1.0 + (doc_count - df + 0.5) / (df + 0.5))
+            for entry_id in postings:
+                entry = self.entries_by_id.get(entry_id)
+                if entry is None:
+                    continue
+                tf = self._term_frequency(entry, term)
+                length = len(entry.get("keywords", [])) or 1
+                norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * length / avg_length)
+                scores[entry_id] = scores.get(entry_id, 0.0) + idf * tf * (BM25_K1 + 1.0) / norm
+        top = heapq.nlargest(
+            max_results,
+            scores.items(),
+            key=lambda item: (item[1], self.ordinals[item[0]]),
+        )
+        return [(score, self.entries_by_id[entry_id]) for entry_id, score in top]
+
+
+def query_terms(query: str) -> set[str]:
+    # Every term of the query counts; a top-k keyword cut would drop most
+    # n-grams of a long CJK phrase.
+    terms = set(term_counts(query))
     if not terms:
         terms = {query.strip().lower()}
-    scored = []
-    entries_by_id = {entry["id"]: entry for entry in index_data.get("entries", [])}
-    keyword_map = index_data.get("keywords", {})
-    seen = set()
-    for term in terms:
-        for entry_id in keyword_map.get(term, []):
-            if entry_id in seen or entry_id not in entries_by_id:
-                continue
-            entry = entries_by_id[entry_id]
-            overlap = len(terms.intersection(set(entry.get("keywords", []))))
-            scored.append((overlap, entry))
-            seen.add(entry_id)
-    # Fallback: fuzzy text match over topic and summary when keyword index misses.
+    return terms
+
+
+def recall_scored(
+    index_data: dict[str, Any],
+    query: str,
+    max_results: int = 5,
+    recall_index: RecallIndex | None = None,
+) -> list[tuple[float, dict[str, Any]]]:
+    terms = query_terms(query)
+    if recall_index is None:
+        recall_index = RecallIndex(index_data)
+    scored = recall_index.search(terms, max_results)
+    # Fallback: n-gram match against the keyword vocabulary when exact terms
+    # miss, then query terms inside topic or summary text for what is left.
     if not scored:
-        for entry in index_data.get("entries", []):
-            haystack = f"{entry.get('topic', '')} {entry.get('summary', '')}".lower()
-            score = sum(1 for term in terms if term in haystack)
-            if score > 0:
-                scored.append((score, entry))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [entry for _, entry in scored[:max_results]]
+        expanded = set()
+        for term in terms:
+            expanded.update(recall_index.expand(term))
+        scored = recall_index.search(expanded, max_results)
+        if len(scored) < max_results:
+            seen = {entry["id"] for _, entry in scored}
+            extra = [hit for hit in recall_index.substring_search(terms, max_results) if hit[1]["id"] not in seen]
+            scored += extra[: max_results - len(scored)]
+    return scored
+
+
+def recall(
+    index_data: dict[str, Any],
+    query: str,
+    max_results: int = 5,
+    recall_index: RecallIndex | None = None,
+) -> list[dict[str, Any]]:
+    return [entry for _, entry in recall_scored(index_data, query, max_results, recall_index)]
+
+
+def make_excerpt(text: str, max_chars: int = _EXCERPT_CHARS) -> str:
+    # Whitespace-collapsed prefix; only a bounded head of the text is examined.
+    return " ".join(text[: max_chars * 4].split())[:max_chars]
 
 
-def render_recall_result(project_root: Path, entries: list[dict[str, Any]]) -> str:
+def recall_hits(
+    project_root: Path,
+    entries: list[dict[str, Any]],
+    context_chars: int = 0,
+    scores: list[float] | None = None,
+) -> list[dict[str, Any]]:
+    # Entries synced with a stored excerpt render without touching the
+    # filesystem; detail files are only read, boundedly, for extra context or
+    # for legacy entries.
+    hits = []
+    for pos, item in enumerate(entries):
+        rel_path = item.get("detail_path", "")
+        excerpt = item.get("excerpt")
+        context = None
+        if rel_path and (excerpt is None or context_chars > 0):
+            limit = max(context_chars, _EXCERPT_CHARS) * 4
+            try:
+                text = read_detail_text(project_root, item, limit)
+            except (OSError, ValueError, KeyError):
+                text = None
+            if text is not None:
+                if excerpt is None:
+                    excerpt = make_excerpt(text)
+                if context_chars > 0:
+                    context = text[:context_chars]
+        hit = {
+            "id": item.get("id"),
+            "topic": item.get("topic"),
+            "keywords": item.get("keywords", []),
+            "detail_path": rel_path,
+            "excerpt": excerpt if excerpt is not None else item.get("summary", ""),
+        }
+        for field in ("note_id", "offset", "length", "timestamp"):
+            if field in item:
+                hit[field] = item[field]
+        if scores is not None:
+            hit["score"] = round(scores[pos], 4)
+        if context is not None:
+            hit["context"] = context
+        hits.append(hit)
+    return hits
+
+
+def render_recall_result(
+    project_root: Path,
+    entries: list[dict[str, Any]],
+    context_chars: int = 0,
+) -> str:
     if not entries:
         return "No memory details found for this query."
     lines = []
-    for item in entries:
-        rel_path = item.get("detail_path", "")
-        detail_path = project_root / rel_path if rel_path else None
-        excerpt = item.get("summary", "")
-        if detail_path and detail_path.exists():
-            text = detail_path.read_text(encoding="utf-8")
-            excerpt = " ".join(text.split())[:180]
-        lines.append(
-            f"- id: {item.get('id')} | topic: {item.get('topic')} | "
-            f"keywords: {', '.join(item.get('keywords', []))} | detail: {rel_path} | excerpt: {excerpt}"
-        )
+    for hit in recall_hits(project_root, entries, context_chars):
+        lines.extend(_hit_lines(hit))
     return "\n".join(lines)
+
+
+def _hit_lines(hit: dict[str, Any], prefix: str = "- ") -> list[str]:
+    lines = [
+        f"{prefix}id: {hit['id']} | topic: {hit['topic']} | "
+        f"keywords: {', '.join(hit['keywords'])} | detail: {hit['detail_path']} | excerpt: {hit['excerpt']}"
+    ]
+    if hit.get("context"):
+        lines.extend(f"    {line}" for line in hit["context"].splitlines())
+    return lines
+
+
+def federated_hits(
+    scored: list[tuple[float, Path, dict[str, Any]]],
+    context_chars: int = 0,
+) -> list[dict[str, Any]]:
+    # Hits merged across projects, each rendered against its own root.
+    hits = []
+    for score, project_root, entry in scored:
+        hit = recall_hits(project_root, [entry], context_chars, scores=[score])[0]
+        hits.append({"project": str(project_root), **hit})
+    return hits
+
+
+def render_federated_result(
+    scored: list[tuple[float, Path, dict[str, Any]]],
+    context_chars: int = 0,
+) -> str:
+    if not scored:
+        return "No memory details found for this query."
+    lines = []
+    for hit in federated_hits(scored, context_chars):
+        lines.extend(_hit_lines(hit, f"- project: {hit['project']} | "))
+    return "\n".join(lines)
+
+
+def render_recall_json(
+    project_root: Path,
+    scored: list[tuple[float, dict[str, Any]]],
+    context_chars: int = 0,
+) -> str:
+    hits = recall_hits(
+        project_root,
+        [entry for _, entry in scored],
+        context_chars,
+        scores=[score for score, _ in scored],
+    )
+    return json.dumps(hits, ensure_ascii=False, indent=2)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import math
+import os
+import re
+import sys
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any
+
+from locking import atomic_write_text, locked
+
+DIMENSIONS = 256
+_WORD_RE = re.compile(r"[a-z0-9_]+|[\u4e00-\u9fff]+")
+_CHAR_GRAM = 3
+
+
+def _features(text: str) -> dict[str, float]:
+    # Word unigrams and bigrams plus character trigrams of each word, so
+    # inflections and paraphrases that share stems still overlap.
+    counts: dict[str, float] = {}
+    previous = None
+    for word in _WORD_RE.findall(text.lower()):
+        counts["w" + word] = counts.get("w" + word, 0.0) + 1.0
+        if previous is not None:
+            bigram = f"b{previous} {word}"
+            counts[bigram] = counts.get(bigram, 0.0) + 1.0
+        previous = word
+        padded = f" {word} " if word.isascii() else word
+        size = _CHAR_GRAM if word.isascii() else 2
+        for i in range(len(padded) - size + 1):
+            gram = "c" + padded[i : i + size]
+            counts[gram] = counts.get(gram, 0.0) + 0.5
+    return counts
+
+
+def embed(text: str) -> array:
+    vector = array("f", bytes(4 * DIMENSIONS))
+    for feature, count in _features(text).items():
+        h = zlib.crc32(feature.encode("utf-8"))
+        weight = 1.0 + math.log(count)
+        vector[h % DIMENSIONS] += weight if h >> 31 else -weight
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm:
+        for i in range(DIMENSIONS):
+            vector[i] /= norm
+    return vector
+
+
+def _paths(index_path: Path) -> tuple[Path, Path]:
+    stem = f"vectors-d{DIMENSIONS}"
+    return index_path.with_name(f"{stem}.f32"), index_path.with_name(f"{stem}.ids")
+
+
+def append_vectors(index_path: Path, rows: list[tuple[str, array]]) -> None:
+    # Rows and ids are appended under one lock so row i always belongs to id i.
+    if not rows:
+        return
+    matrix_path, ids_path = _paths(index_path)
+    data = array("f")
+    for _, vector in rows:
+        data.extend(vector)
+    if sys.byteorder != "little":
+        data.byteswap()
+    row_bytes = 4 * DIMENSIONS
+    with locked(index_path.with_name(".vectors.lock")):
+        # Realign first if an interrupted append left one file ahead of the other.
+        ids = ids_path.read_text(encoding="utf-8").splitlines(keepends=True) if ids_path.exists() else []
+        stored = matrix_path.stat().st_size // row_bytes if matrix_path.exists() else 0
+        ids = [line for line in ids if line.endswith("\n")]
+        if stored != len(ids) or (matrix_path.exists() and matrix_path.stat().st_size != stored * row_bytes):
+            keep = min(stored, len(ids))
+            with matrix_path.open("r+b") as f:
+                f.truncate(keep * row_bytes)
+            ids_path.write_text("".join(ids[:keep]), encoding="utf-8")
+        with matrix_path.open("ab") as f:
+            f.write(data.tobytes())
+        with ids_path.open("a", encoding="utf-8") as f:
+            f.write("".join(f"{entry_id}\n" for entry_id, _ in rows))
+
+
+def prune_vectors(index_path: Path, keep_ids: set[str]) -> int:
+    # Rewrites both files without the rows of dropped entries; the matrix is
+    # replaced first, so a crash in between shows up as a row/id mismatch.
+    matrix_path, ids_path = _paths(index_path)
+    if not ids_path.exists() or not matrix_path.exists():
+        return 0
+    row_bytes = 4 * DIMENSIONS
+    with locked(index_path.with_name(".vectors.lock")):
+        ids = ids_path.read_text(encoding="utf-8").split()
+        rows = min(len(ids), matrix_path.stat().st_size // row_bytes)
+        kept = [i for i in range(rows) if ids[i] in keep_ids]
+        if len(kept) == len(ids) == rows:
+            return 0
+        tmp_path = matrix_path.with_name(f".{matrix_path.name}.tmp")
+        with matrix_path.open("rb") as src, tmp_path.open("wb") as dst:
+            wanted = set(kept)
+            for i in range(rows):
+                row = src.read(row_bytes)
+                if i in wanted:
+                    dst.write(row)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_path, matrix_path)
+        atomic_write_text(ids_path, "".join(f"{ids[i]}\n" for i in kept))
+    return len(ids) - len(kept)
+
+
+def vector_ids(index_path: Path) -> tuple[list[str], int]:
+    # (stored ids, stored matrix rows) for consistency checks.
+    matrix_path, ids_path = _paths(index_path)
+    ids = ids_path.read_text(encoding="utf-8").split() if ids_path.exists() else []
+    rows = matrix_path.stat().st_size // (4 * DIMENSIONS) if matrix_path.exists() else 0
+    return ids, rows
+
+
+def _numpy():
+    # Imported on first semantic query only, so ordinary CLI runs never pay for it.
+    try:
+        import numpy
+    except ImportError:  # optional: semantic recall needs it, syncing vectors does not
+        return None
+    return numpy
+
+
+def semantic_available() -> bool:
+    return _numpy() is not None
+
+
+class SemanticIndex:
+    def __init__(self, index_path: Path) -> None:
+        np = _numpy()
+        matrix_path, ids_path = _paths(index_path)
+        self.ids = ids_path.read_text(encoding="utf-8").split() if ids_path.exists() else []
+        rows = matrix_path.stat().st_size // (4 * DIMENSIONS) if matrix_path.exists() else 0
+        # An interrupted append can leave one file ahead of the other.
+        rows = min(rows, len(self.ids))
+        self.ids = self.ids[:rows]
+        if rows:
+            self.matrix = np.memmap(matrix_path, dtype="<f4", mode="r", shape=(rows, DIMENSIONS))
+        else:
+            self.matrix = None
+
+    def search(self, query: str, max_results: int) -> list[tuple[float, str]]:
+        if self.matrix is None or max_results <= 0:
+            return []
+        np = _numpy()
+        q = np.frombuffer(embed(query).tobytes(), dtype=np.float32)
+        scores = self.matrix @ q
+        k = min(max_results, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(float(scores[i]), self.ids[i]) for i in top if scores[i] > 0]
+
+
+def fuse_scores(
+    semantic: list[tuple[float, str]],
+    keyword: list[tuple[float, dict[str, Any]]],
+    keyword_weight: float,
+) -> dict[str, float]:
+    # Cosine scores are already in [0, 1]; BM25 is scaled by its best hit.
+    fused = {entry_id: score for score, entry_id in semantic}
+    best = max((score for score, _ in keyword), default=0.0)
+    if best > 0 and keyword_weight > 0:
+        for score, entry in keyword:
+            fused[entry["id"]] = fused.get(entry["id"], 0.0) + keyword_weight * score / best
+    return fused
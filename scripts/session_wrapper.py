@@ -6,6 +6,8 @@ import subprocess
 import sys
 from pathlib import Path
 
+import memory_daemon
+
 
 def _script_dir() -> Path:
     return Path(__file__).resolve().parent
@@ -19,12 +21,20 @@ def _memory_manager_cmd(project: str | None, subcommand: list[str]) -> list[str]
     return cmd
 
 
+def _project_str(project: str | None) -> str:
+    return str(Path(project).resolve() if project else Path.cwd().resolve())
+
+
 def cmd_start(args: argparse.Namespace) -> int:
-    preload_cmd = _memory_manager_cmd(args.project, ["preload"])
-    preload = subprocess.run(preload_cmd, capture_output=True, text=True)
-    if preload.stdout.strip():
+    response = memory_daemon.request("preload", project=_project_str(args.project))
+    if response is not None:
+        preload_text = response.get("output", "")
+    else:
+        preload_cmd = _memory_manager_cmd(args.project, ["preload"])
+        preload_text = subprocess.run(preload_cmd, capture_output=True, text=True).stdout
+    if preload_text.strip():
         print("=== MEMORY PRELOAD ===")
-        print(preload.stdout.strip())
+        print(preload_text.strip())
         print("======================")
 
     codex_cmd = shlex.split(args.codex_cmd)
@@ -36,6 +46,10 @@ def cmd_quit_sync(args: argparse.Namespace) -> int:
     if not text:
         print("No text provided for quit sync.")
         return 1
+    response = memory_daemon.request("sync", project=_project_str(args.project), topic=args.topic, note=text)
+    if response is not None:
+        print(response.get("output", ""))
+        return int(response.get("code", 1))
     sync_cmd = _memory_manager_cmd(args.project, ["sync", "--topic", args.topic, "--note", text])
     return subprocess.call(sync_cmd)
 
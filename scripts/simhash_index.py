@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from pathlib import Path
+
+from binary_index import le_bytes, pad8
+from locking import atomic_write_bytes, atomic_write_text
+
+_BITS = 64
+_BANDS = 4
+_BAND_BITS = _BITS // _BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+# With 4 bands of 16 bits, any two signatures within 3 bits of each other
+# share at least one band exactly, so band buckets find every such pair.
+MAX_DISTANCE = 3
+
+_MAGIC = b"SIMB01\0\0"
+# magic, bytes of simhash.log folded in, signatures
+_HEADER = struct.Struct("<8sQI")
+# Sync replays only the log written since the last fold, and folds again
+# once that tail passes this size (about 1500 signatures).
+_FOLD_TAIL_BYTES = 64 * 1024
+
+
+def _feature_hash(term: str) -> int:
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(counts: Counter) -> int:
+    weights = [0] * _BITS
+    for term, count in counts.items():
+        h = _feature_hash(term)
+        for bit in range(_BITS):
+            weights[bit] += count if h >> bit & 1 else -count
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def sidecar_path(index_path: Path) -> Path:
+    return index_path.with_name("simhash.log")
+
+
+def bands_path(index_path: Path) -> Path:
+    return index_path.with_name("simhash.bin")
+
+
+def _read_log(index_path: Path, start: int = 0) -> tuple[list[tuple[int, str]], int]:
+    # Sidecar lines are "<16 hex digits> <note id>", appended at each sync.
+    # Returns the rows and the offset just past the last complete line.
+    try:
+        with sidecar_path(index_path).open("rb") as f:
+            f.seek(start)
+            data = f.read()
+    except OSError:
+        return [], start
+    end = data.rfind(b"\n") + 1
+    rows = []
+    for raw in data[:end].decode("utf-8", errors="ignore").splitlines():
+        parts = raw.split()
+        if len(parts) != 2 or len(parts[0]) != 16:
+            continue
+        try:
+            rows.append((int(parts[0], 16), parts[1]))
+        except ValueError:
+            continue
+    return rows, start + end
+
+
+def read_signatures(index_path: Path) -> list[tuple[int, str]]:
+    return _read_log(index_path)[0]
+
+
+def _band_key(signature: int, band: int) -> int:
+    return signature >> (band * _BAND_BITS) & _BAND_MASK
+
+
+def fold_signatures(index_path: Path) -> None:
+    # Folds simhash.log into simhash.bin: the signatures and note ids in log
+    # order, plus per band the 16-bit keys sorted with their row numbers, so
+    # a lookup is a binary search per band instead of a replay of the log.
+    rows, end = _read_log(index_path)
+    signatures = array("Q", [signature for signature, _ in rows])
+    id_offsets = array("I", [0])
+    ids = []
+    for _, note_id in rows:
+        encoded = note_id.encode("utf-8")
+        ids.append(encoded)
+        id_offsets.append(id_offsets[-1] + len(encoded))
+    sections = [le_bytes(signatures)]
+    for band in range(_BANDS):
+        order = sorted(range(len(rows)), key=lambda row: _band_key(signatures[row], band))
+        sections.append(le_bytes(array("H", [_band_key(signatures[row], band) for row in order])))
+        sections.append(le_bytes(array("I", order)))
+    sections.extend([le_bytes(id_offsets), b"".join(ids)])
+    header = _HEADER.pack(_MAGIC, end, len(rows))
+    atomic_write_bytes(bands_path(index_path), pad8(header) + b"".join(pad8(section) for section in sections))
+
+
+class _FoldedSignatures:
+    def __init__(self, path: Path, log_size: int) -> None:
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.log_bytes, count = _HEADER.unpack_from(self._mm, 0)
+        # A log rewritten shorter than what was folded means the file is stale.
+        if magic != _MAGIC or self.log_bytes > log_size:
+            self._mm.close()
+            raise ValueError("stale signature bands")
+        view = memoryview(self._mm)
+        pos = _HEADER.size + (-_HEADER.size % 8)
+
+        def section(nbytes: int) -> memoryview:
+            nonlocal pos
+            chunk = view[pos : pos + nbytes]
+            pos += nbytes + (-nbytes % 8)
+            return chunk
+
+        self.signatures = section(count * 8).cast("Q")
+        self.bands = [(section(count * 2).cast("H"), section(count * 4).cast("I")) for _ in range(_BANDS)]
+        self._id_offsets = section((count + 1) * 4).cast("I")
+        self._id_blob = section(self._id_offsets[count])
+
+    def note_id(self, row: int) -> str:
+        return bytes(self._id_blob[self._id_offsets[row] : self._id_offsets[row + 1]]).decode("utf-8")
+
+    def candidates(self, band: int, key: int):
+        keys, rows = self.bands[band]
+        for pos in range(bisect_left(keys, key), bisect_right(keys, key)):
+            yield self.signatures[rows[pos]], rows[pos]
+
+
+def _open_folded(index_path: Path) -> _FoldedSignatures | None:
+    path = bands_path(index_path)
+    if sys.byteorder != "little" or not path.exists():
+        return None
+    try:
+        return _FoldedSignatures(path, sidecar_path(index_path).stat().st_size)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+class SimHashTable:
+    # Band buckets for signatures held in memory (the log tail past the last
+    # fold, plus this sync's notes) over the memory-mapped simhash.bin.
+    def __init__(self) -> None:
+        self.buckets: list[dict[int, list[tuple[int, str]]]] = [{} for _ in range(_BANDS)]
+        self.folded: _FoldedSignatures | None = None
+        self.tail_bytes = 0
+
+    @classmethod
+    def load(cls, index_path: Path) -> SimHashTable:
+        table = cls()
+        table.folded = _open_folded(index_path)
+        start = table.folded.log_bytes if table.folded else 0
+        rows, end = _read_log(index_path, start)
+        for signature, note_id in rows:
+            table.add(signature, note_id)
+        table.tail_bytes = end - start
+        return table
+
+    @property
+    def needs_fold(self) -> bool:
+        return self.tail_bytes > _FOLD_TAIL_BYTES
+
+    def add(self, signature: int, note_id: str) -> None:
+        for band in range(_BANDS):
+            self.buckets[band].setdefault(_band_key(signature, band), []).append((signature, note_id))
+
+    def match(self, signature: int, max_distance: int = MAX_DISTANCE) -> str | None:
+        best: tuple[int, str] | None = None
+        for band in range(_BANDS):
+            key = _band_key(signature, band)
+            for other, note_id in self.buckets[band].get(key, ()):
+                distance = hamming(signature, other)
+                if distance <= max_distance and (best is None or distance < best[0]):
+                    best = (distance, note_id)
+            if self.folded is None:
+                continue
+            for other, row in self.folded.candidates(band, key):
+                distance = hamming(signature, other)
+                if distance <= max_distance and (best is None or distance < best[0]):
+                    best = (distance, self.folded.note_id(row))
+        return best[1] if best else None
+
+
+def append_signatures(index_path: Path, rows: list[tuple[int, str]]) -> None:
+    if not rows:
+        return
+    payload = "".join(f"{signature:016x} {note_id}\n" for signature, note_id in rows).encode("utf-8")
+    # One O_APPEND write per sync keeps concurrent appenders from interleaving lines.
+    fd = os.open(sidecar_path(index_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
+
+
+def write_signatures(index_path: Path, rows: list[tuple[int, str]]) -> None:
+    # The old fold describes the log being replaced; drop it before the swap.
+    bands_path(index_path).unlink(missing_ok=True)
+    atomic_write_text(sidecar_path(index_path), "".join(f"{signature:016x} {note_id}\n" for signature, note_id in rows))
+    fold_signatures(index_path)
+
+
+def prune_signatures(index_path: Path, keep_ids: set[str]) -> int:
+    # A signature appended by a sync while this runs can be lost; that only
+    # costs one missed duplicate match.
+    rows = read_signatures(index_path)
+    kept = [(signature, note_id) for signature, note_id in rows if note_id in keep_ids]
+    if len(kept) < len(rows):
+        write_signatures(index_path, kept)
+    return len(rows) - len(kept)
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Callable
+
+from index_store import add_entry, bump_generation, locked_index
+from keyword_extract import term_counts
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    note_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_note ON entries(note_id);
+CREATE TABLE IF NOT EXISTS details (
+    note_id TEXT PRIMARY KEY,
+    body BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS doc_freqs (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS entry_fts USING fts5(
+    topic, keywords, terms, tokenize = "unicode61 tokenchars '_-'"
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS entry_vocab USING fts5vocab(entry_fts, 'row');
+"""
+# bm25() column weights: topic, keywords, full passage terms.
+_BM25_WEIGHTS = "1.0, 2.0, 1.0"
+# Passage terms are stored as repeated tokens so FTS5 sees their counts;
+# capping repeats keeps one very frequent word from bloating the index.
+_MAX_TERM_REPEAT = 8
+
+
+def sqlite_path(index_path: Path) -> Path:
+    return index_path.with_name("memory.sqlite3")
+
+
+def sqlite_available() -> bool:
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+    except sqlite3.Error:
+        return False
+    return True
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Autocommit mode; writers open explicit BEGIN IMMEDIATE transactions.
+    conn = sqlite3.connect(path, timeout=30.0, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def read_body(index_path: Path, note_id: str) -> bytes:
+    conn = sqlite3.connect(sqlite_path(index_path), timeout=30.0)
+    try:
+        row = conn.execute("SELECT body FROM details WHERE note_id = ?", (note_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise KeyError(note_id)
+    return bytes(row[0])
+
+
+def _match_expression(terms: set[str]) -> str:
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in sorted(terms) if term)
+
+
+def _passage_terms(entry: dict[str, Any], body: bytes | None) -> str:
+    if body is None:
+        return ""
+    if "length" in entry:
+        start = entry.get("offset", 0)
+        body = body[start : start + entry["length"]]
+    # This column is the full-text side of recall: every term of the passage,
+    # not only its keywords.
+    counts = term_counts(body.decode("utf-8", errors="ignore"))
+    return " ".join(" ".join([term] * min(count, _MAX_TERM_REPEAT)) for term, count in counts.items())
+
+
+def _searchable(entry: dict[str, Any]) -> bool:
+    # Linked near-duplicates carry no keywords and are never recalled.
+    return not (entry.get("duplicate_of") and not entry.get("keywords"))
+
+
+class _DocFreqs:
+    # Looks document frequencies up per term instead of loading the whole
+    # vocabulary; rank_keywords only ever calls get().
+    def __init__(self, conn: sqlite3.Connection, doc_count: int) -> None:
+        self.conn = conn
+        self.doc_count = doc_count
+        self.cache: dict[str, int] = {}
+
+    def __bool__(self) -> bool:
+        return self.doc_count > 0
+
+    def get(self, term: str, default: int = 0) -> int:
+        if term not in self.cache:
+            row = self.conn.execute("SELECT df FROM doc_freqs WHERE term = ?", (term,)).fetchone()
+            self.cache[term] = row[0] if row else default
+        return self.cache[term]
+
+
+class SqliteBackend:
+    # Entries, detail bodies and an FTS5 index over every passage's full text
+    # in one WAL-mode database, so readers never block the writer and a sync
+    # commits entries and bodies in one transaction.
+    name = "sqlite"
+    stores_details = True
+    warm_index = False
+
+    def __init__(self, index_path: Path) -> None:
+        self.index_path = index_path
+        self.path = sqlite_path(index_path)
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = _connect(self.path)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def signature(self) -> tuple:
+        parts = []
+        for path in (self.path, self.path.with_name(self.path.name + "-wal")):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            parts.append((path.name, stat.st_size, stat.st_mtime_ns))
+        return tuple(parts)
+
+    def load_index(self) -> dict[str, Any]:
+        index_data: dict[str, Any] = {"entries": [], "keywords": {}}
+        for (data,) in self.conn.execute("SELECT data FROM entries ORDER BY rowid"):
+            add_entry(index_data, json.loads(data))
+        return index_data
+
+    def doc_stats(self) -> tuple[int, _DocFreqs]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'docs'").fetchone()
+        doc_count = row[0] if row else 0
+        return doc_count, _DocFreqs(self.conn, doc_count)
+
+    def doc_freq_table(self) -> tuple[int, dict[str, int]]:
+        doc_count, _ = self.doc_stats()
+        return doc_count, dict(self.conn.execute("SELECT term, df FROM doc_freqs"))
+
+    def set_doc_stats(self, doc_count: int, doc_freqs: dict[str, int]) -> None:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM doc_freqs")
+            conn.executemany("INSERT INTO doc_freqs (term, df) VALUES (?, ?)", list(doc_freqs.items()))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('docs', ?)", (doc_count,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def append(
+        self,
+        entries: list[dict[str, Any]],
+        doc_terms: list[list[str]] | None = None,
+        bodies: dict[str, bytes] | None = None,
+        bump: bool = True,
+    ) -> None:
+        if not entries:
+            return
+        bodies = bodies or {}
+        doc_terms = doc_terms or [entry.get("keywords", []) for entry in entries]
+        df_delta: dict[str, int] = {}
+        for terms in doc_terms:
+            for term in set(terms):
+                df_delta[term] = df_delta.get(term, 0) + 1
+        # Tokenize before taking the write lock.
+        rows = []
+        for entry in entries:
+            note_id = entry.get("note_id", entry["id"])
+            terms = _passage_terms(entry, bodies.get(note_id)) if _searchable(entry) else None
+            rows.append((entry, note_id, terms))
+        conn = self.conn
+        with locked_index(self.index_path):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO details (note_id, body) VALUES (?, ?)",
+                    list(bodies.items()),
+                )
+                for entry, note_id, terms in rows:
+                    cursor = conn.execute(
+                        "INSERT INTO entries (id, note_id, data) VALUES (?, ?, ?)",
+                        (entry["id"], note_id, json.dumps(entry, ensure_ascii=False)),
+                    )
+                    if terms is not None:
+                        conn.execute(
+                            "INSERT INTO entry_fts (rowid, topic, keywords, terms) VALUES (?, ?, ?, ?)",
+                            (cursor.lastrowid, entry.get("topic") or "", " ".join(entry.get("keywords", [])), terms),
+                        )
+                conn.executemany(
+                    "INSERT INTO doc_freqs (term, df) VALUES (?, ?) ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+                    list(df_delta.items()),
+                )
+                conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('docs', ?) ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+                    (len(entries),),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if bump:
+                bump_generation(self.index_path)
+
+    def rewrite(
+        self,
+        update: Callable[[list[dict[str, Any]]], list[dict[str, Any]]],
+        after: Callable[[list[dict[str, Any]]], None] | None = None,
+    ) -> int:
+        # Same contract as index_store.rewrite_index: only rows whose entry was
+        # dropped or changed are touched, and bodies no entry uses are deleted.
+        conn = self.conn
+        with locked_index(self.index_path):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = {}
+                entries = []
+                for rowid, data in conn.execute("SELECT rowid, data FROM entries ORDER BY rowid"):
+                    entry = json.loads(data)
+                    before[entry["id"]] = (rowid, data)
+                    entries.append(entry)
+                entries = update(entries)
+                kept = {entry["id"] for entry in entries}
+                for entry_id, (rowid, _) in before.items():
+                    if entry_id not in kept:
+                        conn.execute("DELETE FROM entries WHERE rowid = ?", (rowid,))
+                        conn.execute("DELETE FROM entry_fts WHERE rowid = ?", (rowid,))
+                for entry in entries:
+                    rowid, data = before.get(entry["id"], (None, None))
+                    encoded = json.dumps(entry, ensure_ascii=False)
+                    if rowid is None or encoded == data:
+                        continue
+                    conn.execute("UPDATE entries SET data = ? WHERE rowid = ?", (encoded, rowid))
+                    if _searchable(entry):
+                        conn.execute(
+                            "UPDATE entry_fts SET topic = ?, keywords = ? WHERE rowid = ?",
+                            (entry.get("topic") or "", " ".join(entry.get("keywords", [])), rowid),
+                        )
+                    else:
+                        conn.execute("DELETE FROM entry_fts WHERE rowid = ?", (rowid,))
+                conn.execute("DELETE FROM details WHERE note_id NOT IN (SELECT note_id FROM entries)")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            bump_generation(self.index_path)
+            if after is not None:
+                after(entries)
+        return len(entries)
+
+    def compact(self) -> tuple[int, int]:
+        conn = self.conn
+        conn.execute("INSERT INTO entry_fts (entry_fts) VALUES ('optimize')")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return len(self), 0
+
+    def missing_bodies(self) -> set[str]:
+        rows = self.conn.execute("SELECT DISTINCT note_id FROM entries WHERE note_id NOT IN (SELECT note_id FROM details)")
+        return {note_id for (note_id,) in rows}
+
+    def check(self) -> list[str]:
+        problems = [f"sqlite: {row[0]}" for row in self.conn.execute("PRAGMA quick_check") if row[0] != "ok"]
+        try:
+            self.conn.execute("INSERT INTO entry_fts (entry_fts) VALUES ('integrity-check')")
+        except sqlite3.DatabaseError as exc:
+            problems.append(f"sqlite: full-text index: {exc}")
+        problems.extend(f"sqlite: no detail body for note {note_id}" for note_id in sorted(self.missing_bodies()))
+        return problems
+
+    def recall_index(self) -> SqliteBackend:
+        return self
+
+    # RecallIndex interface, answered by FTS5.
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT count(*) FROM entries").fetchone()[0]
+
+    def lookup(self, entry_ids: list[str]) -> dict[str, dict[str, Any]]:
+        if not entry_ids:
+            return {}
+        rows = self.conn.execute(
+            f"SELECT id, data FROM entries WHERE id IN ({', '.join('?' * len(entry_ids))})",
+            entry_ids,
+        )
+        return {entry_id: json.loads(data) for entry_id, data in rows}
+
+    def doc_freq(self, term: str) -> int:
+        row = self.conn.execute("SELECT doc FROM entry_vocab WHERE term = ?", (term,)).fetchone()
+        return row[0] if row else 0
+
+    def expand(self, term: str) -> list[str]:
+        rows = self.conn.execute(
+            "SELECT term FROM entry_vocab WHERE term >= ? AND term < ?",
+            (term, term + "\U0010ffff"),
+        )
+        return [found for (found,) in rows]
+
+    def substring_search(self, terms: set[str], max_results: int) -> list[tuple[float, dict[str, Any]]]:
+        # The last-resort topic/summary substring scan, run inside SQLite.
+        terms = [term for term in terms if term]
+        if not terms or max_results <= 0:
+            return []
+        text = "lower(coalesce(json_extract(data, '$.topic'), '') || ' ' || coalesce(json_extract(data, '$.summary'), ''))"
+        hits = " + ".join(f"(instr({text}, ?) > 0)" for _ in terms)
+        rows = self.conn.execute(
+            f"SELECT data, hits FROM (SELECT rowid, data, {hits} AS hits FROM entries "
+            f"WHERE json_extract(data, '$.duplicate_of') IS NULL "
+            f"OR coalesce(json_array_length(data, '$.keywords'), 0) > 0) "
+            f"WHERE hits > 0 ORDER BY hits DESC, rowid DESC LIMIT ?",
+            (*terms, max_results),
+        ).fetchall()
+        return [(float(count), json.loads(data)) for data, count in rows]
+
+    def search(self, terms: set[str], max_results: int) -> list[tuple[float, dict[str, Any]]]:
+        expression = _match_expression(terms)
+        if not expression or max_results <= 0:
+            return []
+        try:
+            rows = self.conn.execute(
+                f"SELECT entries.data, -bm25(entry_fts, {_BM25_WEIGHTS}) FROM entry_fts "
+                f"JOIN entries ON entries.rowid = entry_fts.rowid WHERE entry_fts MATCH ? "
+                f"ORDER BY bm25(entry_fts, {_BM25_WEIGHTS}), entries.rowid DESC LIMIT ?",
+                (expression, max_results),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return []
+        return [(score, json.loads(data)) for data, score in rows]
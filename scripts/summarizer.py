@@ -1,8 +1,23 @@
 from __future__ import annotations
 
+import math
+import re
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 
+from locking import atomic_write_text, locked
+
+
+_MAIN_HEADER = "# Main Memory\n\nShort, stable memory records. Full details live in docs/memory/detail.\n\n"
+_ENTRY_ID_RE = re.compile(r"(\d{8}-\d{6}-[0-9a-f]{8})")
+_ROLLUP_COUNT_RE = re.compile(r"rollup \((\d+) entries\)")
+_RECENCY_HALF_LIFE = 50
+
+
+def _main_lock(main_path: Path) -> Path:
+    return main_path.with_name(f".{main_path.stem}.lock")
+
 
 def brief_summary(text: str, max_chars: int = 220) -> str:
     normalized = " ".join(text.split())
@@ -11,6 +26,26 @@ def brief_summary(text: str, max_chars: int = 220) -> str:
     return normalized[: max_chars - 3] + "..."
 
 
+def split_passages(text: str, target_chars: int) -> list[tuple[int, int]]:
+    # Contiguous spans of roughly target_chars, cut at paragraph, line or word
+    # boundaries when one exists in the back half of the window.
+    spans = []
+    start, length = 0, len(text)
+    while start < length:
+        end = min(start + target_chars, length)
+        if end < length:
+            floor = start + target_chars // 2
+            # Prefer starting the next passage at a heading, then a blank line.
+            for sep, keep in (("\n#", 1), ("\n\n", 2), ("\n", 1), (" ", 1)):
+                cut = text.rfind(sep, floor, end)
+                if cut != -1:
+                    end = cut + keep
+                    break
+        spans.append((start, end))
+        start = end
+    return spans
+
+
 def update_main_memory(
     main_path: Path,
     *,
@@ -19,16 +54,151 @@ def update_main_memory(
     detail_path: str,
     summary_text: str,
 ) -> None:
-    main_path.parent.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-    line = (
-        f"- {timestamp} | {topic} | keywords: {', '.join(keywords)} | "
-        f"detail: {detail_path} | summary: {summary_text}\n"
+    append_main_memory(
+        main_path,
+        [{"topic": topic, "keywords": keywords, "detail_path": detail_path, "summary": summary_text}],
     )
-    if not main_path.exists():
-        header = "# Main Memory\n\nShort, stable memory records. Full details live in docs/memory/detail.\n\n"
-        main_path.write_text(header + line, encoding="utf-8")
+
+
+def _main_period(record: dict) -> str | None:
+    try:
+        return datetime.fromisoformat(record["timestamp"]).strftime("%Y-%m-%d %H:%M")
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def append_main_memory(main_path: Path, records: list[dict]) -> None:
+    if not records:
         return
-    with main_path.open("a", encoding="utf-8") as f:
-        f.write(line)
+    main_path.parent.mkdir(parents=True, exist_ok=True)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    lines = "".join(
+        f"- {_main_period(record) or now} | {record['topic']} | keywords: {', '.join(record['keywords'])} | "
+        f"detail: {record['detail_path']} | summary: {record['summary']}\n"
+        for record in records
+    )
+    with locked(_main_lock(main_path)):
+        if not main_path.exists():
+            atomic_write_text(main_path, _MAIN_HEADER + lines)
+            return
+        with main_path.open("a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def parse_main_records(text: str) -> tuple[list[str], list[dict]]:
+    header: list[str] = []
+    records: list[dict] = []
+    for line in text.splitlines():
+        if not line.startswith("- ") or " | " not in line:
+            if not records:
+                header.append(line)
+            continue
+        fields = line[2:].split(" | ")
+        record = {"line": line, "period": fields[0], "topic": fields[1] if len(fields) > 1 else ""}
+        record["keywords"] = []
+        record["detail_path"] = ""
+        record["summary"] = ""
+        for field in fields[2:]:
+            if field.startswith("keywords: "):
+                record["keywords"] = [k for k in field[len("keywords: ") :].split(", ") if k]
+            elif field.startswith("detail: "):
+                record["detail_path"] = field[len("detail: ") :]
+            elif field.startswith("summary: "):
+                record["summary"] = field[len("summary: ") :]
+        match = _ENTRY_ID_RE.search(record["detail_path"])
+        record["entry_id"] = match.group(1) if match else None
+        records.append(record)
+    return header, records
+
+
+def select_main_lines(
+    text: str,
+    budget: int,
+    *,
+    recall_counts: dict[str, int] | None = None,
+    cost=len,
+) -> str:
+    # Rank records by recency, how often recall returned them, and how central
+    # their keywords are to the project, then keep the best that fit the budget.
+    header, records = parse_main_records(text)
+    header_text = "\n".join(header).rstrip() + "\n\n"
+    remaining = budget - cost(header_text)
+    if not records or remaining <= 0:
+        return header_text.rstrip()
+    recall_counts = recall_counts or {}
+    keyword_counts = Counter(k for record in records for k in set(record["keywords"]))
+    max_keyword = math.log1p(max(keyword_counts.values(), default=1))
+    max_recall = math.log1p(max(recall_counts.values(), default=0)) or 1.0
+    total = len(records)
+    # Recency follows each record's own time, not its place in the file:
+    # backfilled history is appended after newer lines.
+    age = {
+        position: total - 1 - rank
+        for rank, position in enumerate(sorted(range(total), key=lambda p: records[p]["period"]))
+    }
+    ranked = []
+    for position, record in enumerate(records):
+        recency = 0.5 ** (age[position] / _RECENCY_HALF_LIFE)
+        hits = math.log1p(recall_counts.get(record["entry_id"] or "", 0)) / max_recall
+        centrality = (
+            sum(math.log1p(keyword_counts[k]) for k in record["keywords"]) / len(record["keywords"]) / max_keyword
+            if record["keywords"] and max_keyword
+            else 0.0
+        )
+        ranked.append((recency + 0.6 * hits + 0.4 * centrality, position))
+    ranked.sort(reverse=True)
+    chosen = []
+    for _, position in ranked:
+        line_cost = cost(records[position]["line"] + "\n")
+        if line_cost <= remaining:
+            chosen.append(position)
+            remaining -= line_cost
+    return header_text + "\n".join(records[p]["line"] for p in sorted(chosen))
+
+
+def rollup_main_memory(main_path: Path, keep: int) -> tuple[int, int]:
+    # Fold everything but the newest `keep` records into one line per month.
+    # Full details stay in the index and detail files.
+    with locked(_main_lock(main_path)):
+        if not main_path.exists():
+            return 0, 0
+        header, records = parse_main_records(main_path.read_text(encoding="utf-8"))
+        if len(records) <= keep:
+            return 0, len(records)
+        # Oldest by the records' own time; backfilled lines sit at the end.
+        records.sort(key=lambda record: record["period"])
+        old, recent = records[: len(records) - keep], records[len(records) - keep :]
+        months: dict[str, dict] = {}
+        for record in old:
+            month = record["period"][:7]
+            bucket = months.setdefault(month, {"count": 0, "keywords": Counter(), "topics": Counter()})
+            match = _ROLLUP_COUNT_RE.search(record["topic"])
+            bucket["count"] += int(match.group(1)) if match else 1
+            bucket["keywords"].update(record["keywords"])
+            if match and record["summary"].startswith("topics: "):
+                bucket["topics"].update(t for t in record["summary"][len("topics: ") :].split(", ") if t)
+            elif not match:
+                bucket["topics"][record["topic"]] += 1
+        rollups = [
+            f"- {month} | rollup ({bucket['count']} entries) | "
+            f"keywords: {', '.join(k for k, _ in bucket['keywords'].most_common(12))} | "
+            f"detail: docs/memory/index.json | "
+            f"summary: topics: {', '.join(t for t, _ in bucket['topics'].most_common(8))}"
+            for month, bucket in sorted(months.items())
+        ]
+        body = "\n".join(rollups + [record["line"] for record in recent])
+        atomic_write_text(main_path, "\n".join(header).rstrip() + "\n\n" + body + "\n")
+        return len(old), len(rollups) + len(recent)
+
 
+def drop_main_records(main_path: Path, entry_ids: set[str]) -> int:
+    with locked(_main_lock(main_path)):
+        if not main_path.exists() or not entry_ids:
+            return 0
+        header, records = parse_main_records(main_path.read_text(encoding="utf-8"))
+        kept = [record for record in records if record["entry_id"] not in entry_ids]
+        if len(kept) == len(records):
+            return 0
+        body = "\n".join(record["line"] for record in kept)
+        atomic_write_text(main_path, "\n".join(header).rstrip() + "\n\n" + body + "\n")
+        return len(records) - len(kept)
@@ -7,7 +7,8 @@ param(
   [int]$PreloadMaxChars = 6000,
   [switch]$DisableAutoEnable,
   [switch]$DisableAutoSync,
-  [switch]$DisablePreloadMain
+  [switch]$DisablePreloadMain,
+  [switch]$WatchSessions
 )
 
 $ErrorActionPreference = "Stop"
@@ -40,12 +41,8 @@ if (-not $DisableAutoEnable) {
 
 $preloadPrompt = ""
 if (-not $DisablePreloadMain) {
-  $mainPath = Join-Path $project "docs\memory\main.md"
-  if (Test-Path -LiteralPath $mainPath) {
-    $mainText = Get-Content -LiteralPath $mainPath -Raw -Encoding utf8
-    if ($mainText.Length -gt $PreloadMaxChars) {
-      $mainText = $mainText.Substring($mainText.Length - $PreloadMaxChars)
-    }
+  $mainText = (& python $memoryManager --project $project preload --max-chars $PreloadMaxChars | Out-String).Trim()
+  if ($LASTEXITCODE -eq 0 -and $mainText.StartsWith("# Main Memory")) {
     $preloadPrompt = @"
 Read and retain this project memory summary for follow-up questions. Do not summarize it now; wait for my next request.
 [MEMORY_MAIN_BEGIN]
@@ -63,6 +60,14 @@ if ($InitialPrompt -and $InitialPrompt.Trim().Length -gt 0) {
   }
 }
 
+$watcher = $null
+$watchStop = Join-Path ([System.IO.Path]::GetTempPath()) ("codex-memory-watch-" + [guid]::NewGuid().ToString("N") + ".stop")
+if ($WatchSessions -and -not $DisableAutoSync) {
+  # Checkpoints make the quit-time sync below pick up only what the watcher had not flushed.
+  $watchArgs = @("`"$autoSync`"", "--project", "`"$project`"", "--since-epoch", $sessionStart, "--topic", "`"$Topic`"", "--watch", "--watch-pid", $PID, "--stop-file", "`"$watchStop`"")
+  $watcher = Start-Process -FilePath "python" -ArgumentList $watchArgs -WindowStyle Hidden -PassThru
+}
+
 Write-Host "Starting Codex in project: $project"
 $launchArgs = @("-C", $project) + $CodexArgs
 if ($preloadPrompt) {
@@ -71,6 +76,15 @@ if ($preloadPrompt) {
 & $CodexCmd @launchArgs
 $codexExit = $LASTEXITCODE
 
+if ($watcher -and -not $watcher.HasExited) {
+  # Stop-Process cannot be handled on Windows; the stop file lets the watcher flush first.
+  New-Item -ItemType File -Path $watchStop -Force | Out-Null
+  if (-not $watcher.WaitForExit(30000)) {
+    Stop-Process -Id $watcher.Id -ErrorAction SilentlyContinue
+  }
+}
+Remove-Item -LiteralPath $watchStop -ErrorAction SilentlyContinue
+
 if (-not $DisableAutoSync) {
   Write-Host "Auto-syncing memory from latest session log..."
   & python $autoSync --project $project --since-epoch $sessionStart --topic $Topic | Out-Host
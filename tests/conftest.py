@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The scripts are flat modules run from scripts/, which imports them by name.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+# Tests never talk to a memory daemon the developer may have running.
+os.environ["MEMORY_MANAGER_NO_DAEMON"] = "1"
+
+
+@pytest.fixture
+def cli(monkeypatch, capsys):
+    # Runs memory_manager's command line against a project; returns (code, stdout).
+    import memory_manager
+
+    def run(root, *argv):
+        monkeypatch.setattr(sys, "argv", ["memory_manager.py", "--project", str(root), "--no-daemon", *argv])
+        capsys.readouterr()
+        code = memory_manager.main()
+        return code, capsys.readouterr().out
+
+    return run
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+from datetime import datetime
+
+import auto_sync_from_sessions
+import memory_manager
+
+
+def _session(path, cwd, session_id, messages, mtime):
+    lines = [json.dumps({"type": "session_meta", "payload": {"id": session_id, "cwd": cwd}})]
+    for number, text in enumerate(messages):
+        role = "user" if number % 2 == 0 else "assistant"
+        part = {"type": "input_text" if role == "user" else "output_text", "text": text}
+        lines.append(json.dumps({"type": "response_item", "payload": {"type": "message", "role": role, "content": [part]}}))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def _run(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["auto_sync_from_sessions.py", *argv])
+    return auto_sync_from_sessions.main()
+
+
+def _enable(project):
+    state = memory_manager._default_state()
+    state["enabled"] = True
+    memory_manager._save_state(memory_manager._state_path(project), state)
+
+
+def test_backfill_keeps_each_session_time(tmp_path, monkeypatch):
+    project = tmp_path / "project"
+    project.mkdir()
+    _enable(project)
+    sessions = tmp_path / "sessions"
+    old = datetime(2025, 1, 10, 9, 30).timestamp()
+    newer = datetime(2025, 3, 2, 14, 0).timestamp()
+    _session(sessions / "a.jsonl", str(project), "s-a", ["fix the kafka consumer lag", "raised fetch size"], old)
+    _session(sessions / "b.jsonl", str(project), "s-b", ["nginx keepalive for grpc", "raised to 75s"], newer)
+
+    assert _run(monkeypatch, "--project", str(project), "--sessions-root", str(sessions), "--backfill", "--workers", "1") == 0
+
+    entries = memory_manager.project_backend(project).load_index()["entries"]
+    assert [entry["session_id"] for entry in entries] == ["s-a", "s-b"]
+    assert [entry["timestamp"] for entry in entries] == ["2025-01-10T09:30:00", "2025-03-02T14:00:00"]
+    main_text = memory_manager._memory_paths(project)["main"].read_text(encoding="utf-8")
+    assert "- 2025-01-10 09:30 | session-auto" in main_text
+    assert "- 2025-03-02 14:00 | session-auto" in main_text
+
+
+def test_catalog_lists_only_changed_directories(tmp_path, monkeypatch):
+    project, other = tmp_path / "project", tmp_path / "other"
+    sessions = tmp_path / "sessions"
+    _session(sessions / "2025" / "01" / "a.jsonl", str(project), "s-a", ["kafka lag", "raised fetch size"], 1_700_000_000)
+    _session(sessions / "2025" / "02" / "b.jsonl", str(other), "s-b", ["nginx keepalive", "raised to 75s"], 1_700_000_100)
+    scanned = []
+    scan_dir = auto_sync_from_sessions._scan_dir
+    monkeypatch.setattr(auto_sync_from_sessions, "_scan_dir", lambda path, *rest: scanned.append(path) or scan_dir(path, *rest))
+
+    found = auto_sync_from_sessions._project_sessions(sessions, project)
+    assert [candidate.session_id for candidate in found] == ["s-a"]
+    assert (sessions / ".catalog" / "session_catalog.json").exists()
+    assert not (project / ".codex").exists() and not (tmp_path / "memory").exists()
+    assert len(scanned) == 4
+    scanned.clear()
+    auto_sync_from_sessions._project_sessions(sessions, project)
+    assert scanned == []
+
+    # A new log changes only its own directory; an append changes no directory.
+    scanned.clear()
+    _session(sessions / "2025" / "02" / "c.jsonl", str(project), "s-c", ["redis eviction", "allkeys-lru"], 1_700_000_200)
+    with (sessions / "2025" / "01" / "a.jsonl").open("a", encoding="utf-8") as f:
+        f.write("{}\n")
+    os.utime(sessions / "2025" / "01" / "a.jsonl", (1_700_000_300, 1_700_000_300))
+    found = auto_sync_from_sessions._project_sessions(sessions, project)
+    assert scanned == [str(sessions / "2025" / "02")]
+    assert {candidate.session_id: candidate.mtime for candidate in found} == {"s-a": 1_700_000_300, "s-c": 1_700_000_200}
+
+
+def _checkpoints(project):
+    return auto_sync_from_sessions._load_checkpoints(auto_sync_from_sessions._checkpoint_path(project))
+
+
+def test_later_sync_resumes_from_the_checkpoint(tmp_path, monkeypatch):
+    project = tmp_path / "project"
+    project.mkdir()
+    _enable(project)
+    sessions = tmp_path / "sessions"
+    log = sessions / "a.jsonl"
+    _session(log, str(project), "s-a", ["fix the kafka consumer lag", "raised fetch size"], 1_700_000_000)
+    argv = ("--project", str(project), "--sessions-root", str(sessions), "--since-epoch", "0")
+    assert _run(monkeypatch, *argv) == 0
+    first = _checkpoints(project)["s-a"]
+    assert first["offset"] == log.stat().st_size
+
+    with log.open("a", encoding="utf-8") as f:
+        for role, kind, text in (("user", "input_text", "nginx keepalive for grpc"), ("assistant", "output_text", "raised to 75s")):
+            payload = {"type": "message", "role": role, "content": [{"type": kind, "text": text}]}
+            f.write(json.dumps({"type": "response_item", "payload": payload}) + "\n")
+    assert _run(monkeypatch, *argv) == 0
+
+    entries = memory_manager.project_backend(project).load_index()["entries"]
+    assert [entry.get("continues") for entry in entries] == [None, first["entry_id"]]
+    detail = (project / entries[1]["detail_path"]).read_text(encoding="utf-8")
+    assert "nginx keepalive" in detail and "kafka" not in detail
+    assert _checkpoints(project)["s-a"]["offset"] == log.stat().st_size
+    assert _run(monkeypatch, *argv) == 0
+    assert len(memory_manager.project_backend(project).load_index()["entries"]) == 2
+
+
+def test_from_start_forgets_only_its_own_checkpoint(tmp_path, monkeypatch):
+    project = tmp_path / "project"
+    project.mkdir()
+    _enable(project)
+    sessions = tmp_path / "sessions"
+    _session(sessions / "a.jsonl", str(project), "s1", ["fix the kafka consumer lag", "raised fetch size"], 1_700_000_000)
+    _session(sessions / "b.jsonl", str(project), "s2", ["nginx keepalive for grpc", "raised to 75s"], 1_700_000_100)
+    assert _run(monkeypatch, "--project", str(project), "--sessions-root", str(sessions), "--backfill", "--workers", "1") == 0
+    assert sorted(_checkpoints(project)) == ["s1", "s2"]
+
+    argv = ("--project", str(project), "--sessions-root", str(sessions), "--since-epoch", "0", "--from-start")
+    assert _run(monkeypatch, *argv) == 0
+    checkpoints = _checkpoints(project)
+    assert sorted(checkpoints) == ["s1", "s2"]
+    entries = memory_manager.project_backend(project).load_index()["entries"]
+    assert checkpoints["s2"]["entry_id"] == entries[-1]["id"] != entries[1]["id"]
+
+
+def test_watch_tail_keeps_dialog_of_a_failed_flush(tmp_path):
+    log = tmp_path / "a.jsonl"
+    _session(log, str(tmp_path), "s-a", ["fix the kafka consumer lag", "raised fetch size"], 1_700_000_000)
+    tail = auto_sync_from_sessions._SessionTail(auto_sync_from_sessions.SessionCandidate(log, 1_700_000_000, session_id="s-a"), {})
+    assert tail.read() == 2
+
+    dialog, _ = tail.take()
+    with log.open("a", encoding="utf-8") as handle:
+        part = {"type": "input_text", "text": "and the retries?"}
+        handle.write(json.dumps({"type": "response_item", "payload": {"type": "message", "role": "user", "content": [part]}}) + "\n")
+    assert tail.read() == 1
+    tail.settle(False)
+    assert tail.last_message is None
+    assert [text for _, text in tail.pending] == ["fix the kafka consumer lag", "raised fetch size", "and the retries?"]
+
+    dialog, _ = tail.take()
+    tail.settle(True)
+    assert not tail.pending and tail.last_message == auto_sync_from_sessions._message_hash(*dialog[-1])
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import os
+
+from binary_index import BinaryRecallIndex, binary_path, open_binary_recall
+from index_store import append_entries, compact_index, load_index, load_log_index
+from recall_engine import RecallIndex
+
+_TOPICS = ["kafka", "redis", "nginx", "grpc", "postgres", "webpack"]
+
+
+def _entries(start, count):
+    entries = []
+    for number in range(start, start + count):
+        keywords = [_TOPICS[number % 6], _TOPICS[(number * 5 + 1) % 6], f"term{number}"]
+        entries.append({"id": f"e{number}", "topic": keywords[0], "keywords": keywords, "keyword_tf": [number % 4 + 1, 1, 2]})
+    return entries
+
+
+def _ranked(recall_index, terms):
+    return [(round(score, 9), entry["id"]) for score, entry in recall_index.search(terms, 5)]
+
+
+def test_binary_index_ranks_like_the_in_memory_index(tmp_path):
+    index_path = tmp_path / "index.json"
+    append_entries(index_path, _entries(0, 30))
+    compact_index(index_path)
+    append_entries(index_path, _entries(30, 7))
+
+    binary = open_binary_recall(index_path, load_log_index(index_path))
+    assert isinstance(binary, BinaryRecallIndex) and len(binary) == 37
+    full = RecallIndex(load_index(index_path))
+    for terms in ({"kafka"}, {"redis", "term33"}, {"grpc", "nginx", "term4"}, {"missing"}):
+        assert _ranked(binary, terms) == _ranked(full, terms)
+
+
+def test_stale_binary_index_is_ignored(tmp_path):
+    index_path = tmp_path / "index.json"
+    append_entries(index_path, _entries(0, 3))
+    compact_index(index_path)
+    assert binary_path(index_path).exists()
+    assert open_binary_recall(index_path, load_log_index(index_path)) is not None
+
+    stat = index_path.stat()
+    os.utime(index_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert open_binary_recall(index_path, load_log_index(index_path)) is None
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import json
+
+from detail_store import pack_dir, read_detail_text
+from memory_manager import project_backend, sync_note
+
+
+def test_pack_store_round_trips_bodies_and_exports_files(tmp_path, cli):
+    assert cli(tmp_path, "on", "--detail-store", "pack", "--detail-codec", "lzma")[0] == 0
+    notes = {"kafka": "kafka consumer lag: raised fetch.max.bytes", "redis": "redis eviction allkeys-lru"}
+    for topic, note in notes.items():
+        sync_note(tmp_path, note, topic=topic)
+    entries = project_backend(tmp_path).load_index()["entries"]
+    assert all(entry["pack"]["codec"] == "lzma" for entry in entries)
+    assert [path.name for path in pack_dir(tmp_path).glob("*.pack")] == [entries[0]["pack"]["segment"]]
+    assert not any((tmp_path / entry["detail_path"]).exists() for entry in entries)
+    assert [read_detail_text(tmp_path, entry) for entry in entries] == list(notes.values())
+
+    code, out = cli(tmp_path, "recall", "--query", "redis", "--json", "--context-chars", "200")
+    assert code == 0 and json.loads(out)[0]["context"] == notes["redis"]
+    assert cli(tmp_path, "fsck") == (0, "Memory store is consistent.\n")
+
+    assert cli(tmp_path, "export")[0] == 0
+    for entry, note in zip(entries, notes.values()):
+        assert (tmp_path / entry["detail_path"]).read_text(encoding="utf-8").endswith(f"{note}\n")
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import index_store
+from index_store import _segments, _spool_dir, append_entries, compact_index, load_doc_freqs, load_index
+
+
+def _entry(entry_id, *keywords):
+    return {"id": entry_id, "topic": entry_id, "keywords": list(keywords)}
+
+
+def _ids(index_path):
+    return [entry["id"] for entry in load_index(index_path)["entries"]]
+
+
+def test_append_replay_and_compact(tmp_path):
+    index_path = tmp_path / "index.json"
+    append_entries(index_path, [_entry("a", "alpha")], [["alpha", "shared"]])
+    append_entries(index_path, [_entry("b", "beta")], [["beta", "shared"]])
+    assert not index_path.exists()
+    assert _ids(index_path) == ["a", "b"]
+    assert load_index(index_path)["keywords"] == {"alpha": ["a"], "beta": ["b"]}
+
+    assert compact_index(index_path) == (2, 1)
+    assert index_path.exists() and not _segments(index_path)
+    assert _ids(index_path) == ["a", "b"]
+    assert load_doc_freqs(index_path) == (2, {"alpha": 1, "beta": 1, "shared": 2})
+
+    append_entries(index_path, [_entry("c", "gamma")])
+    assert _ids(index_path) == ["a", "b", "c"]
+
+
+def test_append_recovers_from_torn_tail(tmp_path):
+    index_path = tmp_path / "index.json"
+    append_entries(index_path, [_entry("a", "alpha")])
+    # A crash mid-append: the record is half written and its spool ticket
+    # is still there.
+    lost = _entry("b", "beta")
+    spool = _spool_dir(index_path)
+    (spool / "0-1-crashed.jsonl").write_text(json.dumps({"entry": lost, "terms": ["beta"]}) + "\n", encoding="utf-8")
+    with _segments(index_path)[-1].open("a", encoding="utf-8") as f:
+        f.write(json.dumps(lost)[:12])
+
+    append_entries(index_path, [_entry("c", "gamma")])
+    assert _ids(index_path) == ["a", "b", "c"]
+    assert not list(spool.glob("*.jsonl"))
+    assert _segments(index_path)[-1].read_text(encoding="utf-8").endswith("\n")
+
+
+def test_doc_freq_log_folds_past_its_size_limit(tmp_path, monkeypatch):
+    index_path = tmp_path / "index.json"
+    monkeypatch.setattr(index_store, "_DOC_FREQ_LOG_MAX_BYTES", 200)
+    snapshot_path, log_path = index_store._doc_freq_paths(index_path)
+    for number in range(12):
+        append_entries(index_path, [_entry(f"e{number}", "kafka")], [["kafka", f"term{number}"]])
+        assert not log_path.exists() or log_path.stat().st_size <= 200
+    assert snapshot_path.exists()
+    doc_count, doc_freqs = load_doc_freqs(index_path)
+    assert doc_count == 12 and doc_freqs["kafka"] == 12 and doc_freqs["term11"] == 1
+
+
+def test_concurrent_writers_commit_every_entry_once(tmp_path):
+    index_path = tmp_path / "index.json"
+
+    def write(number):
+        append_entries(index_path, [_entry(f"w{number}", "kafka", f"term{number}")])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write, range(40)))
+    ids = _ids(index_path)
+    assert sorted(ids) == sorted(f"w{number}" for number in range(40))
+    assert not list(_spool_dir(index_path).glob("*.jsonl"))
+    doc_count, doc_freqs = load_doc_freqs(index_path)
+    assert doc_count == 40 and doc_freqs["kafka"] == 40 and doc_freqs["term7"] == 1
+
+
+def test_legacy_index_seeds_doc_freqs_before_the_first_sync(tmp_path):
+    index_path = tmp_path / "index.json"
+    legacy = {"entries": [], "keywords": {}}
+    for number in range(3):
+        index_store.add_entry(legacy, _entry(f"old{number}", "kafka", f"old{number}"))
+    index_store.save_index(index_path, legacy)
+
+    assert index_store.current_doc_freqs(index_path) == (3, {"kafka": 3, "old0": 1, "old1": 1, "old2": 1})
+    append_entries(index_path, [_entry("new", "kafka")], [["kafka", "lag"]])
+    doc_count, doc_freqs = load_doc_freqs(index_path)
+    assert doc_count == 4 and doc_freqs["kafka"] == 4 and doc_freqs["lag"] == 1
+
+
+def test_first_append_seeds_doc_freqs_from_the_legacy_index(tmp_path):
+    index_path = tmp_path / "index.json"
+    legacy = {"entries": [], "keywords": {}}
+    index_store.add_entry(legacy, _entry("old", "kafka"))
+    index_store.save_index(index_path, legacy)
+
+    append_entries(index_path, [_entry("new", "redis")], [["redis"]])
+    assert load_doc_freqs(index_path) == (2, {"kafka": 1, "redis": 1})
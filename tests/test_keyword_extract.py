@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from keyword_extract import rank_keywords, term_counts
+
+
+def test_long_cjk_run_keeps_every_ngram_once():
+    counts = term_counts("修复了数据库连接池泄漏问题，原因是游标没有关闭")
+    assert {"修复", "原因", "关闭", "连接池", "泄漏", "库连"} <= set(counts)
+    assert counts["连接池"] == 1
+
+
+def test_idf_prunes_terms_the_corpus_shares():
+    counts = term_counts("修复了数据库连接池泄漏问题")
+    doc_freqs = {"修复": 40, "数据": 35, "据库": 35, "数据库": 35, "问题": 50}
+    keywords = [term for term, _ in rank_keywords(counts, len(counts), doc_freqs, doc_count=50)]
+    assert set(keywords[-5:]) == set(doc_freqs)
+    assert {"连接池", "泄漏"} <= set(keywords[:-5])
+
+
+def test_without_a_corpus_ranking_is_by_count():
+    counts = term_counts("kafka lag kafka consumer kafka lag")
+    assert rank_keywords(counts, 2) == [("kafka", 3), ("lag", 2)]
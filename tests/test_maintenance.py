@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from memory_manager import _memory_paths, project_backend, sync_note
+
+
+def _ids(root):
+    return [entry["id"] for entry in project_backend(root).load_index()["entries"]]
+
+
+def test_gc_drops_notes_with_missing_details_and_fsck_agrees(tmp_path, cli):
+    for topic, note in (("kafka", "kafka consumer lag"), ("redis", "redis eviction"), ("nginx", "nginx keepalive")):
+        sync_note(tmp_path, note, topic=topic)
+    entries = project_backend(tmp_path).load_index()["entries"]
+    (tmp_path / entries[0]["detail_path"]).unlink()
+
+    code, out = cli(tmp_path, "fsck")
+    assert code == 1 and f"detail: {entries[0]['id']}" in out
+    assert cli(tmp_path, "gc")[0] == 0
+    assert len(_ids(tmp_path)) == 3
+
+    assert cli(tmp_path, "gc", "--apply")[0] == 0
+    assert _ids(tmp_path) == [entry["id"] for entry in entries[1:]]
+    assert entries[0]["id"] not in _memory_paths(tmp_path)["main"].read_text(encoding="utf-8")
+    assert cli(tmp_path, "fsck") == (0, "Memory store is consistent.\n")
+
+
+def test_gc_keeps_the_newest_notes_within_max_entries(tmp_path, cli):
+    notes = ["kafka consumer lag", "redis eviction policy", "nginx keepalive timeout", "postgres vacuum freeze"]
+    for number, note in enumerate(notes):
+        sync_note(tmp_path, note, topic=note.split()[0], created_at=1_700_000_000 + number * 60)
+    entries = project_backend(tmp_path).load_index()["entries"]
+
+    assert cli(tmp_path, "gc", "--max-entries", "2", "--apply")[0] == 0
+    assert _ids(tmp_path) == [entry["id"] for entry in entries[2:]]
+    assert not (tmp_path / entries[0]["detail_path"]).exists()
+    assert cli(tmp_path, "fsck") == (0, "Memory store is consistent.\n")
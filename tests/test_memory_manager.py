@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+
+from detail_store import read_detail_text
+from index_store import _spool_dir, append_entries, compact_index, index_generation
+from memory_manager import _DaemonState, _memory_paths, project_backend, sync_note
+
+
+def _ids(warm):
+    _, recall_index = warm.index()
+    return set(recall_index.entries_by_id)
+
+
+def test_warm_index_follows_appends_by_other_writers(tmp_path):
+    index_path = _memory_paths(tmp_path)["index"]
+    daemon = _DaemonState()
+    warm = daemon.project(str(tmp_path))
+    assert daemon.handle({"op": "recall", "project": str(tmp_path), "query": "kafka"})["code"] == 0
+
+    # Another writer has spooled a ticket but not yet taken the lock; the
+    # daemon's sync commits it in the same group.
+    spool = _spool_dir(index_path)
+    spool.mkdir(parents=True)
+    ticket = {"entry": {"id": "other-1", "topic": "x", "keywords": ["kafka"]}, "terms": ["kafka"]}
+    (spool / "0-1-other.jsonl").write_text(json.dumps(ticket) + "\n", encoding="utf-8")
+    response = daemon.handle(
+        {"op": "sync", "project": str(tmp_path), "force": True, "topic": "redis", "note": "redis eviction allkeys-lru"}
+    )
+    assert _ids(warm) == {"other-1", response["entry"]["id"]}
+
+    append_entries(index_path, [{"id": "other-2", "topic": "y", "keywords": ["nginx"]}])
+    assert "other-2" in _ids(warm)
+
+    compact_index(index_path)
+    append_entries(index_path, [{"id": "other-3", "topic": "z", "keywords": ["grpc"]}])
+    assert _ids(warm) == {"other-1", "other-2", "other-3", response["entry"]["id"]}
+    _, recall_index = warm.index()
+    assert [hit["id"] for _, hit in recall_index.search({"kafka"}, 5)] == ["other-1"]
+
+
+def test_federated_recall_merges_projects(tmp_path, cli):
+    first, second, empty = tmp_path / "a", tmp_path / "b", tmp_path / "c"
+    empty.mkdir()
+    sync_note(first, "kafka consumer lag: raised fetch.max.bytes", topic="kafka lag")
+    sync_note(second, "kafka partition rebalance storm after deploy", topic="kafka rebalance")
+    sync_note(second, "redis eviction allkeys-lru", topic="redis")
+
+    code, out = cli(tmp_path, "recall", "--query", "kafka", "--json", "--projects", str(tmp_path / "*"))
+    assert code == 0
+    hits = json.loads(out)
+    assert sorted(hit["project"] for hit in hits) == [str(first.resolve()), str(second.resolve())]
+
+
+def test_daemon_federated_recall_returns_skipped_projects(tmp_path):
+    good, broken = tmp_path / "a", tmp_path / "b"
+    sync_note(good, "kafka consumer lag: raised fetch.max.bytes", topic="kafka lag")
+    sync_note(broken, "kafka partition rebalance storm", topic="kafka rebalance")
+    _memory_paths(broken)["index"].write_text("{not json", encoding="utf-8")
+
+    response = _DaemonState().handle(
+        {"op": "federated_recall", "projects": [str(good), str(broken)], "query": "kafka", "as_json": True}
+    )
+    assert [hit["project"] for hit in json.loads(response["output"])] == [str(good)]
+    assert len(response["failures"]) == 1 and response["failures"][0].startswith(f"{broken}:")
+
+
+def test_sync_keywords_come_from_idf_over_the_project(tmp_path):
+    for note in ("数据库迁移问题的修复记录", "数据库备份脚本出问题，原因是磁盘满了", "修复登录接口超时问题"):
+        sync_note(tmp_path, note)
+    entry = sync_note(tmp_path, "修复了数据库连接池泄漏问题，原因是游标没有关闭")
+    assert {"连接池", "泄漏", "游标没"} <= set(entry["keywords"])
+    assert not {"数据库", "问题"} & set(entry["keywords"])
+    recall_index = project_backend(tmp_path).recall_index()
+    assert [hit["id"] for _, hit in recall_index.search({"连接池"}, 3)] == [entry["id"]]
+
+
+def test_long_note_is_recalled_by_the_passage_that_matched(tmp_path, cli):
+    sections = [
+        "## kafka\n\n" + ("kafka consumer lag fetch size. " * 20).strip(),
+        "## redis\n\n" + ("redis eviction allkeys lru. " * 20).strip(),
+        "## nginx\n\n" + ("nginx keepalive grpc timeout. " * 20).strip(),
+    ]
+    record = sync_note(tmp_path, "\n\n".join(sections), topic="ops", passage_chars=700)
+    assert record["passages"] == 3
+    entries = project_backend(tmp_path).load_index()["entries"]
+    assert [entry["id"] for entry in entries] == [f"{record['id']}-p0{number}" for number in (1, 2, 3)]
+    assert [read_detail_text(tmp_path, entry).strip() for entry in entries] == sections
+
+    code, out = cli(tmp_path, "recall", "--query", "redis eviction", "--json", "--context-chars", "4000")
+    hits = json.loads(out)
+    assert code == 0 and hits[0]["id"] == f"{record['id']}-p02" and hits[0]["note_id"] == record["id"]
+    assert hits[0]["context"].strip() == sections[1]
+
+
+def test_batch_sync_reports_linked_duplicates(tmp_path, cli):
+    batch = tmp_path / "batch.jsonl"
+    note = "kafka consumer lag: raised fetch.max.bytes and max.poll.records on the billing consumers"
+    batch.write_text("\n".join(json.dumps({"note": note, "topic": "kafka lag"}) for _ in range(2)) + "\n", encoding="utf-8")
+
+    code, out = cli(tmp_path, "sync", "--force", "--batch", str(batch))
+    original = project_backend(tmp_path).load_index()["entries"][0]["id"]
+    assert code == 0
+    assert out.count("Synced memory entry:") == 2
+    assert f"Near-duplicate of: {original}" in out
+
+
+def test_sync_bumps_the_generation_after_its_sidecars(tmp_path, monkeypatch):
+    import memory_manager
+
+    index_path = _memory_paths(tmp_path)["index"]
+    sync_note(tmp_path, "redis eviction allkeys-lru", topic="redis")
+    before = index_generation(index_path)
+    seen = []
+    real_append_vectors = memory_manager.append_vectors
+
+    def append_vectors(path, vectors):
+        seen.append(index_generation(path))
+        real_append_vectors(path, vectors)
+
+    monkeypatch.setattr(memory_manager, "append_vectors", append_vectors)
+    sync_note(tmp_path, "kafka consumer lag: raised fetch.max.bytes", topic="kafka lag")
+    assert seen == [before]
+    assert index_generation(index_path) == before + 1
+
+
+def test_recalls_keep_the_preload_cache_until_the_next_sync(tmp_path, cli):
+    import memory_manager
+
+    assert cli(tmp_path, "on")[0] == 0
+    first = sync_note(tmp_path, "kafka consumer lag: raised fetch.max.bytes", topic="kafka lag")
+    sync_note(tmp_path, "redis eviction allkeys-lru", topic="redis")
+    code, preload = cli(tmp_path, "preload", "--max-chars", "2000")
+    assert code == 0
+    cache_path = memory_manager._preload_cache_path(tmp_path)
+    cached = cache_path.read_text(encoding="utf-8")
+
+    for _ in range(2):
+        assert cli(tmp_path, "recall", "--query", "kafka")[0] == 0
+    assert cli(tmp_path, "preload", "--max-chars", "2000") == (0, preload)
+    assert cache_path.read_text(encoding="utf-8") == cached
+
+    sync_note(tmp_path, "nginx keepalive for grpc", topic="nginx")
+    assert memory_manager._load_recall_stats(tmp_path) == {first["id"]: 2}
+    assert not memory_manager._recall_stats_log(tmp_path).exists()
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from binary_index import BinaryRecallIndex, open_binary_recall
+from index_store import add_entry, append_entries, compact_index, load_log_index
+from keyword_extract import term_counts
+from recall_engine import query_terms, recall_scored
+
+
+def _index(*entries):
+    index_data = {"entries": [], "keywords": {}}
+    for entry in entries:
+        add_entry(index_data, entry)
+    return index_data
+
+
+def test_long_cjk_query_keeps_every_ngram():
+    terms = query_terms("数据库连接池泄漏")
+    assert {"数据", "连接", "连接池", "泄漏"} <= terms
+
+
+def test_long_cjk_query_recalls_note_keyed_on_its_ngrams():
+    note = "连接池泄漏排查：连接池泄漏来自未关闭的游标。"
+    keywords = [term for term, _ in term_counts(note).most_common(16)]
+    assert "连接池" in keywords
+    index_data = _index(
+        {"id": "a", "topic": "db", "keywords": keywords, "summary": note},
+        {"id": "b", "topic": "web", "keywords": ["webpack"], "summary": "webpack"},
+    )
+    hits = recall_scored(index_data, "数据库连接池泄漏", max_results=3)
+    assert [entry["id"] for _, entry in hits] == ["a"]
+
+
+def _fallback_entries():
+    return [
+        {"id": "a", "topic": "release checklist", "keywords": ["deploy", "tag"], "summary": "steps before a deploy"},
+        {"id": "b", "topic": "db", "keywords": ["postgres"], "summary": "postgres upgrade; watch the replication lag"},
+        {"id": "c", "topic": "dup", "keywords": [], "duplicate_of": "a", "summary": "release checklist again"},
+    ]
+
+
+def test_fallback_finds_terms_in_topic_and_summary_only():
+    index_data = _index(*_fallback_entries())
+    assert [entry["id"] for _, entry in recall_scored(index_data, "checklist")] == ["a"]
+    assert [entry["id"] for _, entry in recall_scored(index_data, "replication")] == ["b"]
+
+
+def test_fallback_over_binary_snapshot_and_log_tail(tmp_path):
+    index_path = tmp_path / "index.json"
+    first, second, third = _fallback_entries()
+    append_entries(index_path, [first, third])
+    compact_index(index_path)
+    append_entries(index_path, [second])
+    recall_index = open_binary_recall(index_path, load_log_index(index_path))
+    assert isinstance(recall_index, BinaryRecallIndex)
+    assert [entry["id"] for _, entry in recall_scored({}, "checklist", recall_index=recall_index)] == ["a"]
+    assert [entry["id"] for _, entry in recall_scored({}, "replication", recall_index=recall_index)] == ["b"]
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+import index_backend
+from binary_index import binary_path
+from memory_manager import _memory_paths, sync_note
+
+pytest.importorskip("numpy")
+
+
+def test_semantic_recall_resolves_hits_without_loading_the_index(tmp_path, cli, monkeypatch):
+    kafka = sync_note(tmp_path, "kafka consumer lag: raised fetch.max.bytes on the consumer", topic="kafka")
+    sync_note(tmp_path, "redis eviction policy set to allkeys-lru", topic="redis")
+    assert cli(tmp_path, "compact")[0] == 0
+    assert binary_path(_memory_paths(tmp_path)["index"]).exists()
+    nginx = sync_note(tmp_path, "nginx keepalive timeout raised for grpc streams", topic="nginx")
+
+    def no_full_load(self):
+        raise AssertionError("semantic recall loaded the whole index")
+
+    monkeypatch.setattr(index_backend.JsonBackend, "load_index", no_full_load)
+    for query, expected in (("consumer lag on kafka", kafka["id"]), ("grpc keepalive", nginx["id"])):
+        code, out = cli(tmp_path, "recall", "--query", query, "--semantic", "--json", "--no-cache")
+        assert code == 0 and json.loads(out)[0]["id"] == expected
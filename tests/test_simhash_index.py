@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import random
+
+import simhash_index
+from simhash_index import (
+    SimHashTable,
+    append_signatures,
+    bands_path,
+    fold_signatures,
+    prune_signatures,
+    read_signatures,
+)
+
+
+def _flip(signature, *bits):
+    for bit in bits:
+        signature ^= 1 << bit
+    return signature
+
+
+def _rows(count, seed=7):
+    rng = random.Random(seed)
+    return [(rng.getrandbits(64), f"note-{number:04d}") for number in range(count)]
+
+
+def test_folded_bands_match_like_a_full_replay(tmp_path):
+    index_path = tmp_path / "index.json"
+    rows = _rows(300)
+    append_signatures(index_path, rows[:200])
+    fold_signatures(index_path)
+    append_signatures(index_path, rows[200:])
+
+    table = SimHashTable.load(index_path)
+    assert table.folded is not None and table.folded.log_bytes > 0
+    assert sum(len(bucket) for bucket in table.buckets[0].values()) == 100
+    replayed = SimHashTable()
+    for signature, note_id in read_signatures(index_path):
+        replayed.add(signature, note_id)
+    for signature, note_id in rows[::7]:
+        probe = _flip(signature, 3, 40, 61)
+        assert table.match(probe) == replayed.match(probe) == note_id
+        assert table.match(_flip(signature, 1, 2, 3, 4, 5, 6, 7, 8)) == replayed.match(_flip(signature, 1, 2, 3, 4, 5, 6, 7, 8))
+
+
+def test_sync_replays_only_the_tail_and_refolds(tmp_path, monkeypatch):
+    index_path = tmp_path / "index.json"
+    monkeypatch.setattr(simhash_index, "_FOLD_TAIL_BYTES", 1000)
+    append_signatures(index_path, _rows(10))
+    assert not SimHashTable.load(index_path).needs_fold
+    append_signatures(index_path, _rows(40, seed=8))
+    assert SimHashTable.load(index_path).needs_fold
+    fold_signatures(index_path)
+    table = SimHashTable.load(index_path)
+    assert table.tail_bytes == 0 and not table.needs_fold
+
+
+def test_rewriting_the_log_refolds(tmp_path):
+    index_path = tmp_path / "index.json"
+    rows = _rows(20)
+    append_signatures(index_path, rows)
+    fold_signatures(index_path)
+    keep = {note_id for _, note_id in rows[:5]}
+    assert prune_signatures(index_path, keep) == 15
+    assert bands_path(index_path).exists()
+    table = SimHashTable.load(index_path)
+    assert table.match(rows[10][0]) is None
+    assert table.match(rows[2][0]) == rows[2][1]
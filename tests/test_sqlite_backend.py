@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import json
+
+from memory_manager import project_backend, sync_note
+
+
+def _recall_ids(cli, root, query):
+    code, out = cli(root, "recall", "--query", query, "--json", "--no-cache")
+    assert code == 0
+    return [hit["id"] for hit in json.loads(out)]
+
+
+def test_migrate_round_trip_keeps_recall_and_fsck_clean(tmp_path, cli):
+    sync_note(tmp_path, "kafka consumer lag: raised fetch.max.bytes on the consumer", topic="kafka lag")
+    sync_note(tmp_path, "连接池泄漏排查：连接池泄漏来自未关闭的游标。", topic="数据库")
+    sync_note(tmp_path, "nginx keepalive timeout raised to 75s for grpc", topic="release checklist")
+    ids = [entry["id"] for entry in project_backend(tmp_path).load_index()["entries"]]
+    kafka, cjk, checklist = ids
+
+    for backend in ("sqlite", "json"):
+        assert cli(tmp_path, "migrate", "--to", backend)[0] == 0
+        assert project_backend(tmp_path).name == backend
+        assert cli(tmp_path, "fsck") == (0, "Memory store is consistent.\n")
+        assert [entry["id"] for entry in project_backend(tmp_path).load_index()["entries"]] == ids
+        assert _recall_ids(cli, tmp_path, "kafka")[0] == kafka
+        assert _recall_ids(cli, tmp_path, "数据库连接池泄漏") == [cjk]
+        # "checklist" only appears in the topic, so only the fallback finds it.
+        assert _recall_ids(cli, tmp_path, "checklist") == [checklist]
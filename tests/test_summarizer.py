@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from summarizer import append_main_memory, parse_main_records, rollup_main_memory, select_main_lines
+
+
+def _record(topic, timestamp=None):
+    record = {"topic": topic, "keywords": [topic], "detail_path": f"docs/memory/detail/{topic}.md", "summary": topic}
+    if timestamp:
+        record["timestamp"] = timestamp
+    return record
+
+
+def test_main_lines_use_record_time_and_order_by_it(tmp_path):
+    main_path = tmp_path / "main.md"
+    append_main_memory(main_path, [_record("recent", "2025-06-01T12:00:00")])
+    # Backfilled history lands after newer lines.
+    append_main_memory(main_path, [_record("old", "2024-01-05T08:00:00")])
+    _, records = parse_main_records(main_path.read_text(encoding="utf-8"))
+    assert [record["period"] for record in records] == ["2025-06-01 12:00", "2024-01-05 08:00"]
+
+    # Room for the header and the recent line only: recency must favour it.
+    text = main_path.read_text(encoding="utf-8")
+    header_cost = len(select_main_lines(text, 0)) + 2
+    chosen = select_main_lines(text, header_cost + len(records[0]["line"]) + 1)
+    assert "| recent |" in chosen and "| old |" not in chosen
+
+    assert rollup_main_memory(main_path, keep=1) == (1, 2)
+    _, records = parse_main_records(main_path.read_text(encoding="utf-8"))
+    assert records[0]["period"] == "2024-01" and records[1]["topic"] == "recent"